@@ -0,0 +1,8 @@
+"""
+Benchmarks
+----------
+
+Standalone timing scripts, run from the repository root, e.g.::
+
+    python -m benchmarks.schema_build
+"""
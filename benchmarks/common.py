@@ -0,0 +1,31 @@
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings_test")
+    import django
+
+    django.setup()
+
+
+def timed(func, *, repeat=5, setup=None):
+    """Median wall clock seconds for func over repeat runs (setup isn't timed)"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def report(name, seconds):
+    print(f"{name:<50} {seconds * 1000:>10.1f} ms")
@@ -0,0 +1,71 @@
+"""Time querying multi-MB ``outputJson`` through GraphQL.
+
+Compares passing the stored JSON text straight through against the previous decode (with
+``EnumAwareDecoder``) + re-encode round trip, which is what happens with ``RAW_JSON_FIELDS``
+emptied."""
+import argparse
+import tracemalloc
+
+from .common import setup_django, timed, report
+
+
+def make_output(size_mb: float) -> dict:
+    row = {"read": "ACGT" * 16, "quality": 37.5, "flags": [1, 2, 3], "passed": True}
+    # each row is ~140 bytes of JSON
+    rows = int(size_mb * 1024 * 1024 / 140)
+    return {"summary": {"rows": rows}, "rows": [dict(row, i=i) for i in range(rows)]}
+
+
+def peak_mb(func) -> float:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--executions", type=int, default=5)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    setup_django()
+    from django.db import connection
+    import turtle_shell
+    from turtle_shell import graphene_adapter
+    from turtle_shell.models import ExecutionResult
+
+    connection.creation.create_test_db(verbosity=0)
+
+    def analyze(sample: str):
+        return sample
+
+    registry = turtle_shell._Registry()
+    registry.add(analyze)
+    output = make_output(args.size_mb)
+    for i in range(args.executions):
+        execution = ExecutionResult.objects.create_execution(
+            func_name="analyze", input_json={"sample": str(i)}
+        )
+        ExecutionResult.objects.filter(pk=execution.pk).update(output_json=output)
+    query = "query { executionResults { edges { node { uuid outputJson } } } }"
+
+    def run():
+        result = registry.schema.execute(query)
+        assert not result.errors, result.errors
+
+    print(f"outputJson for {args.executions} executions of ~{args.size_mb:g} MB each")
+    report("raw JSON passthrough", timed(run, repeat=args.repeat))
+    print(f"{'  peak python memory':<50} {peak_mb(run):>10.1f} MB")
+    raw_fields = graphene_adapter.ExecutionResult.RAW_JSON_FIELDS
+    graphene_adapter.ExecutionResult.RAW_JSON_FIELDS = ()
+    try:
+        report("decode + re-encode", timed(run, repeat=args.repeat))
+        print(f"{'  peak python memory':<50} {peak_mb(run):>10.1f} MB")
+    finally:
+        graphene_adapter.ExecutionResult.RAW_JSON_FIELDS = raw_fields
+
+
+if __name__ == "__main__":
+    main()
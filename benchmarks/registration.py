@@ -0,0 +1,107 @@
+"""Time converting wide signatures to form fields (param_to_field) for a large registry.
+
+Compares the cached dispatcher against the previous per-parameter dict merging + linear
+``issubclass`` scan (reproduced in ``legacy_param_to_field`` below)."""
+import argparse
+import enum
+import inspect
+import pathlib
+from typing import Optional
+
+from .common import setup_django, timed, report
+
+
+class Color(enum.Enum):
+    red = "red"
+    green = "green"
+
+
+class Text(str):
+    pass
+
+
+ANNOTATIONS = [int, str, bool, Optional[bool], Text, pathlib.Path, dict, Color, float]
+
+
+def make_params(functions, width):
+    from defopt import Parameter
+
+    return [
+        [
+            Parameter(
+                name=f"p{i}_{j}",
+                kind=Parameter.KEYWORD_ONLY,
+                default=Parameter.empty if j % 2 else None,
+                annotation=ANNOTATIONS[j % len(ANNOTATIONS)],
+                doc="",
+            )
+            for j in range(width)
+        ]
+        for i in range(functions)
+    ]
+
+
+def legacy_param_to_field(param, config=None):
+    from django import forms
+    from django.db.models import TextChoices
+    from turtle_shell import function_to_form as ftf
+
+    def get_for_param_by_type(dct, *, param, kind):
+        if elem := dct.get(param.name, dct.get(param.annotation, dct.get(kind))):
+            return elem
+        for k, v in dct.items():
+            if inspect.isclass(k) and issubclass(kind, k) or k == kind:
+                return v
+
+    config = config or {}
+    all_types = {**ftf.type2field_type, **(config.get("fields") or {})}
+    widgets = {**ftf.type2widget, **(config.get("widgets") or {})}
+    kwargs = {}
+    kind = ftf.get_type_from_annotation(param)
+    if inspect.isclass(kind) and issubclass(kind, enum.Enum):
+        field_type = forms.TypedChoiceField
+        kwargs["choices"] = TextChoices(
+            f"{kind.__name__}Enum",
+            dict(
+                [(member.name, (str(member.value), member.name)) for member in kind]
+                + [(str(member.value), (member.name, member.name)) for member in kind]
+            ),
+        ).choices
+        kwargs["coerce"] = ftf.Coercer(kind)
+    else:
+        field_type = get_for_param_by_type(all_types, param=param, kind=kind)
+    kwargs = {**ftf.extra_kwargs(field_type, param), **kwargs}
+    widget = get_for_param_by_type(widgets, param=param, kind=kind)
+    if widget:
+        kwargs["widget"] = widget
+    return field_type(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--functions", type=int, default=500)
+    parser.add_argument("--width", type=int, default=30, help="parameters per function")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    setup_django()
+    from turtle_shell.function_to_form import default_dispatcher, param_to_field
+
+    all_params = make_params(args.functions, args.width)
+
+    def legacy():
+        for params in all_params:
+            for param in params:
+                legacy_param_to_field(param)
+
+    def dispatched():
+        for params in all_params:
+            for param in params:
+                param_to_field(param, dispatcher=default_dispatcher)
+
+    print(f"param_to_field for {args.functions} functions x {args.width} parameters")
+    report("legacy (merge dicts + linear scan)", timed(legacy, repeat=args.repeat))
+    report("cached dispatcher", timed(dispatched, repeat=args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Time building the GraphQL schema for a large registry (default 500 functions)."""
+import argparse
+import enum
+
+from .common import setup_django, timed, report
+
+
+class Level(enum.Enum):
+    low = "low"
+    high = "high"
+
+
+def make_function(i):
+    namespace = {"Level": Level}
+    exec(
+        f"def func_{i}(a: int, b: str = 'x', flag: bool = False, level: Level = Level.low):\n"
+        f"    '''Synthetic function {i}.\n\n    Args:\n        a: an int\n        b: a str\n    '''\n",
+        namespace,
+    )
+    return namespace[f"func_{i}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--functions", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    setup_django()
+    import turtle_shell
+
+    funcs = [make_function(i) for i in range(args.functions)]
+    extra = make_function(args.functions)
+    registry = turtle_shell._Registry()
+
+    def fill():
+        registry.clear()
+        for func in funcs:
+            registry.add(func)
+
+    print(f"Schema build for {args.functions} functions")
+    report("cold build (convert everything)", timed(lambda: registry.schema, setup=fill))
+
+    def cold_rebuild():
+        # what every rebuild cost before converted types were cached
+        registry._graphql_cache = None
+        registry._schema = None
+        registry.schema
+
+    report("rebuild without cache", timed(cold_rebuild, repeat=args.repeat))
+
+    def add_one():
+        registry.add(extra)
+        registry.schema
+
+    def remove_one():
+        registry.remove(extra.__name__)
+        registry.schema
+
+    def without_extra():
+        if registry.get(extra.__name__):
+            remove_one()
+
+    report(
+        "rebuild after adding one function", timed(add_one, repeat=args.repeat, setup=without_extra)
+    )
+    report(
+        "rebuild after removing one function", timed(remove_one, repeat=args.repeat, setup=add_one)
+    )
+
+
+if __name__ == "__main__":
+    main()
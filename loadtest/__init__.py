@@ -0,0 +1,16 @@
+"""
+Load testing
+------------
+
+A self-contained load generator plus an example project to point it at. Everything runs as local
+processes, with no external services, e.g. from the repository root::
+
+    python -m loadtest run --function sleepy --concurrency 8 --requests 1000 -o before.json
+    python -m loadtest run --function sleepy --concurrency 8 --requests 1000 -o after.json
+    python -m loadtest compare before.json after.json
+
+``run`` starts the example project (``loadtest.settings``) with a fresh database, drives a
+weighted mix of create/list/detail views and GraphQL mutations/queries from concurrent clients,
+and reports throughput and p50/p95/p99 latencies per operation (as JSON with ``-o``). Pass
+``--url`` to drive an already running server instead (e.g. gunicorn serving ``loadtest.wsgi``).
+"""
@@ -0,0 +1,478 @@
+"""Load generator for turtle_shell's views and GraphQL endpoint (stdlib only, see __init__)"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# inputs for the synthetic functions in loadtest.turtle_tools, as form data
+FUNCTIONS = {
+    "sleepy": {"seconds": "0.05"},
+    "cpu_heavy": {"rounds": "20000"},
+    "large_output": {"size_kb": "512"},
+}
+OPERATIONS = ("create", "list", "detail", "graphql_mutation", "graphql_query")
+DEFAULT_MIX = "create=2,list=3,detail=3,graphql_mutation=1,graphql_query=1"
+# fields of the report that describe the run itself - runs are only comparable if these match
+COMPARABLE_CONFIG = ("function", "inputs", "mix", "concurrency", "requests", "seed", "queued")
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    """Stats (latencies in ms) for one operation"""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "throughput": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "p50": round(percentile(ordered, 50) * 1000, 2),
+        "p95": round(percentile(ordered, 95) * 1000, 2),
+        "p99": round(percentile(ordered, 99) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r} (one of {OPERATIONS})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def camel_case(name: str) -> str:
+    first, *rest = name.split("_")
+    return first + "".join(part.title() for part in rest)
+
+
+def graphql_literal(value: str) -> str:
+    try:
+        float(value)
+    except ValueError:
+        return json.dumps(value)
+    return value
+
+
+class Client:
+    """One keep-alive connection with its own cookies (i.e., one simulated user)"""
+
+    def __init__(self, base_url: str, timeout: float = 120):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.cookies = {}
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, headers, body) - reconnects once if the server dropped the connection"""
+        headers = dict(headers or {})
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError, socket.timeout):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+                continue
+            for header in response.headers.get_all("Set-Cookie") or []:
+                for name, morsel in SimpleCookie(header).items():
+                    self.cookies[name] = morsel.value
+            if response.headers.get("Connection", "").lower() == "close":
+                self.conn.close()
+                self.conn = None
+            return response.status, response.headers, data
+
+    def csrf_headers(self):
+        return {"X-CSRFToken": self.cookies.get("csrftoken", ""), "Referer": "http://localhost/"}
+
+
+class Scenario:
+    """The operations, for one function"""
+
+    def __init__(self, function: str, inputs: dict):
+        self.function = function
+        self.inputs = inputs
+        self.created = []
+        self.lock = threading.Lock()
+
+    def prepare(self, client: Client):
+        # sets the CSRF cookie
+        status, _, _ = client.request("GET", f"/{self.function}/create/")
+        if status != 200:
+            raise RuntimeError(f"GET create page returned {status}")
+
+    def remember(self, location: str):
+        match = re.search(r"/([0-9a-f-]{36})/?$", location or "")
+        if match:
+            with self.lock:
+                self.created.append(match.group(1))
+
+    def create(self, client, rng):
+        body = urlencode(
+            {**self.inputs, "csrfmiddlewaretoken": client.cookies.get("csrftoken", "")}
+        )
+        headers = {"Content-Type": "application/x-www-form-urlencoded", **client.csrf_headers()}
+        status, response_headers, _ = client.request(
+            "POST", f"/{self.function}/create/", body, headers
+        )
+        self.remember(response_headers.get("Location"))
+        return status == 302
+
+    def list(self, client, rng):
+        return client.request("GET", f"/{self.function}/")[0] == 200
+
+    def detail(self, client, rng):
+        with self.lock:
+            uuid = rng.choice(self.created) if self.created else None
+        if uuid is None:
+            return self.list(client, rng)
+        return client.request("GET", f"/{self.function}/{uuid}/")[0] == 200
+
+    def graphql(self, client, query):
+        headers = {"Content-Type": "application/json", **client.csrf_headers()}
+        status, _, data = client.request("POST", "/graphql", json.dumps({"query": query}), headers)
+        return status == 200 and not json.loads(data).get("errors")
+
+    def graphql_mutation(self, client, rng):
+        arguments = ", ".join(
+            f"{camel_case(k)}: {graphql_literal(v)}" for k, v in self.inputs.items()
+        )
+        mutation = camel_case(f"execute_{self.function}")
+        query = "mutation { %s(input: {%s}) { execution { uuid status } } }" % (
+            mutation,
+            arguments,
+        )
+        return self.graphql(client, query)
+
+    def graphql_query(self, client, rng):
+        query = (
+            'query { executionResults(funcName: "%s", first: 20) '
+            "{ edges { node { uuid status created } } } }" % self.function
+        )
+        return self.graphql(client, query)
+
+
+def run_load(base_url, scenario, mix, *, concurrency, requests, warmup, seed, duration=None):
+    """Drive the server, returning ``{"elapsed", "operations": {name: stats}, "total"}``"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    # the sequence of operations only depends on the seed, so runs are comparable
+    plan_rng = random.Random(seed)
+    plan = plan_rng.choices(names, weights, k=requests)
+    warmup_plan = plan_rng.choices(names, weights, k=warmup)
+    results = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    next_index = [0]
+    failures = []
+
+    def client_loop(index, operations, record, deadline):
+        client = Client(base_url)
+        rng = random.Random(seed * 1000 + index)
+        try:
+            scenario.prepare(client)
+            while True:
+                with lock:
+                    i = next_index[0]
+                    next_index[0] += 1
+                if deadline is None and i >= len(operations):
+                    return
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                name = operations[i % len(operations)]
+                start = time.perf_counter()
+                try:
+                    ok = getattr(scenario, name)(client, rng)
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                if record:
+                    with lock:
+                        results[name].append(elapsed)
+                        if not ok:
+                            errors[name] += 1
+        except Exception as e:
+            failures.append(e)
+
+    def run_phase(operations, record, deadline=None):
+        next_index[0] = 0
+        threads = [
+            threading.Thread(target=client_loop, args=(i, operations, record, deadline))
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if failures:
+            raise RuntimeError(f"Client failed: {failures[0]!r}") from failures[0]
+
+    if warmup_plan:
+        run_phase(warmup_plan, record=False)
+    start = time.perf_counter()
+    run_phase(plan, record=True, deadline=time.monotonic() + duration if duration else None)
+    elapsed = time.perf_counter() - start
+    all_latencies = [latency for latencies in results.values() for latency in latencies]
+    return {
+        "elapsed": round(elapsed, 3),
+        "operations": {
+            name: summarize(results[name], errors[name], elapsed) for name in names if results[name]
+        },
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(base_url, function, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if Client(base_url, timeout=5).request("GET", f"/{function}/")[0] < 500:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} didn't come up within {timeout}s")
+
+
+class LocalServer:
+    """The example project on a free port, with a fresh database (plus optional workers)"""
+
+    def __init__(self, *, server_command=None, workers=0, queued=False, env=None):
+        self.port = free_port()
+        self.tmpdir = tempfile.TemporaryDirectory(prefix="turtle_shell_loadtest_")
+        self.env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "loadtest.settings",
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [str(ROOT_DIR), os.environ.get("PYTHONPATH")])
+            ),
+            "LOADTEST_DATABASE": os.path.join(self.tmpdir.name, "loadtest.sqlite3"),
+            "LOADTEST_QUEUED": "1" if queued else "0",
+            **(env or {}),
+        }
+        addr = f"127.0.0.1:{self.port}"
+        self.server_command = (
+            server_command or "{python} -m django runserver --noreload {addr}"
+        ).format(python=sys.executable, addr=addr)
+        self.workers = workers
+        self.processes = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/execute"
+
+    def start(self):
+        django = [sys.executable, "-m", "django"]
+        subprocess.run(django + ["migrate", "--verbosity", "0"], env=self.env, check=True)
+        log = open(os.path.join(self.tmpdir.name, "server.log"), "wb")
+        self.processes.append(
+            subprocess.Popen(self.server_command.split(), env=self.env, stdout=log, stderr=log)
+        )
+        if self.workers:
+            self.processes.append(
+                subprocess.Popen(
+                    django + ["turtle_shell_worker", "--processes", str(self.workers)],
+                    env=self.env,
+                    stdout=log,
+                    stderr=log,
+                )
+            )
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.tmpdir.cleanup()
+
+
+def environment() -> dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_revision": revision,
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    print(
+        f"{config['function']}: {config['requests']} requests, concurrency {config['concurrency']}"
+        f" ({report['elapsed']}s)"
+    )
+    print(
+        f"{'operation':<18}{'count':>7}{'errors':>8}{'req/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}"
+    )
+    rows = [*report["operations"].items(), ("total", report["total"])]
+    for name, stats in rows:
+        print(
+            f"{name:<18}{stats['count']:>7}{stats['errors']:>8}{stats['throughput']:>9.1f}"
+            f"{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}"
+        )
+    print("(latencies in ms)")
+
+
+def compare(base: dict, new: dict) -> tuple:
+    """Rows of (operation, metric, base, new, change %) plus warnings about config differences"""
+    warnings = [
+        f"config differs: {key} = {base['config'].get(key)!r} vs {new['config'].get(key)!r}"
+        for key in COMPARABLE_CONFIG
+        if base["config"].get(key) != new["config"].get(key)
+    ]
+    rows = []
+    operations = [*base["operations"], "total"]
+    for name in operations:
+        old_stats = base["total"] if name == "total" else base["operations"].get(name)
+        new_stats = new["total"] if name == "total" else new["operations"].get(name)
+        if not old_stats or not new_stats:
+            continue
+        for metric in ("throughput", "p50", "p95", "p99", "errors"):
+            old, current = old_stats[metric], new_stats[metric]
+            change = (current - old) / old * 100 if old else None
+            rows.append((name, metric, old, current, change))
+    return rows, warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Generate load and report latencies")
+    run.add_argument("--function", choices=sorted(FUNCTIONS), default="sleepy")
+    run.add_argument(
+        "--input",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Override a function input (see loadtest/turtle_tools.py)",
+    )
+    run.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=DEFAULT_MIX)
+    run.add_argument("--concurrency", type=int, default=4)
+    run.add_argument("--requests", type=int, default=500)
+    run.add_argument("--duration", type=float, help="Run for this many seconds instead")
+    run.add_argument("--warmup", type=int, default=20, help="Unrecorded requests first")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--url", help="Drive this server (e.g. http://host:8000/execute) instead")
+    run.add_argument(
+        "--server",
+        help="Command serving loadtest.wsgi, with {addr}, e.g. 'gunicorn -w 4 -b {addr} "
+        "loadtest.wsgi' (default: django's runserver)",
+    )
+    run.add_argument("--queued", action="store_true", help="Queue executions for workers")
+    run.add_argument("--workers", type=int, default=0, help="Worker processes (with --queued)")
+    run.add_argument("-o", "--output", help="Write the report as JSON here")
+    compare_parser = commands.add_parser("compare", help="Compare two JSON reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        base, new = (json.loads(Path(path).read_text()) for path in (args.base, args.new))
+        rows, warnings = compare(base, new)
+        for warning in warnings:
+            print(f"WARNING: {warning}")
+        print(f"{'operation':<18}{'metric':<12}{'base':>10}{'new':>10}{'change':>9}")
+        for name, metric, old, current, change in rows:
+            change_text = f"{change:+.1f}%" if change is not None else "-"
+            print(f"{name:<18}{metric:<12}{old:>10.1f}{current:>10.1f}{change_text:>9}")
+        return
+
+    inputs = dict(FUNCTIONS[args.function])
+    inputs.update(item.partition("=")[::2] for item in args.input)
+    scenario = Scenario(args.function, inputs)
+    started = datetime.now(timezone.utc).isoformat()
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = LocalServer(server_command=args.server, workers=args.workers, queued=args.queued)
+        server.start()
+        base_url = server.url
+    try:
+        wait_for(base_url, args.function)
+        result = run_load(
+            base_url,
+            scenario,
+            args.mix,
+            concurrency=args.concurrency,
+            requests=args.requests,
+            warmup=args.warmup,
+            seed=args.seed,
+            duration=args.duration,
+        )
+    finally:
+        if server:
+            server.stop()
+    report = {
+        "config": {
+            "function": args.function,
+            "inputs": inputs,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "queued": args.queued,
+            "workers": args.workers,
+            "server": args.url or args.server or "runserver",
+        },
+        "environment": environment(),
+        "started": started,
+        **result,
+    }
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
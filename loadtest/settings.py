@@ -0,0 +1,71 @@
+"""Example project for load testing (see loadtest/__init__.py).
+
+Environment variables:
+    LOADTEST_DATABASE: sqlite database path (default: loadtest.sqlite3 in the working directory)
+    LOADTEST_DATABASE_JSON: full ``DATABASES["default"]`` as JSON instead, e.g. for postgres
+    LOADTEST_QUEUED: set to 1 to queue executions for workers instead of running them inline
+"""
+import json
+import os
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+DEBUG = False
+ALLOWED_HOSTS = ["*"]
+SECRET_KEY = "loadtest-only"
+ROOT_URLCONF = "loadtest.urls"
+WSGI_APPLICATION = "loadtest.wsgi.application"
+
+if os.environ.get("LOADTEST_DATABASE_JSON"):
+    DATABASES = {"default": json.loads(os.environ["LOADTEST_DATABASE_JSON"])}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("LOADTEST_DATABASE", "loadtest.sqlite3"),
+            # concurrent writers wait for the lock instead of failing right away
+            "OPTIONS": {"timeout": 30},
+        }
+    }
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "crispy_forms",
+    "graphene_django",
+    "turtle_shell",
+    "loadtest",
+]
+MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "loadtest.middleware.AutoLoginMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+]
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [ROOT_DIR / "templates"],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+                "django.contrib.messages.context_processors.messages",
+            ]
+        },
+    }
+]
+USE_TZ = True
+DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
+TURTLE_SHELL_QUEUED_EXECUTION = os.environ.get("LOADTEST_QUEUED") == "1"
+# server errors show up in the server log (DEBUG is off to keep its overhead out of the numbers)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"django.request": {"handlers": ["console"], "level": "ERROR"}},
+}
@@ -0,0 +1,45 @@
+"""Synthetic functions for load testing (picked up by turtle_shell's autodiscovery)"""
+import hashlib
+import time
+
+import turtle_shell
+
+Registry = turtle_shell.get_registry()
+
+
+def sleepy(seconds: float = 0.05):
+    """Sleep, like a function waiting on I/O.
+
+    Args:
+        seconds: how long to sleep
+    """
+    time.sleep(seconds)
+    return {"slept": seconds}
+
+
+def cpu_heavy(rounds: int = 20000):
+    """Hash in a loop, holding the GIL.
+
+    Args:
+        rounds: number of sha256 rounds
+    """
+    digest = b""
+    for _ in range(rounds):
+        digest = hashlib.sha256(digest).digest()
+    return {"digest": digest.hex()}
+
+
+def large_output(size_kb: int = 512):
+    """Return a big JSON document.
+
+    Args:
+        size_kb: approximate size of the output
+    """
+    # each row is ~100 bytes of JSON
+    rows = size_kb * 1024 // 100
+    return {"rows": [{"i": i, "read": "ACGT" * 10, "quality": 37.5} for i in range(rows)]}
+
+
+Registry.add(sleepy)
+Registry.add(cpu_heavy)
+Registry.add(large_output)
@@ -0,0 +1,5 @@
+from django.urls import include, path
+
+import turtle_shell
+
+urlpatterns = [path("execute/", include(turtle_shell.get_registry().get_router().urls))]
@@ -5,8 +5,13 @@ DEBUG = True
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-    }
+    },
+    # stand-in for a read replica (see turtle_shell.routers) - tests copy rows over by hand
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+    },
 }
+DATABASE_ROUTERS = ["turtle_shell.routers.TurtleShellRouter"]
 SECRET_KEY = "whatever"
 INSTALLED_APPS = (
     "django.contrib.admin",
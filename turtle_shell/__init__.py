@@ -11,6 +11,8 @@ class _Router:
 class _Registry:
     func_name2func: dict
     _schema = None
+    _graphql_cache = None
+    _manifest = None
 
     def __init__(self):
         self.func_name2func = {}
@@ -20,14 +22,29 @@ class _Registry:
         return _RegistrySingleton
 
     def add(self, func, name=None, config=None):
-        from .function_to_form import _Function
+        """Register a function (or a ``"pkg.module:func"`` path to import it lazily)"""
+        from .function_to_form import _Function, split_import_path
 
         # TODO: maybe _Function object should have overridden __new__ to keep it immutable?? :-/
-        name = name or func.__name__
+        if isinstance(func, str):
+            name = name or split_import_path(func)[1].split(".")[-1]
+        else:
+            name = name or func.__name__
         func_obj = self.get(name)
         if not func_obj:
-            func_obj = _Function.from_function(func, name=name, config=config)
+            if isinstance(func, str):
+                func_obj = _Function.from_import_path(
+                    func, name=name, config=config, manifest_entry=self.manifest.get(name)
+                )
+            else:
+                func_obj = _Function.from_function(
+                    func, name=name, config=config, manifest_entry=self.manifest.get(name)
+                )
             self.func_name2func[func_obj.name] = func_obj
+            self._schema = None
+        elif isinstance(func, str):
+            if func_obj.import_path != func:
+                raise ValueError(f"Func {name} already registered. (existing is {func_obj})")
         else:
             if func_obj.func is not func:
                 raise ValueError(f"Func {name} already registered. (existing is {func_obj})")
@@ -36,6 +53,13 @@ class _Registry:
     def get(self, name):
         return self.func_name2func.get(name, None)
 
+    def remove(self, name):
+        """Unregister function (and drop its converted GraphQL types)"""
+        self.func_name2func.pop(name)
+        if self._graphql_cache:
+            self._graphql_cache.discard(name)
+        self._schema = None
+
     def summary_view(self, template_name: str = "turtle_shell/overview.html"):
         """Create a summary view.
 
@@ -47,9 +71,16 @@ class _Registry:
 
         class SummaryView(TemplateView):
             def get_context_data(self, **kwargs):
+                from .models import function_stats, FunctionStats
+
                 ctx = super().get_context_data()
                 ctx["registry"] = registry
                 ctx["functions"] = registry.func_name2func.values()
+                stats = function_stats()
+                ctx["function_rows"] = [
+                    (func, stats.get(func.name) or FunctionStats(func_name=func.name))
+                    for func in ctx["functions"]
+                ]
                 return ctx
 
         return SummaryView.as_view(template_name=template_name)
@@ -61,6 +92,7 @@ class _Registry:
         detail_template="turtle_shell/executionresult_detail.html",
         create_template="turtle_shell/executionresult_create.html",
         overview_template="turtle_shell/overview.html",
+        errors_template="turtle_shell/error_groups.html",
     ):
         from django.urls import path
         from . import views
@@ -68,10 +100,11 @@ class _Registry:
         urls = [path("", self.summary_view(template_name=overview_template), name="overview")]
         for func in self.func_name2func.values():
             urls.extend(
-                views.Views.from_function(func, schema=get_registry().schema).urls(
+                views.Views.from_function(func, registry=self).urls(
                     list_template=list_template,
                     detail_template=detail_template,
                     create_template=create_template,
+                    errors_template=errors_template,
                 )
             )
         return _Router(urls=(urls, "turtle_shell"))
@@ -79,8 +112,40 @@ class _Registry:
     def clear(self):
         self.func_name2func.clear()
         self._schema = None
+        self._graphql_cache = None
         assert not self.func_name2func
 
+    @property
+    def manifest(self) -> dict:
+        """Cached signatures/docs by function name (from ``settings.TURTLE_SHELL_MANIFEST``)"""
+        if self._manifest is None:
+            from django.conf import settings
+            from .manifest import read_manifest
+
+            path = getattr(settings, "TURTLE_SHELL_MANIFEST", None)
+            self._manifest = read_manifest(path) if path else {}
+        return self._manifest
+
+    def load_manifest(self, path, *, register: bool = False):
+        """Use manifest at path for docs (and register everything in it lazily if register)"""
+        from .manifest import read_manifest
+
+        self._manifest = read_manifest(path)
+        for name, entry in self._manifest.items():
+            if func_obj := self.get(name):
+                func_obj.manifest_entry = entry
+            elif register:
+                self.add(entry["import_path"], name=name)
+
+    @property
+    def graphql_cache(self):
+        """Converted GraphQL types per function, so schema rebuilds are incremental"""
+        from .graphene_adapter import GraphQLCache
+
+        if not self._graphql_cache:
+            self._graphql_cache = GraphQLCache()
+        return self._graphql_cache
+
     @property
     def schema(self):
         from .graphene_adapter import schema_for_registry
@@ -94,4 +159,14 @@ class _Registry:
 _RegistrySingleton = _Registry()
 get_registry = _Registry.get_registry
 
-from .function_to_form import Text
+
+def autodiscover():
+    """Import ``turtle_tools`` modules from all installed apps (so they can register functions)"""
+    from django.utils.module_loading import autodiscover_modules
+
+    autodiscover_modules("turtle_tools")
+
+
+from .function_to_form import Text, Upload
+from .artifacts import Artifact
+from .commands import register_command
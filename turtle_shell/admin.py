@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Schedule
+
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    list_display = ["name", "func_name", "cron", "enabled", "next_run", "last_run"]
+    list_filter = ["enabled", "func_name"]
+    readonly_fields = ["last_run"]
+
+    def save_model(self, request, obj, form, change):
+        if "cron" in form.changed_data:
+            # recomputed from the new expression on save
+            obj.next_run = None
+        super().save_model(request, obj, form, change)
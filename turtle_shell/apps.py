@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class TurtleShellConfig(AppConfig):
     name = "turtle_shell"
+
+    def ready(self):
+        if getattr(settings, "TURTLE_SHELL_AUTODISCOVER", True):
+            from . import autodiscover
+
+            autodiscover()
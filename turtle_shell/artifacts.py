@@ -0,0 +1,212 @@
+"""
+Artifacts
+---------
+
+Functions can return files or bytes (e.g., BAM files, parquet files, zip archives) instead of
+(or alongside) JSON. Return any of:
+
+    * ``bytes``
+    * a ``pathlib.Path`` to an existing file
+    * ``turtle_shell.Artifact(...)`` (to set name/content type)
+    * a list/tuple of the above, or a dict with some of the above as values
+
+Each one is copied into Django file storage as an ``ExecutionArtifact`` (with size and sha256
+checksum), and replaced in ``output_json`` by its metadata. Downloads support HTTP Range requests
+and can be handed off to the web server so no bytes pass through python at all.
+
+Settings:
+    TURTLE_SHELL_SENDFILE_HEADER: e.g. ``"X-Accel-Redirect"`` (nginx) or ``"X-Sendfile"``
+    TURTLE_SHELL_SENDFILE_PREFIX: prefix for the storage name in that header (e.g. an nginx
+        ``internal`` location), otherwise the file's absolute path is used (storage without
+        local paths is served from python instead)
+"""
+import hashlib
+import mimetypes
+import pathlib
+import re
+from dataclasses import dataclass
+from typing import Optional, Union
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+CHUNK_SIZE = 2 ** 20
+
+
+@dataclass
+class Artifact:
+    """File output of a function (either ``path`` to a file or raw ``data``)"""
+
+    name: Optional[str] = None
+    path: Optional[Union[str, pathlib.Path]] = None
+    data: Optional[bytes] = None
+    content_type: Optional[str] = None
+
+    def __post_init__(self):
+        if (self.path is None) == (self.data is None):
+            raise ValueError("Artifact needs exactly one of path or data")
+        if not self.name:
+            self.name = pathlib.Path(self.path).name if self.path else "output.bin"
+        if not self.content_type:
+            self.content_type = mimetypes.guess_type(self.name)[0] or "application/octet-stream"
+
+    def open(self):
+        if self.path is not None:
+            return open(self.path, "rb")
+        return ContentFile(self.data)
+
+
+def as_artifact(value) -> Optional[Artifact]:
+    if isinstance(value, Artifact):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return Artifact(data=bytes(value))
+    if isinstance(value, pathlib.Path) and value.is_file():
+        return Artifact(path=value)
+    return None
+
+
+def has_artifacts(result) -> bool:
+    if isinstance(result, dict):
+        values = result.values()
+    elif isinstance(result, (list, tuple)):
+        values = result
+    else:
+        values = [result]
+    return any(as_artifact(value) for value in values)
+
+
+def store_artifacts(execution, result):
+    """Save any artifacts in result, returning result with artifacts replaced by metadata"""
+    if not has_artifacts(result):
+        return result
+    if isinstance(result, dict):
+        return {k: _store_if_artifact(execution, v) for k, v in result.items()}
+    if isinstance(result, (list, tuple)):
+        return {"artifacts": [_store_if_artifact(execution, v) for v in result]}
+    return {"artifacts": [_store_if_artifact(execution, result)]}
+
+
+def _store_if_artifact(execution, value):
+    if artifact := as_artifact(value):
+        return store_artifact(execution, artifact).metadata
+    return value
+
+
+def store_artifact(execution, artifact: Artifact):
+    from .models import ExecutionArtifact
+
+    checksum = hashlib.sha256()
+    size = 0
+    with artifact.open() as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            checksum.update(chunk)
+            size += len(chunk)
+    obj = ExecutionArtifact(
+        execution=execution,
+        name=artifact.name,
+        size=size,
+        checksum=checksum.hexdigest(),
+        content_type=artifact.content_type,
+    )
+    with artifact.open() as f:
+        obj.file.save(artifact.name, File(f, name=artifact.name), save=False)
+    obj.save()
+    return obj
+
+
+_range_re = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int):
+    """(start, end) inclusive for a single byte range, None to serve everything.
+
+    Raises ValueError if the range can't be satisfied."""
+    if not header or not (match := _range_re.match(header.strip())):
+        # multiple ranges etc. - just send everything
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # suffix range, i.e., last N bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end) if end else size - 1, size - 1)
+    if start >= size or start > end:
+        raise ValueError(f"Unsatisfiable range {header} for size {size}")
+    return start, end
+
+
+def _read_range(f, start, end):
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def content_disposition(filename: str) -> str:
+    """``Content-Disposition`` for downloading filename (like Django 4.2's
+    ``content_disposition_header``, which also handles quotes and non-ASCII names)"""
+    if filename.isascii() and filename.isprintable():
+        escaped = filename.replace("\\", "\\\\").replace('"', r"\"")
+        return f'attachment; filename="{escaped}"'
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+def _sendfile_target(artifact) -> Optional[str]:
+    """What to put in the sendfile header for artifact (None to serve it from python)"""
+    prefix = getattr(settings, "TURTLE_SHELL_SENDFILE_PREFIX", None)
+    if prefix:
+        return f"{prefix}{artifact.file.name}"
+    try:
+        return artifact.file.path
+    except NotImplementedError:
+        # storage without local files (e.g., S3)
+        return None
+
+
+def serve_artifact(request, artifact):
+    """Response for downloading artifact (honors Range, hands off to web server if configured)"""
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{artifact.checksum}"',
+        "Content-Disposition": content_disposition(artifact.name),
+    }
+    sendfile_header = getattr(settings, "TURTLE_SHELL_SENDFILE_HEADER", None)
+    target = _sendfile_target(artifact) if sendfile_header else None
+    if target:
+        response = HttpResponse(content_type=artifact.content_type)
+        response[sendfile_header] = target
+    else:
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), artifact.size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{artifact.size}"
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(artifact.file.open("rb"), start, end),
+                status=206,
+                content_type=artifact.content_type,
+            )
+            response["Content-Length"] = str(end - start + 1)
+            response["Content-Range"] = f"bytes {start}-{end}/{artifact.size}"
+        else:
+            # FileResponse uses wsgi.file_wrapper, so servers can sendfile() it
+            response = FileResponse(artifact.file.open("rb"), content_type=artifact.content_type)
+    for k, v in headers.items():
+        response[k] = v
+    return response
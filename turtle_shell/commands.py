@@ -0,0 +1,233 @@
+"""
+Shell commands
+--------------
+
+Register a command line as a function, with a form built from the placeholders in its template::
+
+    turtle_shell.register_command(
+        "count_reads", "samtools view -c -@ {threads} {bam}", types={"threads": int}
+    )
+
+Output is read from non-blocking pipes while the command runs and flushed to
+``ExecutionLogChunk`` rows in bounded chunks, so the detail page can show it as it arrives.
+
+Settings:
+    TURTLE_SHELL_LOG_CHUNK_BYTES: flush once this many bytes are buffered (defaults to 64KB)
+    TURTLE_SHELL_LOG_FLUSH_INTERVAL: ...or once this many seconds have passed (defaults to 1)
+    TURTLE_SHELL_LOG_MAX_BYTES: oldest chunks are dropped past this total (defaults to 10MB)
+"""
+import codecs
+import enum
+import inspect
+import os
+import selectors
+import shlex
+import string
+import subprocess
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+READ_SIZE = 2 ** 16
+
+
+class CommandError(Exception):
+    """Command exited with a non-zero status"""
+
+
+class LogWriter:
+    """Buffers output and writes it to the log table in size/time bounded chunks.
+
+    Only the most recent ``max_bytes`` are kept (like a ring buffer), so a chatty command can't
+    fill up the database. Without an execution, nothing is written. Sizes are UTF-8 bytes of the
+    text, both for flushing and for what's kept."""
+
+    def __init__(
+        self,
+        execution=None,
+        *,
+        chunk_bytes: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.execution = execution
+        self.chunk_bytes = chunk_bytes or getattr(settings, "TURTLE_SHELL_LOG_CHUNK_BYTES", 2 ** 16)
+        self.flush_interval = flush_interval or getattr(
+            settings, "TURTLE_SHELL_LOG_FLUSH_INTERVAL", 1.0
+        )
+        self.max_bytes = max_bytes or getattr(settings, "TURTLE_SHELL_LOG_MAX_BYTES", 10 * 2 ** 20)
+        self.buffers: Dict[str, List[str]] = {}
+        self.buffer_bytes: Dict[str, int] = {}
+        self.pending = 0
+        self.total = 0
+        self.seq = 0
+        self.truncated = False
+        self.last_flush = time.monotonic()
+        # (pk, size) of stored chunks, oldest first
+        self._stored = deque()
+        self._stored_bytes = 0
+
+    def write(self, stream: str, text: str):
+        if not text:
+            return
+        size = len(text.encode("utf-8"))
+        self.buffers.setdefault(stream, []).append(text)
+        self.buffer_bytes[stream] = self.buffer_bytes.get(stream, 0) + size
+        self.pending += size
+        self.total += size
+        if self.pending >= self.chunk_bytes:
+            self.flush()
+
+    def maybe_flush(self):
+        if self.pending and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        from .models import ExecutionLogChunk
+
+        buffers, sizes = self.buffers, self.buffer_bytes
+        self.buffers, self.buffer_bytes, self.pending = {}, {}, 0
+        self.last_flush = time.monotonic()
+        if self.execution is None:
+            return
+        for stream, parts in buffers.items():
+            data = "".join(parts)
+            chunk = ExecutionLogChunk.objects.create(
+                execution=self.execution, seq=self.seq, stream=stream, data=data
+            )
+            self.seq += 1
+            self._stored.append((chunk.pk, sizes[stream]))
+            self._stored_bytes += sizes[stream]
+        self._trim()
+
+    def _trim(self):
+        from .models import ExecutionLogChunk
+
+        to_delete = []
+        while self._stored_bytes > self.max_bytes and len(self._stored) > 1:
+            pk, size = self._stored.popleft()
+            self._stored_bytes -= size
+            to_delete.append(pk)
+        if to_delete:
+            self.truncated = True
+            ExecutionLogChunk.objects.filter(pk__in=to_delete).delete()
+
+
+def run_command(argv: List[str], log: LogWriter, *, cwd=None, env=None) -> int:
+    """Run argv, streaming stdout/stderr into log as it arrives. Returns exit code."""
+    proc = subprocess.Popen(
+        argv,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0,
+        cwd=cwd,
+        env=env,
+    )
+    with selectors.DefaultSelector() as selector:
+        for stream, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+            os.set_blocking(pipe.fileno(), False)
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            selector.register(pipe, selectors.EVENT_READ, (stream, decoder))
+        while selector.get_map():
+            for key, _ in selector.select(timeout=log.flush_interval):
+                stream, decoder = key.data
+                try:
+                    data = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    log.write(stream, decoder.decode(b"", final=True))
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    continue
+                log.write(stream, decoder.decode(data))
+            log.maybe_flush()
+    returncode = proc.wait()
+    log.flush()
+    return returncode
+
+
+def template_placeholders(template: str) -> List[str]:
+    """Names of ``{placeholders}`` in template, in order of first appearance"""
+    names = []
+    for token in shlex.split(template):
+        for _, name, _, _ in string.Formatter().parse(token):
+            if name is not None and name not in names:
+                if not name.isidentifier():
+                    raise ValueError(f"Placeholder {{{name}}} in {template!r} must be a name")
+                names.append(name)
+    return names
+
+
+def format_argv(template: str, values: dict) -> List[str]:
+    """Split template like a shell would and fill in each token.
+
+    Values are never re-split or interpreted by a shell. Tokens referring to a ``None`` value are
+    left out (handy for optional flags, e.g. ``--region={region}``)."""
+    values = {k: v.value if isinstance(v, enum.Enum) else v for k, v in values.items()}
+    argv = []
+    for token in shlex.split(template):
+        names = [name for _, name, _, _ in string.Formatter().parse(token) if name is not None]
+        if any(values.get(name) is None for name in names):
+            continue
+        argv.append(token.format(**values))
+    return argv
+
+
+def command_function(
+    name: str,
+    template: str,
+    *,
+    types: Optional[dict] = None,
+    defaults: Optional[dict] = None,
+    doc: Optional[str] = None,
+    cwd=None,
+    env=None,
+):
+    """Build a function (with a proper signature) that runs template"""
+    from .models import current_execution
+
+    types = types or {}
+    defaults = defaults or {}
+    placeholders = template_placeholders(template)
+    unknown = (set(types) | set(defaults)) - set(placeholders)
+    if unknown:
+        raise ValueError(f"{sorted(unknown)} not in template {template!r}")
+
+    def run(**kwargs):
+        argv = format_argv(template, {**defaults, **kwargs})
+        log = LogWriter(current_execution.get())
+        returncode = run_command(argv, log, cwd=cwd, env=env)
+        if returncode:
+            raise CommandError(f"{shlex.join(argv)} exited with status {returncode}")
+        return {"returncode": returncode, "log_bytes": log.total, "truncated": log.truncated}
+
+    parameters = [
+        inspect.Parameter(
+            placeholder,
+            inspect.Parameter.KEYWORD_ONLY,
+            default=defaults.get(placeholder, inspect.Parameter.empty),
+            annotation=types.get(placeholder, str),
+        )
+        for placeholder in placeholders
+    ]
+    run.__name__ = run.__qualname__ = name
+    run.__doc__ = doc or f"Run ``{template}``"
+    run.__annotations__ = {p.name: p.annotation for p in parameters}
+    run.__annotations__["return"] = dict
+    run.__signature__ = inspect.Signature(parameters, return_annotation=dict)
+    run.command_template = template
+    # for version fingerprinting (all commands share run's source)
+    run.__turtle_shell_source__ = repr((template, types, defaults, cwd, env))
+    return run
+
+
+def register_command(name: str, template: str, *, config=None, registry=None, **kwargs):
+    """Register a shell command, see module docstring (kwargs go to ``command_function``)"""
+    from . import get_registry
+
+    registry = registry or get_registry()
+    return registry.add(command_function(name, template, **kwargs), name=name, config=config)
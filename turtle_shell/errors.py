@@ -0,0 +1,72 @@
+"""
+Error groups
+------------
+
+Tracebacks are stored once per distinct failure in ``ErrorTraceback``, keyed by a hash of the
+normalized traceback, and executions only point at them. A function failing the same way 100k
+times stores one traceback, and counting failures per group is an indexed aggregate (see the
+``errors-<func>`` view).
+
+Normalization keeps the exception types and the stack (file, line, function) of the exception and
+everything it was chained from, but drops messages, which tend to contain ids, addresses and other
+per-execution noise. The stored text is the traceback of the first failure in the group; the
+message of every execution is still in its ``error_json``.
+"""
+import hashlib
+import re
+import traceback as tb
+from typing import List
+
+_frame_re = re.compile(r'^  File "(?P<filename>.*)", line (?P<lineno>\d+), in (?P<name>.*)$')
+_chain_lines = (
+    "Traceback (most recent call last):",
+    "The above exception was the direct cause of the following exception:",
+    "During handling of the above exception, another exception occurred:",
+)
+
+
+def _type_name(exc_type: type) -> str:
+    # same as what traceback prints
+    module = exc_type.__module__
+    if module in ("__main__", "builtins"):
+        return exc_type.__qualname__
+    return f"{module}.{exc_type.__qualname__}"
+
+
+def exception_key(exc: BaseException) -> str:
+    """Normalized description of exc (see module docstring) - same format as ``text_key``"""
+    blocks: List[List[str]] = []
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        frames = [f"{f.filename}:{f.lineno}:{f.name}" for f in tb.extract_tb(exc.__traceback__)]
+        blocks.append(frames + [_type_name(type(exc))])
+        exc = exc.__cause__ or (None if exc.__suppress_context__ else exc.__context__)
+    # tracebacks print the earliest exception in the chain first
+    return "\n".join(line for block in reversed(blocks) for line in block)
+
+
+def text_key(text: str) -> str:
+    """Normalized description of an already formatted traceback"""
+    parts = []
+    in_message = False
+    for line in text.strip().splitlines():
+        match = _frame_re.match(line)
+        if match:
+            parts.append("{filename}:{lineno}:{name}".format(**match.groupdict()))
+            in_message = False
+        elif line.strip() in _chain_lines:
+            in_message = False
+        elif line and not line[0].isspace() and not in_message:
+            # "ValueError: message" (messages can span lines, only the first one counts)
+            parts.append(line.split(":", 1)[0])
+            in_message = True
+    return "\n".join(parts)
+
+
+def digest(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def format_exception(exc: BaseException) -> str:
+    return "".join(tb.format_exception(type(exc), exc, exc.__traceback__))
@@ -0,0 +1,54 @@
+"""
+Filtering executions
+--------------------
+
+Filters for the ``executionResults`` GraphQL connection.
+
+Input search only matches top level scalar inputs, through the indexed ``ExecutionInput`` table.
+It takes ``key=value`` pairs joined with ``&`` (URL-encoded like a query string)::
+
+    executionResults(funcName: "my_func", input: "analysis_id=X&sample=Y") { ... }
+
+The list view has the same search as ``?input=analysis_id=X`` (repeated for more pairs).
+
+Everything else is a plain column filter, with ``orderBy`` limited to ``created``/``modified``
+(descending with ``-``). Each filter has an index starting with ``func_name`` and ending with
+``created`` (see ``ExecutionResult.Meta.indexes``), so filtering one function's history and
+paging through it with ``KeysetConnectionField`` stays an index range scan.
+"""
+from urllib.parse import parse_qsl
+
+import django_filters
+
+from .models import ExecutionResult
+
+
+def parse_input_filter(text: str) -> dict:
+    """``"a=1&b=2"`` -> ``{"a": "1", "b": "2"}``"""
+    return dict(parse_qsl(text, keep_blank_values=True))
+
+
+class ExecutionResultFilter(django_filters.FilterSet):
+    # fields you can order by (ties are broken by uuid), all indexed
+    ORDERING_FIELDS = ("created", "modified")
+
+    input = django_filters.CharFilter(
+        method="filter_input", label="Top level inputs, as key=value pairs joined with &"
+    )
+    order_by = django_filters.OrderingFilter(fields=ORDERING_FIELDS)
+
+    class Meta:
+        model = ExecutionResult
+        fields = {
+            "func_name": ["exact"],
+            "func_version": ["exact"],
+            "uuid": ["exact"],
+            "status": ["exact", "in"],
+            "created": ["gte", "lt"],
+            "modified": ["gte", "lt"],
+            "user": ["exact"],
+            "user__username": ["exact"],
+        }
+
+    def filter_input(self, queryset, name, value):
+        return queryset.with_inputs(parse_input_filter(value))
@@ -7,20 +7,29 @@ Converts function signatures into django forms.
 NOTE: with enums it's recommended to use the string version, since the value will be used as the
 representation to the user (and generally numbers aren't that valuable)
 """
+import datetime
+import decimal
 import enum
+import functools
+import hashlib
+import importlib
 import inspect
 import re
+import sys
 import typing
+import uuid
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from django import forms
 from django.db.models import TextChoices
+from django.utils import dateparse
 from defopt import Parameter, signature, _parse_docstring
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional, Tuple
 from typing import Type
 import pathlib
 
 from . import utils
+from .uploads import UploadField
 
 
 class Text(str):
@@ -29,30 +38,256 @@ class Text(str):
     pass
 
 
+class Upload(type(pathlib.Path())):
+    """Annotate a parameter with this to get a file upload (see ``turtle_shell.uploads``).
+
+    The function receives the local path of the uploaded file."""
+
+    def mmap(self):
+        """Read-only memory map of the file"""
+        import mmap
+
+        with open(self, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
 type2field_type = {
     int: forms.IntegerField,
+    float: forms.FloatField,
     str: forms.CharField,
     bool: forms.BooleanField,
     Optional[bool]: forms.NullBooleanField,
     Text: forms.CharField,
     pathlib.Path: forms.CharField,
+    Upload: UploadField,
     dict: forms.JSONField,
+    list: forms.JSONField,
+    datetime.datetime: forms.DateTimeField,
+    datetime.date: forms.DateField,
+    datetime.time: forms.TimeField,
+    decimal.Decimal: forms.DecimalField,
+    uuid.UUID: forms.UUIDField,
 }
 
 type2widget = {Text: forms.Textarea()}
 
 
+class FieldDispatcher:
+    """Resolves parameters to form field types and widgets.
+
+    Lookup order for both fields and widgets:
+        1. param.name (i.e., something custom specified by user)
+        2. param.annotation
+        3. underlying type (i.e., unwrapping typing.Optional), walking its MRO so the closest
+           registered base class wins.
+
+    Step 3 is cached per type, so registering lots of functions with wide signatures only pays
+    for each distinct type once."""
+
+    def __init__(self, fields: dict, widgets: dict):
+        self.fields = fields
+        self.widgets = widgets
+        self._cache = {}
+
+    def register(self, kind, field_type=None, *, widget=None):
+        """Register (or override) the field type and/or widget for a type"""
+        if field_type:
+            self.fields[kind] = field_type
+        if widget:
+            self.widgets[kind] = widget
+        self._cache.clear()
+
+    def with_config(self, config: Optional[dict]) -> "FieldDispatcher":
+        """Dispatcher with the ``fields``/``widgets`` overrides from config applied"""
+        config = config or {}
+        if not (config.get("fields") or config.get("widgets")):
+            return self
+        return type(self)(
+            {**self.fields, **(config.get("fields") or {})},
+            {**self.widgets, **(config.get("widgets") or {})},
+        )
+
+    def field_type(self, param: Parameter, kind):
+        return self._lookup(self.fields, param, kind)
+
+    def widget(self, param: Parameter, kind):
+        return self._lookup(self.widgets, param, kind)
+
+    def _lookup(self, dct, param, kind):
+        if elem := dct.get(param.name, dct.get(param.annotation)):
+            return elem
+        key = (id(dct), kind)
+        if key not in self._cache:
+            self._cache[key] = self._resolve(dct, kind)
+        return self._cache[key]
+
+    @staticmethod
+    def _resolve(dct, kind):
+        for klass in getattr(kind, "__mro__", (kind,)):
+            if (elem := dct.get(klass)) is not None:
+                return elem
+        return None
+
+
+default_dispatcher = FieldDispatcher(type2field_type, type2widget)
+
+# JSON stores these as strings, so they need converting back before calling the function
+type2restore = {
+    datetime.datetime: dateparse.parse_datetime,
+    datetime.date: dateparse.parse_date,
+    datetime.time: dateparse.parse_time,
+    decimal.Decimal: decimal.Decimal,
+    uuid.UUID: uuid.UUID,
+    Upload: Upload,
+}
+
+
 @dataclass
 class _Function:
-    func: callable
+    """A registered function.
+
+    Functions registered by dotted path (``"pkg.module:func"``) aren't imported until something
+    needs ``func`` or ``form_class``. If a manifest entry is available (see
+    ``turtle_shell.manifest``), ``doc`` comes from there without importing anything."""
+
     name: str
-    form_class: object
-    doc: str
+    config: Optional[dict] = None
+    import_path: Optional[str] = None
+    manifest_entry: Optional[dict] = field(default=None, repr=False)
+    _func: Optional[Callable] = field(default=None, repr=False)
+    _form_class: Optional[Type[forms.Form]] = field(default=None, repr=False)
+    _version: Optional[str] = field(default=None, repr=False)
+
+    @classmethod
+    def from_function(cls, func, *, name, config=None, manifest_entry=None):
+        import_path = function_import_path(func)
+        if manifest_entry and not (
+            import_path
+            and manifest_entry["import_path"] == import_path
+            and _same_parameters(func, manifest_entry)
+        ):
+            # stale manifest
+            manifest_entry = None
+        func_obj = cls(
+            name=name,
+            config=config,
+            import_path=import_path,
+            manifest_entry=manifest_entry,
+            _func=func,
+        )
+        if not manifest_entry:
+            # build form eagerly so unsupported signatures fail at registration time (the
+            # manifest build already checked this otherwise)
+            func_obj.form_class
+            func_obj.version
+        return func_obj
 
     @classmethod
-    def from_function(cls, func, *, name, config=None):
-        form_class = function_to_form(func, name=name, config=config)
-        return cls(func=func, name=name, form_class=form_class, doc=form_class.__doc__)
+    def from_import_path(cls, import_path, *, name, config=None, manifest_entry=None):
+        return cls(name=name, config=config, import_path=import_path, manifest_entry=manifest_entry)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._func is not None
+
+    @property
+    def module_name(self) -> Optional[str]:
+        return split_import_path(self.import_path)[0] if self.import_path else None
+
+    @property
+    def func(self) -> Callable:
+        if self._func is None:
+            module_name, attr_path = split_import_path(self.import_path)
+            obj = importlib.import_module(module_name)
+            for attr in attr_path.split("."):
+                obj = getattr(obj, attr)
+            self._func = obj
+        return self._func
+
+    @property
+    def form_class(self) -> Type[forms.Form]:
+        if self._form_class is None:
+            self._form_class = function_to_form(self.func, name=self.name, config=self.config)
+        return self._form_class
+
+    @property
+    def doc(self) -> str:
+        if self._form_class is None and self.manifest_entry:
+            return self.manifest_entry["doc"]
+        return self.form_class.__doc__
+
+    @property
+    def version(self) -> str:
+        """Fingerprint of the function's source (and ``config["version"]``, if set).
+
+        Stored on every execution, so results are only reused within the same version. Comes from
+        the manifest entry if there is one (``turtle_shell_manifest --check`` catches edits that
+        didn't rebuild it)."""
+        if self._version is None:
+            if self.manifest_entry and self.manifest_entry.get("version"):
+                self._version = self.manifest_entry["version"]
+            else:
+                self._version = self.source_version()
+        return self._version
+
+    def source_version(self) -> str:
+        """``version`` as of the current source, ignoring the manifest (imports the function!)"""
+        return function_version(self.func, (self.config or {}).get("version"))
+
+    @property
+    def single_flight(self) -> bool:
+        """If True, identical submissions attach to an in-flight execution instead of running"""
+        return bool((self.config or {}).get("single_flight"))
+
+
+def _same_parameters(func, manifest_entry: dict) -> bool:
+    """Whether manifest_entry still has func's parameter names and defaults (cheap, unlike the
+    source hash and docstring parsing of a full manifest check)"""
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    current = [
+        (param.name, None if param.default is param.empty else repr(param.default))
+        for param in parameters
+        # private parameters aren't in the manifest (see defopt.signature)
+        if not param.name.startswith("_")
+    ]
+    return current == [(param["name"], param["default"]) for param in manifest_entry["parameters"]]
+
+
+def function_version(func, explicit_version=None) -> str:
+    """``"<explicit version>-<source hash>"`` (or just the hash if there's no explicit version)"""
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        # e.g., defined in a REPL - fall back to bytecode
+        code = getattr(func, "__code__", None)
+        source = repr((code.co_code, code.co_consts)) if code else func.__qualname__
+    # functions built at runtime (e.g. register_command) share source, so they add their own
+    source += getattr(func, "__turtle_shell_source__", "")
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return f"{explicit_version}-{digest}" if explicit_version else digest
+
+
+def function_import_path(func) -> Optional[str]:
+    """``"pkg.module:func"`` that imports func (None if it can't be imported, e.g. functions built
+    at runtime by ``register_command``, so it can't be registered lazily either)"""
+    obj = sys.modules.get(func.__module__)
+    for attr in func.__qualname__.split("."):
+        obj = getattr(obj, attr, None)
+    return f"{func.__module__}:{func.__qualname__}" if obj is func else None
+
+
+def split_import_path(import_path: str) -> Tuple[str, str]:
+    """``"pkg.module:func"`` (or ``"pkg.module.func"``) -> ``("pkg.module", "func")``"""
+    if ":" in import_path:
+        module_name, _, attr_path = import_path.partition(":")
+    else:
+        module_name, _, attr_path = import_path.rpartition(".")
+    if not module_name or not attr_path:
+        raise ValueError(f"Invalid import path {import_path!r} (expected 'pkg.module:func')")
+    return module_name, attr_path
 
 
 def doc_mapping(str) -> Dict[str, str]:
@@ -69,11 +304,12 @@ def function_to_form(func, *, config: dict = None, name: str = None) -> Type[for
     """
     name = name or func.__qualname__
     sig = signature(func)
+    dispatcher = default_dispatcher.with_config(config)
     # i.e., class body for form
     fields = {}
     defaults = {}
     for parameter in sig.parameters.values():
-        field = param_to_field(parameter, config)
+        field = param_to_field(parameter, config, dispatcher=dispatcher)
         fields[parameter.name] = field
         if parameter.default is not Parameter.empty:
             defaults[parameter.name] = parameter.default
@@ -81,7 +317,11 @@ def function_to_form(func, *, config: dict = None, name: str = None) -> Type[for
             field._parameter_name = parameter.name
             field._func_name = name
             if parameter.default and parameter.default is not Parameter.empty:
-                for potential_default in [parameter.default.name, parameter.default.value]:
+                if isinstance(parameter.default, enum.Enum):
+                    potential_defaults = [parameter.default.name, parameter.default.value]
+                else:
+                    potential_defaults = [str(parameter.default)]
+                for potential_default in potential_defaults:
                     if any(potential_default == x[0] for x in field.choices):
                         defaults[parameter.name] = potential_default
                         break
@@ -89,19 +329,22 @@ def function_to_form(func, *, config: dict = None, name: str = None) -> Type[for
                     raise ValueError(
                         f"Cannot figure out how to assign default for {parameter.name}: {parameter.default}"
                     )
-    fields["__doc__"] = re.sub("\n+", "\n", _parse_docstring(inspect.getdoc(func)).text)
+    fields["__doc__"] = form_doc(func)
     form_name = "".join(part.capitalize() for part in func.__name__.split("_"))
 
     class BaseForm(forms.Form):
         _func = func
         _input_defaults = defaults
         # use this for ignoring extra args from createview and such
-        def __init__(self, *a, instance=None, user=None, **k):
+        def __init__(self, *a, instance=None, user=None, upload_token=None, **k):
             from crispy_forms.helper import FormHelper
             from crispy_forms.layout import Submit
 
             super().__init__(*a, **k)
             self.user = user
+            for field in self.fields.values():
+                if isinstance(field, UploadField):
+                    field.upload_token = upload_token
             self.helper = FormHelper(self)
             self.helper.add_input(Submit("submit", "Execute!"))
 
@@ -112,24 +355,52 @@ def function_to_form(func, *, config: dict = None, name: str = None) -> Type[for
         def save(self):
             from .models import ExecutionResult
 
-            obj = ExecutionResult(func_name=name, input_json=self.cleaned_data, user=self.user)
-            obj.save()
-            return obj
+            return ExecutionResult.objects.create_execution(
+                func_name=name, input_json=self.cleaned_data, user=self.user
+            )
 
     return type(form_name, (BaseForm,), fields)
 
 
+def restore_input_types(func, input_json: dict) -> dict:
+    """Convert JSON-ified inputs (e.g., isoformat datetimes) back to their annotated types"""
+    restored = dict(input_json)
+    for name, param in inspect.signature(func).parameters.items():
+        annotation = param.annotation
+        if is_optional(annotation):
+            annotation = typing.get_args(annotation)[0]
+        restore = type2restore.get(annotation)
+        if restore and isinstance(restored.get(name), str):
+            restored[name] = restore(restored[name])
+    return restored
+
+
+def form_doc(func) -> str:
+    """Docstring for func's form (i.e., without the parameter docs)"""
+    return re.sub("\n+", "\n", _parse_docstring(inspect.getdoc(func)).text)
+
+
 def is_optional(annotation):
     if args := typing.get_args(annotation):
         return len(args) == 2 and args[-1] == type(None)
 
 
 def get_type_from_annotation(param: Parameter):
-    if is_optional(param.annotation):
-        return typing.get_args(param.annotation)[0]
-    if typing.get_origin(param.annotation):
+    annotation = param.annotation
+    if is_optional(annotation):
+        annotation = typing.get_args(annotation)[0]
+    if origin := typing.get_origin(annotation):
+        # e.g., List[int] is just a list, Literal is handled separately
+        if origin in (list, dict, typing.Literal):
+            return origin
         raise ValueError(f"Field {param.name}: type class {param.annotation} not supported")
-    return param.annotation
+    return annotation
+
+
+def get_literal_values(annotation) -> tuple:
+    if is_optional(annotation):
+        annotation = typing.get_args(annotation)[0]
+    return typing.get_args(annotation)
 
 
 @dataclass
@@ -176,28 +447,41 @@ class Coercer:
         assert False, "Should not get here"
 
 
-def param_to_field(param: Parameter, config: dict = None) -> forms.Field:
+@dataclass
+class LiteralCoercer:
+    """Map submitted strings back to the original ``Literal[...]`` values"""
+
+    values: tuple
+
+    def __call__(self, value):
+        for literal in self.values:
+            if value == literal or value == str(literal):
+                return literal
+        raise ValueError(f"{value!r} is not one of {self.values}")
+
+
+def param_to_field(
+    param: Parameter, config: dict = None, *, dispatcher: FieldDispatcher = None
+) -> forms.Field:
     """Convert a specific arg to a django form field.
 
-    See function_to_form for config definition."""
-    config = config or {}
-    all_types = {**type2field_type, **(config.get("fields") or {})}
-    widgets = {**type2widget, **(config.get("widgets") or {})}
+    See function_to_form for config definition (dispatcher takes precedence over config if
+    passed in)."""
+    dispatcher = dispatcher or default_dispatcher.with_config(config)
     field_type = None
     kwargs = {}
     kind = get_type_from_annotation(param)
-    is_enum_class = False
-    try:
-        is_enum_class = issubclass(kind, enum.Enum)
-    except TypeError:
-        # e.g. stupid generic type stuff
-        pass
-    if is_enum_class:
+    if is_enum_class(kind):
         utils.EnumRegistry.register(kind)
         field_type = forms.TypedChoiceField
         kwargs.update(make_enum_kwargs(param=param, kind=kind))
+    elif kind is typing.Literal:
+        field_type = forms.TypedChoiceField
+        values = get_literal_values(param.annotation)
+        kwargs["choices"] = [(str(v), str(v)) for v in values]
+        kwargs["coerce"] = LiteralCoercer(values)
     else:
-        field_type = get_for_param_by_type(all_types, param=param, kind=kind)
+        field_type = dispatcher.field_type(param, kind)
     if not field_type:
         raise ValueError(f"Field {param.name}: Unknown field type: {param.annotation}")
     # do not overwrite kwargs if already specified
@@ -205,49 +489,47 @@ def param_to_field(param: Parameter, config: dict = None) -> forms.Field:
     if field_type == forms.BooleanField and param.default is None:
         field_type = forms.NullBooleanField
 
-    widget = get_for_param_by_type(widgets, param=param, kind=kind)
+    widget = dispatcher.widget(param, kind)
     if widget:
         kwargs["widget"] = widget
     return field_type(**kwargs)
 
 
+@functools.lru_cache(maxsize=None)
+def is_enum_class(kind) -> bool:
+    return inspect.isclass(kind) and issubclass(kind, enum.Enum)
+
+
 def make_enum_kwargs(kind, param):
-    kwargs = {}
-    if all(isinstance(member.value, int) for member in kind):
-        kwargs["choices"] = TextChoices(
-            f"{kind.__name__}Enum", {member.name: (member.name, member.name) for member in kind}
-        ).choices
-        kwargs["coerce"] = Coercer(kind, by_attribute=True)
-    else:
-        # we set up all the kinds of entries to make it a bit easier to do the names and the
-        # values...
-        kwargs["choices"] = TextChoices(
-            f"{kind.__name__}Enum",
-            dict(
-                [(member.name, (str(member.value), member.name)) for member in kind]
-                + [(str(member.value), (member.name, member.name)) for member in kind]
-            ),
-        ).choices
-        kwargs["coerce"] = Coercer(kind)
+    kwargs = dict(_enum_choices_and_coercer(kind))
     # coerce back
     if isinstance(param.default, kind):
         kwargs["initial"] = param.default.value
     return kwargs
 
 
-def get_for_param_by_type(dct, *, param, kind):
-    """Grab the appropriate element out of dict based on param type.
+@functools.lru_cache(maxsize=None)
+def _enum_choices_and_coercer(kind) -> tuple:
+    if all(isinstance(member.value, int) for member in kind):
+        choices = TextChoices(
+            f"{kind.__name__}Enum", {member.name: (member.name, member.name) for member in kind}
+        ).choices
+        return (("choices", choices), ("coerce", Coercer(kind, by_attribute=True)))
+    # we set up all the kinds of entries to make it a bit easier to do the names and the
+    # values...
+    choices = TextChoices(
+        f"{kind.__name__}Enum",
+        dict(
+            [(member.name, (str(member.value), member.name)) for member in kind]
+            + [(str(member.value), (member.name, member.name)) for member in kind]
+        ),
+    ).choices
+    return (("choices", choices), ("coerce", Coercer(kind)))
+
 
-    Ordering:
-        1. param.name (i.e., something custom specified by user)
-        2. param.annotation
-        3. underlying type if typing.Optional
-    """
-    if elem := dct.get(param.name, dct.get(param.annotation, dct.get(kind))):
-        return elem
-    for k, v in dct.items():
-        if inspect.isclass(k) and issubclass(kind, k) or k == kind:
-            return v
+@functools.lru_cache(maxsize=None)
+def _accepts_empty_value(field_type) -> bool:
+    return "empty_value" in inspect.signature(field_type).parameters
 
 
 def extra_kwargs(field_type, param):
@@ -257,7 +539,7 @@ def extra_kwargs(field_type, param):
     elif param.default is None:
         kwargs["required"] = False
         # need this so that empty values get passed through to function correctly!
-        if "empty_value" in inspect.signature(field_type).parameters:
+        if _accepts_empty_value(field_type):
             kwargs["empty_value"] = None
     else:
         kwargs["required"] = False
@@ -1,13 +1,19 @@
+import contextvars
 import json
 import graphene
 from graphene_django.forms.mutation import DjangoFormMutation
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
 from graphene import relay
+from graphql.language import ast
 from . import models
 from graphene_django.forms import converter as graphene_django_converter
 from django import forms
 from . import utils
+from .filters import ExecutionResultFilter
+from .graphene_adapter_jsonstring import CustomEncoderJSONString, RawJSON
+from .pagination import KeysetConnectionField
+from .routers import mark_write, read_alias
+from .uploads import UploadField
 
 # PATCH IT GOOD!
 import turtle_shell.graphene_adapter_jsonstring
@@ -16,28 +22,8 @@ import turtle_shell.graphene_adapter_jsonstring
 from turtle_shell import pydantic_adapter
 
 
-_seen_names: set = set()
-
-# class FakeJSONModule:
-#     @classmethod
-#     def loads(self, *a, **k):
-#         return json.loads(*a, **k)
-#
-#     @classmethod
-#     def dumps(self, *a, **k):
-#         k['cls'] = utils.EnumAwareEncoder
-#         return json.dumps(*a, **k)
-#
-#     @classmethod
-#     def dump(self, *a, **k):
-#         k['cls'] = utils.EnumAwareEncoder
-#         return json.dump(*a, **k)
-#
-# import graphene_django.views
-# import graphene.types.json
-#
-# graphene_django.views.json = FakeJSONModule
-# graphene.types.json.json = FakeJSONModule
+# cache in use by whichever registry is currently converting functions (see GraphQLCache)
+_current_cache = contextvars.ContextVar("turtle_shell_graphql_cache", default=None)
 
 
 @graphene_django_converter.convert_form_field.register(forms.TypedChoiceField)
@@ -45,46 +31,187 @@ def convert_form_field_to_choice(field):
     # TODO: this should really be ported back to graphene django
     from graphene_django.converter import convert_choice_field_to_enum
 
-    name = full_name = f"{field._func_name}{field._parameter_name}"
-    index = 0
-    while full_name in _seen_names:
-        index += 1
-        full_name = f"{name}{index}"
-    EnumCls = convert_choice_field_to_enum(field, name=full_name)
-    converted = EnumCls(description=field.help_text, required=field.required)
-    _seen_names.add(full_name)
+    if not hasattr(field, "_func_name"):
+        # e.g. model choices in filters, not a function parameter
+        return graphene_django_converter.convert_form_field_to_string(field)
+    cache = _current_cache.get() or _fallback_cache
+    key = (field._func_name, field._parameter_name)
+    if not (EnumCls := cache.enums.get(key)):
+        EnumCls = convert_choice_field_to_enum(field, name=cache.enum_name(key))
+        cache.enums[key] = EnumCls
+    return EnumCls(description=field.help_text, required=field.required)
 
-    return converted
+
+class GraphQLCache:
+    """Converted graphene types for a registry, so schema rebuilds only convert new functions.
+
+    Enum names are deterministic: ``{func_name}{parameter_name}``, with a numeric suffix only on
+    collisions within this cache (i.e., within one registry)."""
+
+    def __init__(self):
+        self.mutations = {}
+        self.enums = {}
+        self.enum_names = {}
+
+    def enum_name(self, key):
+        name = full_name = f"{key[0]}{key[1]}"
+        index = 0
+        while self.enum_names.get(full_name, key) != key:
+            index += 1
+            full_name = f"{name}{index}"
+        self.enum_names[full_name] = key
+        return full_name
+
+    def get_mutation(self, func_object):
+        if func_object.name not in self.mutations:
+            token = _current_cache.set(self)
+            try:
+                self.mutations[func_object.name] = func_to_graphene_form_mutation(func_object)
+            finally:
+                _current_cache.reset(token)
+        return self.mutations[func_object.name]
+
+    def discard(self, func_name):
+        """Drop everything converted for func_name"""
+        self.mutations.pop(func_name, None)
+        for key in [key for key in self.enums if key[0] == func_name]:
+            del self.enums[key]
+        self.enum_names = {k: v for k, v in self.enum_names.items() if v[0] != func_name}
+
+
+# for converting forms outside of a registry
+_fallback_cache = GraphQLCache()
+
+
+class ExecutionArtifact(DjangoObjectType):
+    url = graphene.String(description="Download URL (supports Range requests)")
+    # GraphQL Int is only 32 bits
+    size = graphene.Float(description="Size in bytes")
+
+    class Meta:
+        model = models.ExecutionArtifact
+        fields = ["name", "size", "checksum", "content_type", "created"]
+
+    def resolve_url(self, info):
+        url = self.get_absolute_url()
+        build_absolute_uri = getattr(info.context, "build_absolute_uri", None)
+        return build_absolute_uri(url) if build_absolute_uri else url
+
+
+JSON_PATH_ARG = graphene.String(
+    description='Only return the value at this path, e.g. "fastq_summary.p95" or "rows.0.name"'
+)
 
 
 class ExecutionResult(DjangoObjectType):
     class Meta:
         model = models.ExecutionResult
         interfaces = (relay.Node,)
-        filter_fields = {
-            "func_name": ["exact"],
-            "uuid": ["exact"],
-        }
+        filterset_class = ExecutionResultFilter
         fields = [
             "uuid",
             "func_name",
+            "func_version",
             "status",
             "input_json",
             "output_json",
             "error_json",
             "created",
             "modified",
+            "artifacts",
             # TODO: will need this to be set up better
             # "user"
         ]
 
+    input_json = graphene.Field(graphene.NonNull(CustomEncoderJSONString), path=JSON_PATH_ARG)
+    output_json = graphene.Field(CustomEncoderJSONString, path=JSON_PATH_ARG)
+
+    # the biggest fields, passed through as the text in the database instead of being decoded
+    # into python objects just to be encoded again
+    RAW_JSON_FIELDS = ("input_json", "output_json")
+
+    @classmethod
+    def get_queryset(cls, queryset, info):
+        queryset = queryset.using(read_alias(info.context)).defer(*cls.RAW_JSON_FIELDS)
+        for field, path in _selected_json_fields(info):
+            if path:
+                # only the subtree leaves the database (and gets decoded)
+                queryset = queryset.with_json_path(field, path)
+            elif field in cls.RAW_JSON_FIELDS:
+                queryset = queryset.with_json_text(field)
+        return queryset
+
+    def resolve_input_json(self, info, path=None):
+        return _json_value(self, "input_json", path)
+
+    def resolve_output_json(self, info, path=None):
+        return _json_value(self, "output_json", path)
+
+
+def _json_value(execution, field, path=None):
+    # executions that didn't come from get_queryset (e.g., mutation payloads) are decoded as usual
+    if path:
+        alias = models.ExecutionResult.json_path_alias(field, path)
+        if hasattr(execution, alias):
+            text = getattr(execution, alias)
+            return RawJSON("null" if text is None else text)
+        value = utils.json_path_get(getattr(execution, field), path)
+        # JSON null rather than a GraphQL null for missing keys
+        return RawJSON("null") if value is None else value
+    if hasattr(execution, f"{field}_text"):
+        text = execution.json_text(field)
+        return RawJSON(text) if text is not None else None
+    return getattr(execution, field)
+
+
+_JSON_FIELD_NAMES = {"inputJson": "input_json", "outputJson": "output_json"}
+
+
+def _selected_json_fields(info) -> set:
+    """{(field, path or None)} of JSON fields selected anywhere below the current field"""
+    selected = set()
+
+    def argument_value(node):
+        if isinstance(node, ast.Variable):
+            return info.variable_values.get(node.name.value)
+        return getattr(node, "value", None)
+
+    def visit(selection_set, seen_fragments):
+        for selection in (selection_set and selection_set.selections) or []:
+            if isinstance(selection, ast.FragmentSpread):
+                name = selection.name.value
+                if name not in seen_fragments and name in info.fragments:
+                    visit(info.fragments[name].selection_set, seen_fragments | {name})
+            elif isinstance(selection, ast.InlineFragment):
+                visit(selection.selection_set, seen_fragments)
+            elif selection.name.value in _JSON_FIELD_NAMES:
+                arguments = {arg.name.value: arg.value for arg in selection.arguments or []}
+                path = argument_value(arguments["path"]) if "path" in arguments else None
+                selected.add((_JSON_FIELD_NAMES[selection.name.value], path or None))
+            else:
+                visit(selection.selection_set, seen_fragments)
+
+    for field_ast in info.field_asts:
+        visit(field_ast.selection_set, frozenset())
+    return selected
+
 
 def func_to_graphene_form_mutation(func_object):
     form_class = func_object.form_class
-    defaults = getattr(func_object.form_class, "_input_defaults", None) or {}
+    # uploads are only accepted from the request that streamed them (see turtle_shell.uploads),
+    # which a GraphQL request never does, so they're left out of the input
+    uploads = [
+        name for name, field in form_class.base_fields.items() if isinstance(field, UploadField)
+    ]
+    defaults = {
+        k: v
+        for k, v in (getattr(func_object.form_class, "_input_defaults", None) or {}).items()
+        if k not in uploads
+    }
 
     class Meta:
         form_class = func_object.form_class
+        exclude_fields = uploads
 
     @classmethod
     def mutate_and_get_payload(cls, root, info, **input):
@@ -104,8 +231,11 @@ def func_to_graphene_form_mutation(func_object):
     @classmethod
     def perform_mutate(cls, form, info):
         obj = form.save()
+        mark_write(info.context)
+        if obj.attached or models.use_queued_execution():
+            # identical execution already in flight (or a worker will get to it)
+            return cls(errors=[], execution=obj)
         all_results = obj.execute()
-        obj.save()
         kwargs = {"execution": obj}
         if hasattr(all_results, "dict"):
             for k, f in fields.items():
@@ -140,21 +270,23 @@ def func_to_graphene_form_mutation(func_object):
     return DefaultOperationMutation
 
 
-def schema_for_registry(registry):
-    # TODO: make this more flexible!
-    class Query(graphene.ObjectType):
-        execution_results = DjangoFilterConnectionField(ExecutionResult)
-        execution_result = graphene.Field(ExecutionResult, uuid=graphene.String())
+# TODO: make this more flexible!
+class Query(graphene.ObjectType):
+    execution_results = KeysetConnectionField(ExecutionResult)
+    execution_result = graphene.Field(ExecutionResult, uuid=graphene.String())
 
-        def resolve_execution_result(cls, info, uuid):
-            try:
-                return models.ExecutionResult.objects.get(pk=uuid)
-            except models.ExecutionResult.DoesNotExist:
-                pass
+    def resolve_execution_result(cls, info, uuid):
+        try:
+            return ExecutionResult.get_queryset(models.ExecutionResult.objects, info).get(pk=uuid)
+        except models.ExecutionResult.DoesNotExist:
+            pass
 
+
+def schema_for_registry(registry):
+    cache = getattr(registry, "graphql_cache", None) or GraphQLCache()
     mutation_fields = {}
     for func_obj in registry.func_name2func.values():
-        mutation = func_to_graphene_form_mutation(func_obj)
+        mutation = cache.get_mutation(func_obj)
         mutation_fields[f"execute_{func_obj.name}"] = mutation.Field()
     Mutation = type("Mutation", (graphene.ObjectType,), mutation_fields)
     return graphene.Schema(query=Query, mutation=Mutation)
@@ -7,6 +7,10 @@ from graphql.language import ast
 from graphene.types.scalars import Scalar
 
 
+class RawJSON(str):
+    """Already encoded JSON text (e.g., straight from the database), serialized as is"""
+
+
 class CustomEncoderJSONString(Scalar):
     """
     Allows use of a JSON String for input / output from the GraphQL schema.
@@ -19,6 +23,8 @@ class CustomEncoderJSONString(Scalar):
     def serialize(dt):
         from turtle_shell import utils
 
+        if isinstance(dt, RawJSON):
+            return str(dt)
         return json.dumps(dt, cls=utils.EnumAwareEncoder)
 
     @staticmethod
@@ -0,0 +1,77 @@
+"""
+Log capture
+-----------
+
+Records logged while a function runs are kept with its execution (``log_records``), whether it
+succeeds or fails. Only records from the executing thread are captured, into a ring
+buffer with truncated messages, so a noisy function can't blow up memory or row size.
+
+Logger levels aren't touched (that would affect every other thread too), so records have to make
+it past the levels set in ``settings.LOGGING`` to be captured.
+
+Settings:
+    TURTLE_SHELL_CAPTURE_LOGS: False turns capture off (per function: ``{"capture_logs": False}``)
+    TURTLE_SHELL_CAPTURE_LOG_LEVEL: lowest level captured (defaults to INFO)
+    TURTLE_SHELL_CAPTURE_LOG_RECORDS: records kept, oldest dropped first (defaults to 500)
+    TURTLE_SHELL_CAPTURE_LOG_MESSAGE_CHARS: each message is truncated to this (defaults to 2000)
+"""
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+def capture_enabled(config: dict) -> bool:
+    return config.get("capture_logs", getattr(settings, "TURTLE_SHELL_CAPTURE_LOGS", True))
+
+
+class RingBufferHandler(logging.Handler):
+    """Keep the last ``max_records`` records logged from one thread, compactly"""
+
+    def __init__(self, *, level=None, max_records=None, max_chars=None):
+        if level is None:
+            level = getattr(settings, "TURTLE_SHELL_CAPTURE_LOG_LEVEL", logging.INFO)
+        super().__init__(level)
+        self.max_records = max_records or getattr(settings, "TURTLE_SHELL_CAPTURE_LOG_RECORDS", 500)
+        self.max_chars = max_chars or getattr(
+            settings, "TURTLE_SHELL_CAPTURE_LOG_MESSAGE_CHARS", 2000
+        )
+        self.records = deque(maxlen=self.max_records)
+        self.seen = 0
+        self.thread = threading.get_ident()
+        self.start = time.time()
+        self.setFormatter(logging.Formatter("%(message)s"))
+
+    def filter(self, record):
+        return record.thread == self.thread and super().filter(record)
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+        except Exception:
+            message = str(record.msg)
+        if len(message) > self.max_chars:
+            message = message[: self.max_chars] + f"... [{len(message) - self.max_chars} chars]"
+        self.seen += 1
+        # [level, seconds since start, logger, message]
+        self.records.append(
+            [record.levelno, round(record.created - self.start, 3), record.name, message]
+        )
+
+    def to_json(self) -> dict:
+        return {"dropped": self.seen - len(self.records), "records": list(self.records)}
+
+
+@contextlib.contextmanager
+def capture_logs(logger: logging.Logger = None, **kwargs):
+    """Attach a RingBufferHandler to logger (root logger by default) while in the block"""
+    logger = logger or logging.getLogger()
+    handler = RingBufferHandler(**kwargs)
+    logger.addHandler(handler)
+    try:
+        yield handler
+    finally:
+        logger.removeHandler(handler)
@@ -0,0 +1,44 @@
+import json
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import turtle_shell
+from turtle_shell.manifest import build_manifest, write_manifest
+
+
+class Command(BaseCommand):
+    help = "Write the manifest of registered functions (see turtle_shell.manifest)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=None,
+            help="Where to write the manifest (defaults to settings.TURTLE_SHELL_MANIFEST)",
+        )
+        parser.add_argument(
+            "--check", action="store_true", help="Exit with an error if manifest is out of date"
+        )
+
+    def handle(self, *args, path, check, **options):
+        path = path or getattr(settings, "TURTLE_SHELL_MANIFEST", None)
+        if not path:
+            raise CommandError("Pass --path or set TURTLE_SHELL_MANIFEST")
+        turtle_shell.autodiscover()
+        # pick up anything registered manually alongside the router too
+        if getattr(settings, "ROOT_URLCONF", None):
+            import_module(settings.ROOT_URLCONF)
+        registry = turtle_shell.get_registry()
+        if check:
+            try:
+                with open(path) as f:
+                    existing = json.load(f)
+            except FileNotFoundError:
+                raise CommandError(f"No manifest at {path}")
+            if existing != build_manifest(registry):
+                raise CommandError(f"Manifest at {path} is out of date")
+            self.stdout.write(f"Manifest at {path} is up to date")
+            return
+        manifest = write_manifest(registry, path)
+        self.stdout.write(f"Wrote {len(manifest['functions'])} functions to {path}")
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from turtle_shell import partitions, routers
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep execution history per month: setup/create Postgres partitions, archive months to "
+        "archive tables, or expire old months by dropping them (see turtle_shell.partitions)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["setup", "create", "archive", "expire", "list"])
+        parser.add_argument(
+            "--database", default=None, help="Database alias (defaults to the primary)"
+        )
+        parser.add_argument(
+            "--before", default=None, help="Archive/expire months before this one (e.g. 2024-05)"
+        )
+        parser.add_argument(
+            "--keep-months",
+            type=int,
+            default=None,
+            help="Archive/expire months before the last N (counting the current one)",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Postgres partitions to have ready after the current month",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Executions archived per transaction"
+        )
+
+    def handle(self, action, *, database, before, keep_months, months_ahead, batch_size, **options):
+        using = database or routers.write_alias()
+        log = self.stdout.write
+        try:
+            if action == "setup":
+                partitions.partition_table(using, months_ahead=months_ahead, log=log)
+            elif action == "create":
+                partitions.create_partitions(using, months_ahead=months_ahead, log=log)
+            elif action == "list":
+                self._list(using)
+            else:
+                cutoff = self._cutoff(before, keep_months)
+                if action == "archive":
+                    if partitions.is_partitioned(using):
+                        raise CommandError("Partitioned tables are expired, not archived")
+                    partitions.archive(using, cutoff, batch_size=batch_size, log=log)
+                else:
+                    dropped = partitions.expire(using, cutoff, batch_size=batch_size, log=log)
+                    log(f"Expired {len(dropped)} months before {cutoff:%Y-%m}")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+    def _cutoff(self, before, keep_months):
+        if (before is None) == (keep_months is None):
+            raise CommandError("Pass one of --before or --keep-months")
+        if before is not None:
+            return partitions.parse_month(before)
+        if keep_months < 1:
+            raise CommandError("--keep-months must be at least 1")
+        return partitions.add_months(partitions.month_start(timezone.now()), 1 - keep_months)
+
+    def _list(self, using):
+        if partitions.is_partitioned(using):
+            for name, upper in partitions.list_partitions(using):
+                self.stdout.write(f"{name} (until {upper or '-'})")
+        else:
+            for start in partitions.archived_months(using):
+                self.stdout.write(f"{partitions.archive_name(partitions.TABLE, start)}")
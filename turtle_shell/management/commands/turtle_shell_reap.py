@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from turtle_shell.models import ExecutionResult
+
+
+class Command(BaseCommand):
+    help = "Requeue (or fail) queued executions whose worker stopped heartbeating"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=None,
+            help=(
+                "Fail instead of requeueing after this many attempts, for functions without a "
+                "retry policy (TURTLE_SHELL_MAX_ATTEMPTS)"
+            ),
+        )
+
+    def handle(self, *args, max_attempts, **options):
+        counts = ExecutionResult.objects.reap_expired(max_attempts=max_attempts)
+        self.stdout.write(f"Requeued {counts['requeued']}, failed {counts['failed']}")
@@ -0,0 +1,38 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from turtle_shell.models import SchedulerLock
+from turtle_shell.schedules import run_scheduler
+from turtle_shell.worker import worker_id
+
+
+class Command(BaseCommand):
+    help = "Fire due turtle_shell schedules (safe to run on several nodes at once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=15.0, help="Seconds between checks for due schedules"
+        )
+        parser.add_argument(
+            "--lock-seconds",
+            type=float,
+            default=60.0,
+            help="Another node takes over if this one hasn't checked in for this long",
+        )
+        parser.add_argument("--once", action="store_true", help="Check once and exit")
+
+    def handle(self, *args, interval, lock_seconds, once, **options):
+        # functions get registered wherever the project builds its router
+        if getattr(settings, "ROOT_URLCONF", None):
+            import_module(settings.ROOT_URLCONF)
+        owner = worker_id()
+        self.stdout.write(f"Scheduler {owner} checking every {interval}s")
+        try:
+            run_scheduler(owner=owner, interval=interval, lock_seconds=lock_seconds, once=once)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if not once:
+                SchedulerLock.release("scheduler", owner)
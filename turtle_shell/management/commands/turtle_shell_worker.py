@@ -0,0 +1,64 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import turtle_shell
+from turtle_shell.worker import WarmWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run a pool of warm workers executing queued turtle_shell executions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2)
+        parser.add_argument(
+            "--max-executions",
+            type=int,
+            default=100,
+            help="Recycle each child after this many executions",
+        )
+        parser.add_argument(
+            "--max-memory-mb", type=int, default=None, help="Recycle children past this RSS"
+        )
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument(
+            "--lease-seconds",
+            type=float,
+            default=None,
+            help="How long a claim lasts without a heartbeat (TURTLE_SHELL_LEASE_SECONDS)",
+        )
+        parser.add_argument(
+            "--reap-interval",
+            type=float,
+            default=30.0,
+            help="Seconds between requeueing executions of dead workers (0 to disable)",
+        )
+
+    def handle(
+        self,
+        *args,
+        processes,
+        max_executions,
+        max_memory_mb,
+        poll_interval,
+        lease_seconds,
+        reap_interval,
+        **options,
+    ):
+        # functions get registered wherever the project builds its router
+        if getattr(settings, "ROOT_URLCONF", None):
+            import_module(settings.ROOT_URLCONF)
+        registry = turtle_shell.get_registry()
+        self.stdout.write(
+            f"Starting {processes} workers for {len(registry.func_name2func)} functions"
+        )
+        WarmWorkerPool(
+            registry,
+            processes=processes,
+            max_executions_per_child=max_executions,
+            max_memory_mb=max_memory_mb,
+            poll_interval=poll_interval,
+            lease_seconds=lease_seconds,
+            reap_interval=reap_interval,
+        ).run()
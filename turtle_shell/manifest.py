@@ -0,0 +1,71 @@
+"""
+Function manifest
+-----------------
+
+A JSON file caching what the overview page and URL routing need to know about registered
+functions (import path, docstring, signature), so they work without importing the functions.
+
+Point ``settings.TURTLE_SHELL_MANIFEST`` at the file to use it.
+"""
+import inspect
+import json
+from pathlib import Path
+from typing import Union
+
+from defopt import signature
+
+from .function_to_form import form_doc
+
+MANIFEST_VERSION = 1
+
+
+def describe_function(func_obj) -> dict:
+    """Manifest entry for a registered function (imports it!)"""
+    sig = signature(func_obj.func)
+    parameters = []
+    for param in sig.parameters.values():
+        parameters.append(
+            {
+                "name": param.name,
+                "annotation": inspect.formatannotation(param.annotation),
+                "default": None if param.default is param.empty else repr(param.default),
+                "required": param.default is param.empty,
+                "doc": param.doc or "",
+            }
+        )
+    return {
+        "import_path": func_obj.import_path,
+        "doc": form_doc(func_obj.func),
+        "version": func_obj.source_version(),
+        "parameters": parameters,
+    }
+
+
+def build_manifest(registry) -> dict:
+    """Manifest for registry (functions that can't be imported by path, like commands, are left
+    out: they're registered by running the module that builds them)"""
+    return {
+        "version": MANIFEST_VERSION,
+        "functions": {
+            name: describe_function(func_obj)
+            for name, func_obj in registry.func_name2func.items()
+            if func_obj.import_path
+        },
+    }
+
+
+def write_manifest(registry, path: Union[str, Path]):
+    manifest = build_manifest(registry)
+    Path(path).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+def read_manifest(path: Union[str, Path]) -> dict:
+    """Function entries by name (empty if there's no manifest yet)"""
+    try:
+        manifest = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version in {path}: {manifest.get('version')}")
+    return manifest["functions"]
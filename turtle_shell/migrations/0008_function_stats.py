@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0007_auto_20210413_0626"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FunctionSummary",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("func_name", models.CharField(editable=False, max_length=512, unique=True)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("errored", models.PositiveIntegerField(default=0)),
+                ("last_run", models.DateTimeField(null=True)),
+                ("hourly_counts", models.JSONField(default=dict)),
+                ("duration_histogram", models.JSONField(default=list)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="executionresult",
+            name="duration",
+            field=models.FloatField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0008_function_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="executionresult",
+            name="input_hash",
+            field=models.CharField(default="", editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="executionresult",
+            name="single_flight",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name="executionresult",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("single_flight", True), ("status__in", ["CREATED", "RUNNING"])),
+                fields=("func_name", "input_hash"),
+                name="turtle_shell_single_flight",
+            ),
+        ),
+    ]
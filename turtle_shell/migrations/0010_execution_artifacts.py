@@ -0,0 +1,52 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import turtle_shell.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0009_single_flight"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExecutionArtifact",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=1024, upload_to=turtle_shell.models.artifact_upload_to
+                    ),
+                ),
+                ("size", models.BigIntegerField(default=0)),
+                ("checksum", models.CharField(max_length=64)),
+                (
+                    "content_type",
+                    models.CharField(default="application/octet-stream", max_length=255),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "execution",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="artifacts",
+                        to="turtle_shell.executionresult",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created", "pk"],
+            },
+        ),
+    ]
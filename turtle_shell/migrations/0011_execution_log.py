@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0010_execution_artifacts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExecutionLogChunk",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("seq", models.PositiveIntegerField()),
+                (
+                    "stream",
+                    models.CharField(
+                        choices=[("stdout", "stdout"), ("stderr", "stderr")],
+                        default="stdout",
+                        max_length=6,
+                    ),
+                ),
+                ("data", models.TextField()),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "execution",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="log_chunks",
+                        to="turtle_shell.executionresult",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["seq"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="executionlogchunk",
+            constraint=models.UniqueConstraint(
+                fields=("execution", "seq"), name="turtle_shell_log_chunk_seq"
+            ),
+        ),
+    ]
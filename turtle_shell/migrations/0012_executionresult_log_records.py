@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0011_execution_log"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="executionresult",
+            name="log_records",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
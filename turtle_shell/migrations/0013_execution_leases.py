@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0012_executionresult_log_records"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="executionresult",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="executionresult",
+            name="lease_expires",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="executionresult",
+            name="lease_owner",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(fields=["status", "created"], name="turtle_shell_queue_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(fields=["status", "lease_expires"], name="turtle_shell_lease_idx"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0013_execution_leases"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="executionresult",
+            name="attempt_history",
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name="executionresult",
+            name="not_before",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
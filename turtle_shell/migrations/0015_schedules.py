@@ -0,0 +1,67 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import turtle_shell.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("turtle_shell", "0014_execution_retries"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SchedulerLock",
+            fields=[
+                ("name", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("owner", models.CharField(max_length=255)),
+                ("expires", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Schedule",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("func_name", models.CharField(max_length=512)),
+                (
+                    "cron",
+                    models.CharField(
+                        help_text="e.g. '0 3 * * 1-5' (03:00 on weekdays)", max_length=255
+                    ),
+                ),
+                (
+                    "input_json",
+                    models.JSONField(
+                        blank=True,
+                        decoder=turtle_shell.utils.EnumAwareDecoder,
+                        default=dict,
+                        encoder=turtle_shell.utils.EnumAwareEncoder,
+                    ),
+                ),
+                ("enabled", models.BooleanField(default=True)),
+                ("next_run", models.DateTimeField(blank=True, db_index=True, null=True)),
+                ("last_run", models.DateTimeField(blank=True, editable=False, null=True)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("modified", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
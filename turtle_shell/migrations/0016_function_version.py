@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0015_schedules"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="executionresult",
+            name="turtle_shell_single_flight",
+        ),
+        migrations.AddField(
+            model_name="executionresult",
+            name="func_version",
+            field=models.CharField(db_index=True, default="", editable=False, max_length=128),
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(
+                fields=["func_name", "input_hash", "func_version"], name="turtle_shell_input_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="executionresult",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("single_flight", True), ("status__in", ["CREATED", "RUNNING"])),
+                fields=("func_name", "func_version", "input_hash"),
+                name="turtle_shell_single_flight",
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from turtle_shell import errors
+
+
+def move_tracebacks(apps, schema_editor):
+    """Move existing tracebacks into ErrorTraceback (one row per distinct failure)"""
+    ExecutionResult = apps.get_model("turtle_shell", "ExecutionResult")
+    ErrorTraceback = apps.get_model("turtle_shell", "ErrorTraceback")
+    db = schema_editor.connection.alias
+    executions = ExecutionResult.objects.using(db).exclude(traceback="")
+    by_digest = {}
+    for pk, text in executions.values_list("pk", "traceback").iterator():
+        key = errors.text_key(text)
+        digest = errors.digest(key)
+        if digest not in by_digest:
+            ErrorTraceback.objects.using(db).get_or_create(
+                digest=digest,
+                defaults={"error_type": key.rsplit("\n", 1)[-1].rsplit(".", 1)[-1], "text": text},
+            )
+            by_digest[digest] = []
+        by_digest[digest].append(pk)
+    for digest, pks in by_digest.items():
+        for i in range(0, len(pks), 500):
+            ExecutionResult.objects.using(db).filter(pk__in=pks[i : i + 500]).update(
+                error_traceback_id=digest
+            )
+
+
+def restore_tracebacks(apps, schema_editor):
+    ExecutionResult = apps.get_model("turtle_shell", "ExecutionResult")
+    ErrorTraceback = apps.get_model("turtle_shell", "ErrorTraceback")
+    db = schema_editor.connection.alias
+    for error in ErrorTraceback.objects.using(db).iterator():
+        ExecutionResult.objects.using(db).filter(error_traceback=error).update(traceback=error.text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0016_function_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ErrorTraceback",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(
+                        editable=False, max_length=64, primary_key=True, serialize=False
+                    ),
+                ),
+                ("error_type", models.CharField(editable=False, max_length=255)),
+                ("text", models.TextField(editable=False)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="executionresult",
+            name="error_traceback",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="executions",
+                to="turtle_shell.errortraceback",
+            ),
+        ),
+        migrations.RunPython(move_tracebacks, restore_tracebacks),
+        migrations.RemoveField(
+            model_name="executionresult",
+            name="traceback",
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(
+                fields=["func_name", "error_traceback", "created"], name="turtle_shell_error_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:01
+
+import json
+
+from django.db import migrations, models
+from django.db.models.functions import Cast
+import django.db.models.deletion
+
+from turtle_shell import utils
+
+
+def index_inputs(apps, schema_editor):
+    """Index inputs of existing executions"""
+    ExecutionResult = apps.get_model("turtle_shell", "ExecutionResult")
+    ExecutionInput = apps.get_model("turtle_shell", "ExecutionInput")
+    db = schema_editor.connection.alias
+    # raw text, so enums of functions that aren't imported here don't need to be registered
+    rows = (
+        ExecutionResult.objects.using(db)
+        .annotate(raw_input=Cast("input_json", models.TextField()))
+        .values_list("pk", "raw_input")
+    )
+    batch = []
+    for pk, raw_input in rows.iterator():
+        for key, value in utils.search_pairs(json.loads(raw_input or "{}")):
+            batch.append(ExecutionInput(execution_id=pk, key=key, value=value))
+        if len(batch) >= 1000:
+            ExecutionInput.objects.using(db).bulk_create(batch)
+            batch = []
+    ExecutionInput.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0017_error_tracebacks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExecutionInput",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("key", models.CharField(editable=False, max_length=255)),
+                ("value", models.CharField(editable=False, max_length=255)),
+                (
+                    "execution",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="inputs",
+                        to="turtle_shell.executionresult",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="executioninput",
+            index=models.Index(fields=["key", "value"], name="turtle_shell_input_kv_idx"),
+        ),
+        migrations.RunPython(index_inputs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0018_execution_inputs"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(fields=["created"], name="turtle_shell_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(
+                fields=["func_name", "created"], name="turtle_shell_func_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(
+                fields=["func_name", "modified"], name="turtle_shell_func_modified_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(
+                fields=["func_name", "status", "created"], name="turtle_shell_func_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(
+                fields=["func_name", "func_version", "created"],
+                name="turtle_shell_func_version_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(fields=["user", "created"], name="turtle_shell_user_created_idx"),
+        ),
+    ]
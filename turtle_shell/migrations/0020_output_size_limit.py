@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:16
+
+from django.db import migrations, models
+import turtle_shell.models
+import turtle_shell.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0019_history_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="executionresult",
+            name="output_json",
+            field=turtle_shell.models.EncodedJSONField(
+                decoder=turtle_shell.utils.EnumAwareDecoder,
+                default=dict,
+                encoder=turtle_shell.utils.EnumAwareEncoder,
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="executionresult",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("CREATED", "Created"),
+                    ("RUNNING", "Running"),
+                    ("DONE", "Done"),
+                    ("ERRORED", "Errored"),
+                    ("JSON_ERROR", "Result could not be coerced to JSON"),
+                    ("TOO_LARGE", "Result was over the output size limit"),
+                ],
+                default="CREATED",
+                max_length=10,
+            ),
+        ),
+    ]
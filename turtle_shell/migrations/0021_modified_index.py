@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("turtle_shell", "0020_output_size_limit"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="executionresult",
+            index=models.Index(fields=["modified"], name="turtle_shell_modified_idx"),
+        ),
+    ]
@@ -1,14 +1,28 @@
-from django.db import models, transaction
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from django.db import IntegrityError, NotSupportedError, connections, models, transaction
+from django.db.models.fields.json import compile_json_path
+from django.db.models.functions import Cast
 from django.urls import reverse
 from django.conf import settings
-from turtle_shell import utils
+from django.utils import timezone
+from turtle_shell import outputs, utils
+import bisect
+import contextlib
+import contextvars
+import hashlib
 import uuid
-import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+# execution currently running in this thread/task (e.g., so commands know where to log)
+current_execution = contextvars.ContextVar("turtle_shell_current_execution", default=None)
+
+
 class CaughtException(Exception):
     """An exception that was caught and saved. Generally don't need to rollback transaction with
     this one :)"""
@@ -22,6 +36,332 @@ class ResultJSONEncodeException(CaughtException):
     """Exceptions for when we cannot save result as actual JSON field :("""
 
 
+class RetryScheduled(CaughtException):
+    """Execution failed but will be tried again (see ``turtle_shell.retries``)"""
+
+
+class ResultTooLargeException(CaughtException):
+    """Result was bigger than the output size limit (see ``turtle_shell.outputs``)"""
+
+
+class LeaseLost(CaughtException):
+    """Worker lost its lease (the execution was reaped, maybe handed to another worker) before
+    saving, so nothing was saved"""
+
+
+def use_summary_table() -> bool:
+    """Whether overview stats are maintained incrementally in ``FunctionSummary``"""
+    return getattr(settings, "TURTLE_SHELL_STATS_SUMMARY_TABLE", False)
+
+
+def use_queued_execution() -> bool:
+    """Whether executions are left for workers to pick up (see ``turtle_shell.worker``)"""
+    return getattr(settings, "TURTLE_SHELL_QUEUED_EXECUTION", False)
+
+
+def lease_duration() -> float:
+    """Seconds a worker's claim on an execution lasts without a heartbeat"""
+    return getattr(settings, "TURTLE_SHELL_LEASE_SECONDS", 60)
+
+
+class EncodedJSONField(models.JSONField):
+    """JSONField that saves ``outputs.EncodedOutput`` as is instead of encoding it again"""
+
+    def get_prep_value(self, value):
+        if isinstance(value, outputs.EncodedOutput):
+            return value.text()
+        return super().get_prep_value(value)
+
+
+@dataclass
+class FunctionStats:
+    """Aggregate usage numbers for a single registered function (see overview page)"""
+
+    func_name: str
+    total: int = 0
+    last_24h: int = 0
+    errored: int = 0
+    last_run: Optional[datetime] = None
+    median_duration: Optional[float] = None
+
+    @property
+    def error_rate(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return self.errored / self.total
+
+
+class Median(models.Aggregate):
+    """Median via ``percentile_cont`` - only available on postgres."""
+
+    function = "PERCENTILE_CONT"
+    name = "median"
+    output_field = models.FloatField()
+    template = "%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)"
+
+
+class JSONPathText(models.Func):
+    """JSON text of the value at path (list of keys) in a JSON field (SQL NULL if missing).
+
+    Unlike ``KeyTransform``, the value isn't decoded by ``JSONField.from_db_value``: SQLite's
+    ``JSON_EXTRACT`` returns strings unquoted, so e.g. ``"123"`` would come back as ``123``."""
+
+    output_field = models.TextField()
+
+    def __init__(self, field: str, path: list):
+        self.path = path
+        super().__init__(models.F(field))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"JSON paths are not supported on {connection.vendor}")
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        lhs, params = compiler.compile(self.source_expressions[0])
+        json_path = compile_json_path(self.path)
+        if connection.Database.sqlite_version_info >= (3, 38):
+            return f"({lhs} -> %s)", (*params, json_path)
+        # JSON_EXTRACT gives SQL values (unquoted strings, 1/0 for booleans), so quote them back
+        return (
+            f"CASE JSON_TYPE({lhs}, %s) WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' "
+            f"ELSE JSON_QUOTE(JSON_EXTRACT({lhs}, %s)) END",
+            (*params, json_path, *params, json_path),
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        lhs, params = compiler.compile(self.source_expressions[0])
+        return f"CAST(JSON_EXTRACT({lhs}, %s) AS CHAR)", (*params, compile_json_path(self.path))
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        lhs, params = compiler.compile(self.source_expressions[0])
+        return f"({lhs} #> %s)::text", (*params, self.path)
+
+
+class ExecutionResultQuerySet(models.QuerySet):
+    def function_stats(self, now=None) -> dict:
+        """Usage stats for every function, keyed by function name.
+
+        Everything comes back from one grouped query (median duration is only computed on
+        postgres - other backends should use the summary table if they need it)."""
+        now = now or timezone.now()
+        errored = models.Q(status__in=ExecutionResult.ERROR_STATUSES)
+        aggregates = {
+            "total": models.Count("pk"),
+            "last_24h": models.Count("pk", filter=models.Q(created__gte=now - timedelta(hours=24))),
+            "errored": models.Count("pk", filter=errored),
+            "last_run": models.Max("created"),
+        }
+        if connections[self.db].vendor == "postgresql":
+            aggregates["median_duration"] = Median("duration")
+        rows = self.order_by().values("func_name").annotate(**aggregates)
+        return {row["func_name"]: FunctionStats(**row) for row in rows}
+
+    def create_execution(self, *, func_name, input_json, user=None, **kwargs):
+        """Create a new execution for func_name.
+
+        For single flight functions, if an identical execution (same input and function version)
+        is already CREATED or RUNNING, return that one instead (with ``attached`` set to True).
+        This is race safe because of the partial unique index on active single flight executions.
+
+        With ``config["reuse_results"]`` (True, or a max age in seconds), a finished identical
+        execution of the same version is returned instead (``attached`` and ``reused`` set)."""
+        from turtle_shell import get_registry
+
+        func_obj = get_registry().get(func_name)
+        single_flight = bool(func_obj and func_obj.single_flight)
+        func_version = func_obj.version if func_obj else ""
+        input_hash = utils.canonical_json_hash(input_json)
+        identical = self.filter(
+            func_name=func_name, input_hash=input_hash, func_version=func_version
+        )
+        reuse_results = func_obj and (func_obj.config or {}).get("reuse_results")
+        if reuse_results:
+            done = identical.filter(status=ExecutionResult.ExecutionStatus.DONE)
+            if reuse_results is not True:
+                done = done.filter(created__gte=timezone.now() - timedelta(seconds=reuse_results))
+            obj = done.order_by("-created").first()
+            if obj:
+                obj.attached = obj.reused = True
+                return obj
+        for _ in range(3):
+            try:
+                with transaction.atomic(using=self.db):
+                    obj = self.create(
+                        func_name=func_name,
+                        func_version=func_version,
+                        input_json=input_json,
+                        input_hash=input_hash,
+                        single_flight=single_flight,
+                        user=user,
+                        **kwargs,
+                    )
+                    ExecutionInput.objects.using(self.db).bulk_create(
+                        ExecutionInput.for_execution(obj)
+                    )
+            except IntegrityError:
+                if not single_flight:
+                    raise
+                obj = identical.active().filter(single_flight=True).first()
+                if obj:
+                    obj.attached = True
+                    return obj
+                # other execution finished in between, so try again
+                continue
+            obj.attached = False
+            return obj
+        raise ValueError(f"Could not create or attach to single flight execution for {func_name}")
+
+    def active(self):
+        return self.filter(status__in=ExecutionResult.ACTIVE_STATUSES)
+
+    def with_json_path(self, field: str, path: str):
+        """Annotate the JSON text of the value at path (dotted, e.g. ``"summary.rows.0"``) of field.
+
+        Extracted by the database, so only that subtree is transferred, and not decoded. Read it
+        back with ``getattr(obj, ExecutionResult.json_path_alias(field, path))`` (None if
+        missing)."""
+        expression = JSONPathText(field, path.split("."))
+        return self.annotate(**{ExecutionResult.json_path_alias(field, path): expression})
+
+    def with_json_text(self, *fields):
+        """Load JSON fields as their raw text (``<field>_text``) instead of decoding them.
+
+        For passing JSON straight through to a response (see ``ExecutionResult.json_text``)
+        without a decode/encode round trip."""
+        return self.defer(*fields).annotate(
+            **{f"{field}_text": Cast(field, models.TextField()) for field in fields}
+        )
+
+    def with_inputs(self, inputs: dict):
+        """Executions whose top level inputs include all of inputs (indexed, see ExecutionInput).
+
+        Values are compared as strings (as they'd come from a query string), so e.g. ``"3"``
+        matches an input of ``3``."""
+        qs = self
+        for key, value in inputs.items():
+            # separate filter() calls so each pair gets its own join
+            qs = qs.filter(inputs__key=key, inputs__value=ExecutionInput.encode_value(value))
+        return qs
+
+    def claim_next(self, func_names=None, *, owner: str = "", lease_seconds: float = None):
+        """Claim the oldest CREATED execution by moving it to RUNNING (None if nothing to do).
+
+        The claim comes with a lease (see ``heartbeat``/``reap_expired``) so a worker that dies
+        mid-execution doesn't leave it RUNNING forever. Uses ``SKIP LOCKED`` where the database
+        supports it, otherwise compare-and-swap on status, so concurrent workers never claim the
+        same execution."""
+        now = timezone.now()
+        queued = self.filter(status=ExecutionResult.ExecutionStatus.CREATED).filter(
+            models.Q(not_before__isnull=True) | models.Q(not_before__lte=now)
+        )
+        if func_names is not None:
+            queued = queued.filter(func_name__in=func_names)
+        queued = queued.order_by("created")
+        if connections[self.db].features.has_select_for_update_skip_locked:
+            with transaction.atomic(using=self.db):
+                pk = queued.select_for_update(skip_locked=True).values_list("pk", flat=True).first()
+                if pk and self._take_lease(pk, owner, lease_seconds):
+                    return self.get(pk=pk)
+            return None
+        for pk in queued.values_list("pk", flat=True)[:10]:
+            if self._take_lease(pk, owner, lease_seconds):
+                return self.get(pk=pk)
+        return None
+
+    def _take_lease(self, pk, owner, lease_seconds) -> bool:
+        now = timezone.now()
+        return bool(
+            self.filter(pk=pk, status=ExecutionResult.ExecutionStatus.CREATED).update(
+                status=ExecutionResult.ExecutionStatus.RUNNING,
+                lease_owner=owner,
+                lease_expires=now + timedelta(seconds=lease_seconds or lease_duration()),
+                attempts=models.F("attempts") + 1,
+                modified=now,
+            )
+        )
+
+    def heartbeat(self, pk, owner: str, lease_seconds: float = None) -> bool:
+        """Extend owner's lease on a RUNNING execution (False if the lease was lost)"""
+        return bool(
+            self.filter(
+                pk=pk, status=ExecutionResult.ExecutionStatus.RUNNING, lease_owner=owner
+            ).update(
+                lease_expires=timezone.now() + timedelta(seconds=lease_seconds or lease_duration())
+            )
+        )
+
+    def expired(self, now=None):
+        return self.filter(
+            status=ExecutionResult.ExecutionStatus.RUNNING, lease_expires__lt=now or timezone.now()
+        )
+
+    def reap_expired(self, now=None, *, max_attempts: int = None) -> dict:
+        """Requeue (or fail, after max_attempts) executions whose lease ran out.
+
+        Functions with a retry policy (see ``turtle_shell.retries``) use its ``max_attempts``
+        instead. Returns ``{"requeued": n, "failed": n}``."""
+        from turtle_shell import get_registry
+        from turtle_shell.retries import RetryPolicy
+
+        default_max_attempts = max_attempts or getattr(settings, "TURTLE_SHELL_MAX_ATTEMPTS", 3)
+        policies = {}
+        counts = {"requeued": 0, "failed": 0}
+        for execution in self.expired(now).only("pk", "func_name", "attempts", "lease_expires"):
+            if execution.func_name not in policies:
+                func_obj = get_registry().get(execution.func_name)
+                policies[execution.func_name] = RetryPolicy.from_config(
+                    (func_obj and func_obj.config) or {}
+                )
+            policy = policies[execution.func_name]
+            max_attempts = policy.max_attempts if policy else default_max_attempts
+            # lease_expires in the filter means a heartbeat in the meantime wins
+            stale = self.filter(
+                pk=execution.pk,
+                status=ExecutionResult.ExecutionStatus.RUNNING,
+                lease_expires=execution.lease_expires,
+            )
+            if execution.attempts < max_attempts:
+                counts["requeued"] += stale.update(
+                    status=ExecutionResult.ExecutionStatus.CREATED,
+                    lease_owner="",
+                    lease_expires=None,
+                    modified=timezone.now(),
+                )
+            elif stale.update(
+                status=ExecutionResult.ExecutionStatus.ERRORED,
+                error_json={
+                    "type": "LeaseExpired",
+                    "message": f"Worker stopped responding ({execution.attempts} attempts)",
+                },
+                lease_expires=None,
+                modified=timezone.now(),
+            ):
+                counts["failed"] += 1
+                self.get(pk=execution.pk)._record_stats()
+        return counts
+
+
+class ErrorTraceback(models.Model):
+    """A distinct failure, stored once however many executions hit it (see turtle_shell.errors)"""
+
+    digest = models.CharField(max_length=64, primary_key=True, editable=False)
+    error_type = models.CharField(max_length=255, editable=False)
+    text = models.TextField(editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def for_exception(cls, exc: BaseException) -> "ErrorTraceback":
+        from turtle_shell import errors
+
+        obj, _ = cls.objects.get_or_create(
+            digest=errors.digest(errors.exception_key(exc)),
+            defaults={"error_type": type(exc).__name__, "text": errors.format_exception(exc)},
+        )
+        return obj
+
+    def __str__(self):
+        return f"{self.error_type} ({self.digest[:12]})"
+
+
 class ExecutionResult(models.Model):
     FIELDS_TO_SHOW_IN_LIST = [
         ("func_name", "Function"),
@@ -31,14 +371,22 @@ class ExecutionResult(models.Model):
     ]
     uuid = models.UUIDField(primary_key=True, unique=True, editable=False, default=uuid.uuid4)
     func_name = models.CharField(max_length=512, editable=False)
+    # see _Function.version
+    func_version = models.CharField(max_length=128, default="", editable=False, db_index=True)
     input_json = models.JSONField(encoder=utils.EnumAwareEncoder, decoder=utils.EnumAwareDecoder)
-    output_json = models.JSONField(
+    output_json = EncodedJSONField(
         default=dict, null=True, encoder=utils.EnumAwareEncoder, decoder=utils.EnumAwareDecoder
     )
     error_json = models.JSONField(
         default=dict, null=True, encoder=utils.EnumAwareEncoder, decoder=utils.EnumAwareDecoder
     )
-    traceback = models.TextField(default="")
+    error_traceback = models.ForeignKey(
+        ErrorTraceback,
+        on_delete=models.PROTECT,
+        null=True,
+        editable=False,
+        related_name="executions",
+    )
 
     class ExecutionStatus(models.TextChoices):
         CREATED = "CREATED", "Created"
@@ -46,6 +394,14 @@ class ExecutionResult(models.Model):
         DONE = "DONE", "Done"
         ERRORED = "ERRORED", "Errored"
         JSON_ERROR = "JSON_ERROR", "Result could not be coerced to JSON"
+        TOO_LARGE = "TOO_LARGE", "Result was over the output size limit"
+
+    ERROR_STATUSES = (
+        ExecutionStatus.ERRORED,
+        ExecutionStatus.JSON_ERROR,
+        ExecutionStatus.TOO_LARGE,
+    )
+    ACTIVE_STATUSES = (ExecutionStatus.CREATED, ExecutionStatus.RUNNING)
 
     status = models.CharField(
         max_length=10, choices=ExecutionStatus.choices, default=ExecutionStatus.CREATED
@@ -54,52 +410,245 @@ class ExecutionResult(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, null=True)
+    # seconds spent in the function itself (i.e., excludes time waiting around to execute)
+    duration = models.FloatField(null=True, editable=False)
+    # hash of canonicalized input_json (see utils.canonical_json_hash)
+    input_hash = models.CharField(max_length=64, default="", editable=False)
+    single_flight = models.BooleanField(default=False, editable=False)
+    # queued executions are leased by a worker (see ExecutionResultQuerySet.claim_next)
+    lease_owner = models.CharField(max_length=255, default="", editable=False)
+    lease_expires = models.DateTimeField(null=True, editable=False)
+    attempts = models.PositiveIntegerField(default=0, editable=False)
+    # retries (see turtle_shell.retries) wait in CREATED until not_before
+    not_before = models.DateTimeField(null=True, editable=False)
+    # [{status, finished, duration, error}] for each failed attempt (and the final one)
+    attempt_history = models.JSONField(default=list, editable=False)
+    # bounded capture of logging output (see turtle_shell.log_capture)
+    log_records = models.JSONField(default=dict, editable=False)
+
+    objects = ExecutionResultQuerySet.as_manager()
+
+    # set when create_execution attached to an in-flight execution instead of creating one
+    attached = False
+    # ...and this too if it's a finished execution being reused
+    reused = False
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["func_name", "func_version", "input_hash"],
+                condition=models.Q(single_flight=True, status__in=["CREATED", "RUNNING"]),
+                name="turtle_shell_single_flight",
+            )
+        ]
+        indexes = [
+            # claim_next / reap_expired
+            models.Index(fields=["status", "created"], name="turtle_shell_queue_idx"),
+            models.Index(fields=["status", "lease_expires"], name="turtle_shell_lease_idx"),
+            # reusing results / attaching to identical executions
+            models.Index(
+                fields=["func_name", "input_hash", "func_version"], name="turtle_shell_input_idx"
+            ),
+            # history filters/orderings (see turtle_shell.filters)
+            models.Index(fields=["created"], name="turtle_shell_created_idx"),
+            models.Index(fields=["modified"], name="turtle_shell_modified_idx"),
+            models.Index(fields=["func_name", "created"], name="turtle_shell_func_created_idx"),
+            models.Index(fields=["func_name", "modified"], name="turtle_shell_func_modified_idx"),
+            models.Index(
+                fields=["func_name", "status", "created"], name="turtle_shell_func_status_idx"
+            ),
+            models.Index(
+                fields=["func_name", "func_version", "created"],
+                name="turtle_shell_func_version_idx",
+            ),
+            models.Index(fields=["user", "created"], name="turtle_shell_user_created_idx"),
+            # error groups (count + last seen per distinct failure without touching the table)
+            models.Index(
+                fields=["func_name", "error_traceback", "created"], name="turtle_shell_error_idx"
+            ),
+        ]
 
     def execute(self):
         """Execute with given input, returning caught exceptions as necessary"""
-        from turtle_shell import pydantic_adapter
+        from turtle_shell.artifacts import store_artifacts
+        from turtle_shell.function_to_form import restore_input_types
+        from turtle_shell.log_capture import capture_enabled, capture_logs
+        from turtle_shell.retries import RetryPolicy
+        from turtle_shell.uploads import cleanup_uploads
 
         if self.status not in (self.ExecutionStatus.CREATED, self.ExecutionStatus.RUNNING):
             raise ValueError("Cannot run - execution state isn't complete")
         func = self.get_function()
-        original_result = None
+        token = current_execution.set(self)
+        # claimed by a worker: state is only saved while it still holds the lease
+        self._held_lease = self.lease_owner if self.status == self.ExecutionStatus.RUNNING else ""
+        retrying = lease_lost = False
         try:
-            # TODO: redo conversion another time!
-            result = original_result = func(**self.input_json)
-        except Exception as e:
-            import traceback
+            original_result = None
+            start = time.monotonic()
+            if capture_enabled(self.get_function_config()):
+                log_capture = capture_logs()
+            else:
+                log_capture = contextlib.nullcontext()
+            try:
+                with log_capture as log_handler:
+                    # TODO: redo conversion another time!
+                    result = original_result = func(**restore_input_types(func, self.input_json))
+            except Exception as e:
+                self.duration = time.monotonic() - start
+                changed = ["duration", "error_json", "error_traceback", "attempt_history"]
+                if log_handler:
+                    self.log_records = log_handler.to_json()
+                    changed.append("log_records")
+                logger.error(
+                    f"Failed to execute {self.func_name} :(: {type(e).__name__}:{e}", exc_info=True
+                )
+                # TODO: catch integrity error separately
+                self.error_json = {"type": type(e).__name__, "message": str(e)}
+                self.error_traceback = ErrorTraceback.for_exception(e)
+                self._add_attempt(self.ExecutionStatus.ERRORED)
+                policy = RetryPolicy.from_config(self.get_function_config())
+                # claims count too, so attempts that crashed (see reap_expired) use up retries
+                attempt = max(self.attempts, len(self.attempt_history))
+                if policy and use_queued_execution() and policy.should_retry(e, attempt):
+                    retrying = True
+                    self.status = self.ExecutionStatus.CREATED
+                    self.not_before = timezone.now() + policy.delay(attempt)
+                    self.lease_owner = ""
+                    self.lease_expires = None
+                    self._save_transition(*changed, "not_before", "lease_owner", "lease_expires")
+                    raise RetryScheduled(
+                        f"Failed on {self.func_name} ({type(e).__name__}), will retry after "
+                        f"{self.not_before:%Y-%m-%d %H:%M:%S}",
+                        e,
+                    ) from e
+                self.status = self.ExecutionStatus.ERRORED
+                self._save_transition(*changed)
+                self._record_stats()
+                raise CaughtException(f"Failed on {self.func_name} ({type(e).__name__})", e) from e
+            self.duration = time.monotonic() - start
+            changed = ["duration", "output_json"]
+            if log_handler:
+                self.log_records = log_handler.to_json()
+                changed.append("log_records")
+            if self.attempt_history:
+                self._add_attempt(self.ExecutionStatus.DONE)
+                changed.append("attempt_history")
+            config = self.get_function_config()
+            try:
+                # files/bytes go to storage, output only keeps their metadata
+                result = store_artifacts(self, result)
+                # if not isinstance(result, (dict, str, tuple)):
+                #     result = cattr.unstructure(result)
+                # JSON encoding happens before anything is sent to the database, so a TypeError
+                # here doesn't break an outer transaction
+                self._save_output(
+                    result,
+                    changed,
+                    max_bytes=outputs.max_output_bytes(config),
+                    spill_bytes=outputs.spill_output_bytes(config),
+                )
+                self._record_stats()
+            except outputs.OutputTooLarge as e:
+                self.error_json = {"type": type(e).__name__, "message": str(e)}
+                self.status = self.ExecutionStatus.TOO_LARGE
+                self.output_json = None
+                self._save_transition(*changed, "error_json")
+                self._record_stats()
+                raise ResultTooLargeException(
+                    f"Failed on {self.func_name} ({type(e).__name__})", e
+                ) from e
+            except TypeError as e:
+                self.error_json = {"type": type(e).__name__, "message": str(e)}
+                msg = f"Failed on {self.func_name} ({type(e).__name__})"
+                if "JSON serializable" in str(e):
+                    self.status = self.ExecutionStatus.JSON_ERROR
+                    # save it as a str so we can at least have something to show
+                    self.output_json = str(result)
+                    self._save_transition(*changed, "error_json")
+                    self._record_stats()
+                    raise ResultJSONEncodeException(msg, e) from e
+                else:
+                    raise e
+        except LeaseLost:
+            lease_lost = True
+            raise
+        finally:
+            current_execution.reset(token)
+            # uploads are still needed for the next attempt (or whoever took over the execution)
+            keep_uploads = self.get_function_config().get("keep_uploads")
+            if not (retrying or lease_lost or keep_uploads):
+                cleanup_uploads(func, self.input_json)
+        return original_result
 
-            logger.error(
-                f"Failed to execute {self.func_name} :(: {type(e).__name__}:{e}", exc_info=True
-            )
-            # TODO: catch integrity error separately
-            self.error_json = {"type": type(e).__name__, "message": str(e)}
-            self.traceback = "".join(traceback.format_exc())
-            self.status = self.ExecutionStatus.ERRORED
-            self.save()
-            raise CaughtException(f"Failed on {self.func_name} ({type(e).__name__})", e) from e
+    def _save_output(self, result, changed, *, max_bytes=None, spill_bytes=None):
+        """Encode result (once, see ``turtle_shell.outputs``) and save it as DONE"""
+        from turtle_shell.artifacts import Artifact, store_artifact
+
+        encoded = outputs.encode_output(result, max_bytes=max_bytes, spill_bytes=spill_bytes)
         try:
-            if hasattr(result, "json"):
-                result = json.loads(result.json())
-            # if not isinstance(result, (dict, str, tuple)):
-            #     result = cattr.unstructure(result)
-            self.output_json = result
+            if encoded.path:
+                artifact = Artifact(
+                    name=outputs.OUTPUT_ARTIFACT_NAME,
+                    path=encoded.path,
+                    content_type="application/json",
+                )
+                self.output_json = {"output_artifact": store_artifact(self, artifact).metadata}
+            else:
+                self.output_json = encoded
             self.status = self.ExecutionStatus.DONE
-            # allow ourselves to save again externally
-            with transaction.atomic():
-                self.save()
-        except TypeError as e:
-            self.error_json = {"type": type(e).__name__, "message": str(e)}
-            msg = f"Failed on {self.func_name} ({type(e).__name__})"
-            if "JSON serializable" in str(e):
-                self.status = self.ExecutionStatus.JSON_ERROR
-                # save it as a str so we can at least have something to show
-                self.output_json = str(result)
-                self.save()
-                raise ResultJSONEncodeException(msg, e) from e
+            self._save_transition(*changed)
+        finally:
+            encoded.cleanup()
+        if self.output_json is encoded:
+            if outputs.is_model(result):
+                # decoded from the database when (if) it's needed
+                del self.output_json
             else:
-                raise e
-        return original_result
+                self.output_json = result
+
+    def _save_transition(self, *fields):
+        """Save a status change as one UPDATE of just status, modified and the given columns.
+
+        While a worker holds the lease (see ``execute``), the UPDATE only matches if it still does,
+        otherwise nothing is written and LeaseLost is raised."""
+        fields = ["status", "modified", *fields]
+        held_lease = getattr(self, "_held_lease", "")
+        if not held_lease:
+            self.save(update_fields=fields)
+            return
+        self.modified = timezone.now()
+        values = {}
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            values[attname] = getattr(self, attname)
+        updated = ExecutionResult.objects.filter(
+            pk=self.pk, status=self.ExecutionStatus.RUNNING, lease_owner=held_lease
+        ).update(**values)
+        if not updated:
+            logger.warning(f"Lost lease on {self.pk}, not saving {self.status}")
+            raise LeaseLost(f"Lost lease on {self.func_name} ({self.pk}) before saving", None)
+
+    def _add_attempt(self, status):
+        self.attempt_history = [
+            *(self.attempt_history or []),
+            {
+                "status": status,
+                "finished": timezone.now().isoformat(),
+                "duration": self.duration,
+                "error": self.error_json if status != self.ExecutionStatus.DONE else None,
+            },
+        ]
+
+    def _record_stats(self):
+        if use_summary_table():
+            FunctionSummary.record(self)
+
+    def get_function_config(self) -> dict:
+        from . import get_registry
+
+        func_obj = get_registry().get(self.func_name)
+        return (func_obj and func_obj.config) or {}
 
     def get_function(self):
         # TODO: figure this out
@@ -117,12 +666,306 @@ class ExecutionResult(models.Model):
     def __repr__(self):
         return f"<{type(self).__name__}({self})"
 
+    @staticmethod
+    def json_path_alias(field: str, path: str) -> str:
+        return f"{field}_path_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]}"
+
+    def json_text(self, field: str) -> Optional[str]:
+        """Raw JSON text of field, if it was loaded with ``with_json_text`` (else None)"""
+        text = getattr(self, f"{field}_text", None)
+        return None if text == "null" else text
+
+    @property
+    def traceback(self) -> str:
+        return self.error_traceback.text if self.error_traceback_id else ""
+
     @property
     def pydantic_object(self):
         from turtle_shell import pydantic_adapter
 
         return pydantic_adapter.get_pydantic_object(self)
 
+    def get_log_records(self, min_level: int = 0) -> list:
+        """Captured log records (as dicts) at or above min_level"""
+        return [
+            {
+                "level": logging.getLevelName(level),
+                "levelno": level,
+                "offset": offset,
+                "logger": name,
+                "message": message,
+            }
+            for level, offset, name, message in (self.log_records or {}).get("records", [])
+            if level >= min_level
+        ]
+
     @property
     def list_entry(self) -> list:
         return [getattr(self, obj_name) for obj_name, _ in self.FIELDS_TO_SHOW_IN_LIST]
+
+
+class ExecutionInput(models.Model):
+    """Top level inputs of an execution as indexed (key, value) strings, for searching.
+
+    Written once with the execution. Only scalar values (strings, numbers, booleans, enums, dates)
+    short enough for the index are included - lists, objects and long strings aren't searchable."""
+
+    MAX_VALUE_LENGTH = 255
+
+    # a row per input per execution, so many more of these than executions
+    id = models.BigAutoField(primary_key=True)
+    execution = models.ForeignKey(
+        ExecutionResult, on_delete=models.CASCADE, related_name="inputs", editable=False
+    )
+    key = models.CharField(max_length=255, editable=False)
+    value = models.CharField(max_length=MAX_VALUE_LENGTH, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["key", "value"], name="turtle_shell_input_kv_idx")]
+
+    @staticmethod
+    def encode_value(value) -> Optional[str]:
+        return utils.search_value(value, max_length=ExecutionInput.MAX_VALUE_LENGTH)
+
+    @classmethod
+    def for_execution(cls, execution: ExecutionResult) -> list:
+        return [
+            cls(execution=execution, key=key, value=value)
+            for key, value in utils.search_pairs(execution.input_json, cls.MAX_VALUE_LENGTH)
+        ]
+
+
+def artifact_upload_to(instance, filename):
+    return (
+        f"turtle_shell/artifacts/{instance.execution.func_name}/{instance.execution.pk}/{filename}"
+    )
+
+
+class ExecutionArtifact(models.Model):
+    """File output of an execution (see ``turtle_shell.artifacts``)"""
+
+    execution = models.ForeignKey(
+        ExecutionResult, on_delete=models.CASCADE, related_name="artifacts", editable=False
+    )
+    name = models.CharField(max_length=255)
+    file = models.FileField(upload_to=artifact_upload_to, max_length=1024)
+    size = models.BigIntegerField(default=0)
+    # sha256 hexdigest of file contents
+    checksum = models.CharField(max_length=64)
+    content_type = models.CharField(max_length=255, default="application/octet-stream")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created", "pk"]
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse(
+            f"turtle_shell:artifact-{self.execution.func_name}",
+            kwargs={"pk": self.execution_id, "artifact_id": self.pk},
+        )
+
+    @property
+    def metadata(self) -> dict:
+        """What gets stored in ``output_json`` in place of the artifact itself"""
+        return {
+            "artifact_id": self.pk,
+            "name": self.name,
+            "size": self.size,
+            "checksum": self.checksum,
+            "content_type": self.content_type,
+        }
+
+
+class ExecutionLogChunk(models.Model):
+    """Piece of captured stdout/stderr for an execution (see ``turtle_shell.commands``)"""
+
+    class Stream(models.TextChoices):
+        STDOUT = "stdout", "stdout"
+        STDERR = "stderr", "stderr"
+
+    execution = models.ForeignKey(
+        ExecutionResult, on_delete=models.CASCADE, related_name="log_chunks", editable=False
+    )
+    seq = models.PositiveIntegerField()
+    stream = models.CharField(max_length=6, choices=Stream.choices, default=Stream.STDOUT)
+    data = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["seq"]
+        constraints = [
+            models.UniqueConstraint(fields=["execution", "seq"], name="turtle_shell_log_chunk_seq")
+        ]
+
+    def to_dict(self) -> dict:
+        return {"seq": self.seq, "stream": self.stream, "data": self.data}
+
+
+class ScheduleQuerySet(models.QuerySet):
+    def due(self, now=None):
+        return self.filter(enabled=True, next_run__lte=now or timezone.now()).order_by("next_run")
+
+
+class Schedule(models.Model):
+    """Fire a registered function periodically (see ``turtle_shell.schedules``)"""
+
+    name = models.CharField(max_length=255, unique=True)
+    func_name = models.CharField(max_length=512)
+    cron = models.CharField(max_length=255, help_text="e.g. '0 3 * * 1-5' (03:00 on weekdays)")
+    input_json = models.JSONField(
+        default=dict, blank=True, encoder=utils.EnumAwareEncoder, decoder=utils.EnumAwareDecoder
+    )
+    enabled = models.BooleanField(default=True)
+    # executions are created as this user
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.PROTECT, null=True, blank=True
+    )
+    next_run = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_run = models.DateTimeField(null=True, blank=True, editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = ScheduleQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name} ({self.func_name}: {self.cron})"
+
+    @property
+    def cron_schedule(self):
+        from .schedules import CronSchedule
+
+        return CronSchedule(self.cron)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from . import get_registry
+
+        try:
+            self.cron_schedule
+        except ValueError as e:
+            raise ValidationError({"cron": str(e)})
+        if not get_registry().get(self.func_name):
+            raise ValidationError({"func_name": f"No function registered as {self.func_name}"})
+
+    def save(self, *args, **kwargs):
+        if self.next_run is None:
+            self.next_run = self.cron_schedule.next_after(timezone.now())
+        super().save(*args, **kwargs)
+
+    def create_execution(self) -> ExecutionResult:
+        return ExecutionResult.objects.create_execution(
+            func_name=self.func_name, input_json=self.input_json, user=self.user
+        )
+
+
+class SchedulerLock(models.Model):
+    """Lease-based lock so only one scheduler (on any node) fires schedules"""
+
+    name = models.CharField(max_length=64, primary_key=True)
+    owner = models.CharField(max_length=255)
+    expires = models.DateTimeField()
+
+    @classmethod
+    def acquire(cls, name: str, owner: str, seconds: float) -> bool:
+        """Take or renew the lock for owner (False if someone else holds it)"""
+        now = timezone.now()
+        expires = now + timedelta(seconds=seconds)
+        held = models.Q(owner=owner) | models.Q(expires__lt=now)
+        if cls.objects.filter(held, name=name).update(owner=owner, expires=expires):
+            return True
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, owner=owner, expires=expires)
+        except IntegrityError:
+            return False
+        return True
+
+    @classmethod
+    def release(cls, name: str, owner: str):
+        cls.objects.filter(name=name, owner=owner).delete()
+
+
+class FunctionSummary(models.Model):
+    """Incrementally maintained usage stats per function.
+
+    Updated whenever an execution reaches a final state, so reading stats for the overview is
+    O(number of functions) no matter how big the ``ExecutionResult`` table gets. Recent runs are
+    tracked in hourly buckets and durations in a (log-scaled) histogram so both the 24 hour
+    window and the median are approximations."""
+
+    # upper bounds (in seconds) for duration histogram buckets - 10ms to ~1 day
+    DURATION_BUCKETS = [0.01 * 2 ** i for i in range(24)]
+
+    func_name = models.CharField(max_length=512, unique=True, editable=False)
+    total = models.PositiveIntegerField(default=0)
+    errored = models.PositiveIntegerField(default=0)
+    last_run = models.DateTimeField(null=True)
+    # {hour (isoformat): count} of executions created in the last 24 hours
+    hourly_counts = models.JSONField(default=dict)
+    duration_histogram = models.JSONField(default=list)
+
+    @classmethod
+    def record(cls, execution: ExecutionResult):
+        with transaction.atomic():
+            cls.objects.get_or_create(func_name=execution.func_name)
+            summary = cls.objects.select_for_update().get(func_name=execution.func_name)
+            summary.add(execution)
+            summary.save()
+
+    def add(self, execution: ExecutionResult):
+        """Fold a finished execution into these stats (does not save)"""
+        now = timezone.now()
+        self.total += 1
+        if execution.status in ExecutionResult.ERROR_STATUSES:
+            self.errored += 1
+        if not self.last_run or execution.created > self.last_run:
+            self.last_run = execution.created
+        # by creation, like the grouped query, so runs that were queued (or ran) for a long time
+        # count towards the hour they were submitted in
+        window_start = now - timedelta(hours=24)
+        cutoff = window_start.replace(minute=0, second=0, microsecond=0).isoformat()
+        self.hourly_counts = {k: v for k, v in self.hourly_counts.items() if k >= cutoff}
+        if execution.created >= window_start:
+            hour = execution.created.replace(minute=0, second=0, microsecond=0).isoformat()
+            self.hourly_counts[hour] = self.hourly_counts.get(hour, 0) + 1
+        if execution.duration is not None:
+            histogram = self.duration_histogram or [0] * (len(self.DURATION_BUCKETS) + 1)
+            histogram[bisect.bisect_left(self.DURATION_BUCKETS, execution.duration)] += 1
+            self.duration_histogram = histogram
+
+    def median_duration(self) -> Optional[float]:
+        """Upper bound of the histogram bucket containing the median"""
+        remaining = sum(self.duration_histogram) / 2
+        if not remaining:
+            return None
+        for i, count in enumerate(self.duration_histogram):
+            remaining -= count
+            if remaining <= 0:
+                break
+        if i >= len(self.DURATION_BUCKETS):
+            return self.DURATION_BUCKETS[-1]
+        return self.DURATION_BUCKETS[i]
+
+    def to_stats(self, now=None) -> FunctionStats:
+        now = now or timezone.now()
+        cutoff = (now - timedelta(hours=24)).isoformat()
+        return FunctionStats(
+            func_name=self.func_name,
+            total=self.total,
+            last_24h=sum(v for k, v in self.hourly_counts.items() if k >= cutoff),
+            errored=self.errored,
+            last_run=self.last_run,
+            median_duration=self.median_duration(),
+        )
+
+
+def function_stats(now=None) -> dict:
+    """Stats for the overview page, from the summary table if enabled."""
+    if use_summary_table():
+        return {
+            summary.func_name: summary.to_stats(now) for summary in FunctionSummary.objects.all()
+        }
+    return ExecutionResult.objects.function_stats(now)
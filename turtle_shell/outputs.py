@@ -0,0 +1,238 @@
+"""
+Large outputs
+-------------
+
+A function's result is encoded to JSON once, straight from what it returned, and that text is what
+gets saved (the ORM doesn't encode it again, see ``models.EncodedJSONField``). Pydantic models are
+encoded field by field instead of going through ``json.loads(model.json())``.
+
+With a size limit or spilling, big lists/dicts are encoded a batch of items at a time so encoding
+stops as soon as the limit is crossed and a spilled output never has to fit in memory.
+
+Settings (per function as ``{"max_output_bytes": ..., "spill_output_bytes": ...}``):
+    TURTLE_SHELL_MAX_OUTPUT_BYTES: hard cap on the encoded output. Encoding stops as soon as it's
+        crossed and the execution is ``TOO_LARGE`` (defaults to no limit)
+    TURTLE_SHELL_SPILL_OUTPUT_BYTES: bigger outputs are streamed to an ``output.json`` artifact
+        instead of the database and ``output_json`` is ``{"output_artifact": <metadata>}``
+        (defaults to never)
+"""
+import json
+import os
+import tempfile
+from typing import Iterator, Optional
+
+from django.conf import settings
+
+from . import utils
+
+# values (counting nested ones) encoded in one go, bigger lists/dicts are encoded in batches
+BATCH_VALUES = 1000
+# ...as long as they aren't nested deeper than this
+MAX_BATCH_DEPTH = 32
+# encoded text is kept (or written out) in pieces of about this many characters
+PIECE_CHARS = 2 ** 20
+OUTPUT_ARTIFACT_NAME = "output.json"
+
+
+class OutputTooLarge(ValueError):
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(f"Output is larger than the limit of {limit} bytes")
+
+
+def max_output_bytes(config: dict) -> Optional[int]:
+    return config.get("max_output_bytes", getattr(settings, "TURTLE_SHELL_MAX_OUTPUT_BYTES", None))
+
+
+def spill_output_bytes(config: dict) -> Optional[int]:
+    return config.get(
+        "spill_output_bytes", getattr(settings, "TURTLE_SHELL_SPILL_OUTPUT_BYTES", None)
+    )
+
+
+def is_model(o) -> bool:
+    """pydantic model (duck typed so this works without pydantic)"""
+    return hasattr(o, "__fields__") and hasattr(o, "__json_encoder__")
+
+
+def _model_items(model) -> dict:
+    """Fields of model without converting nested values (unlike ``.dict()``)"""
+    if getattr(model, "__custom_root_type__", False):
+        return model.__root__
+    return dict(model)
+
+
+_SCALARS = (str, int, float, type(None))
+
+
+def _is_container(o) -> bool:
+    if isinstance(o, (list, tuple, dict)):
+        return True
+    return not isinstance(o, _SCALARS) and is_model(o)
+
+
+def _weight(o, limit: int = BATCH_VALUES, depth: int = 0) -> int:
+    """Number of values in o, counting nested ones (stops counting once it's over limit)"""
+    if isinstance(o, _SCALARS) or not _is_container(o):
+        return 1
+    if is_model(o):
+        return _weight(_model_items(o), limit, depth + 1)
+    if len(o) > limit or depth > MAX_BATCH_DEPTH:
+        return limit + 1
+    total = 1 + len(o)
+    for value in o.values() if isinstance(o, dict) else o:
+        if not isinstance(value, _SCALARS) and _is_container(value):
+            # (value itself is already counted)
+            total += _weight(value, limit - total + 1, depth + 1) - 1
+            if total > limit:
+                break
+    return total
+
+
+def _encode_key(key, encoder) -> Optional[str]:
+    if not isinstance(key, str):
+        if key is None or isinstance(key, (bool, int, float)):
+            key = json.dumps(key)
+        elif encoder.skipkeys:
+            return None
+        else:
+            raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+    return encoder.encode(key)
+
+
+class OutputEncoder(utils.EnumAwareEncoder):
+    """EnumAwareEncoder that encodes pydantic models like ``model.json()``"""
+
+    def default(self, o, **k):
+        if is_model(o):
+            return json.loads(o.json())
+        return super().default(o, **k)
+
+
+def iterencode(
+    value, encoder: json.JSONEncoder = None, *, batched: bool = True, _markers=None
+) -> Iterator[str]:
+    """Encode value in chunks, the same as ``json.dumps(value, cls=OutputEncoder)``.
+
+    With batched, lists/dicts are encoded ``BATCH_VALUES`` at a time. Otherwise (about twice as
+    fast) everything is encoded at once, apart from splitting up a pydantic model's fields."""
+    encoder = encoder or OutputEncoder()
+    if is_model(value):
+        # pydantic's encoder for everything in the outermost model, like model.json()
+        if isinstance(encoder, OutputEncoder):
+            encoder = json.JSONEncoder(default=value.__json_encoder__)
+        yield from iterencode(_model_items(value), encoder, batched=batched, _markers=_markers)
+        return
+    if not batched or _weight(value) <= BATCH_VALUES:
+        yield encoder.encode(value)
+        return
+    markers = _markers if _markers is not None else set()
+    if id(value) in markers:
+        raise ValueError("Circular reference detected")
+    markers.add(id(value))
+    is_dict = isinstance(value, dict)
+    yield "{" if is_dict else "["
+    separator = ""
+    batch, batch_weight = ({} if is_dict else []), 0
+    for key, item in value.items() if is_dict else enumerate(value):
+        weight = _weight(item)
+        if batch and batch_weight + weight > BATCH_VALUES:
+            # small items are encoded together (without the brackets)
+            yield separator + encoder.encode(batch)[1:-1]
+            separator = encoder.item_separator
+            batch, batch_weight = ({} if is_dict else []), 0
+        if weight <= BATCH_VALUES:
+            if is_dict:
+                batch[key] = item
+            else:
+                batch.append(item)
+            batch_weight += weight
+            continue
+        if is_dict:
+            encoded_key = _encode_key(key, encoder)
+            if encoded_key is None:
+                continue
+            yield separator + encoded_key + encoder.key_separator
+        elif separator:
+            yield separator
+        separator = encoder.item_separator
+        yield from iterencode(item, encoder, _markers=markers)
+    if batch:
+        yield separator + encoder.encode(batch)[1:-1]
+    yield "}" if is_dict else "]"
+    markers.discard(id(value))
+
+
+class EncodedOutput:
+    """Encoded output, in memory or (once bigger than spill_bytes) in a file at ``path``"""
+
+    def __init__(self, *, max_bytes: int = None, spill_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.size = 0
+        self.path = None
+        self._file = None
+        self._pieces = []
+        self._pending = []
+        self._pending_size = 0
+
+    def write(self, chunk: str):
+        # encoders escape non-ASCII characters, so characters are bytes
+        self.size += len(chunk)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise OutputTooLarge(self.max_bytes)
+        self._pending.append(chunk)
+        self._pending_size += len(chunk)
+        if self._pending_size >= PIECE_CHARS:
+            self._flush()
+
+    def _flush(self):
+        piece = "".join(self._pending)
+        self._pending, self._pending_size = [], 0
+        if self._file is None and self.spill_bytes is not None and self.size > self.spill_bytes:
+            fd, self.path = tempfile.mkstemp(suffix=".json")
+            self._file = os.fdopen(fd, "w", encoding="ascii")
+            self._file.writelines(self._pieces)
+            self._pieces = []
+        if self._file is not None:
+            self._file.write(piece)
+        else:
+            self._pieces.append(piece)
+
+    def finish(self):
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+
+    def text(self) -> str:
+        """Encoded JSON (only if it wasn't spilled to a file)"""
+        assert not self.path, "output was spilled to a file"
+        if len(self._pieces) != 1:
+            self._pieces = ["".join(self._pieces)]
+        return self._pieces[0]
+
+    def cleanup(self):
+        self._pieces = []
+        if self._file is not None:
+            self._file.close()
+        if self.path:
+            os.unlink(self.path)
+            self.path = None
+
+
+def encode_output(result, *, max_bytes: int = None, spill_bytes: int = None) -> EncodedOutput:
+    """Encode result (raises OutputTooLarge as soon as more than max_bytes are encoded).
+
+    Call ``cleanup()`` on the returned output when done with it."""
+    output = EncodedOutput(max_bytes=max_bytes, spill_bytes=spill_bytes)
+    # without limits it all ends up in memory anyway, so only bother with batches for models
+    # (their fields are encoded through python either way)
+    batched = max_bytes is not None or spill_bytes is not None or is_model(result)
+    try:
+        for chunk in iterencode(result, batched=batched):
+            output.write(chunk)
+        output.finish()
+    except BaseException:
+        output.cleanup()
+        raise
+    return output
@@ -0,0 +1,120 @@
+"""
+Keyset pagination
+-----------------
+
+Relay connections in graphene-django page with ``OFFSET`` and count the whole result first, so
+page 1000 of a big table reads (and throws away) everything before it. ``KeysetConnectionField``
+uses cursors holding the position instead - the ordering column and primary key of an edge - so
+``after``/``before`` become ``WHERE (created, uuid) < (...)`` on an index and every page costs the
+same. There is no total count and ``offset`` isn't supported.
+
+The queryset has to be ordered by a single column (see ``ExecutionResultFilter.ORDERING_FIELDS``),
+primary key is added as a tie breaker.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from graphene.relay import PageInfo
+from graphene_django.filter import DjangoFilterConnectionField
+
+
+def encode_cursor(value, pk) -> str:
+    # not DjangoJSONEncoder, it cuts datetimes to milliseconds
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, str(pk)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+    return value, pk
+
+
+def _ordering(queryset) -> Tuple[str, bool]:
+    """(field, descending) the queryset is ordered by"""
+    order_by = list(queryset.query.order_by or queryset.model._meta.ordering or ["-pk"])
+    if len(order_by) != 1 or not isinstance(order_by[0], str):
+        raise ValueError(f"Keyset pagination needs ordering by a single column, got {order_by}")
+    field = order_by[0]
+    return field.lstrip("-"), field.startswith("-")
+
+
+def _after(queryset, field: str, descending: bool, cursor: str):
+    """Rows after cursor in the (field, descending) ordering"""
+    value, pk = decode_cursor(cursor)
+    if queryset.model._meta.get_field(field).get_internal_type() == "DateTimeField":
+        value = parse_datetime(value)
+    op = "lt" if descending else "gt"
+    return queryset.filter(Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"pk__{op}": pk}))
+
+
+class KeysetConnectionField(DjangoFilterConnectionField):
+    """DjangoFilterConnectionField paging with keyset cursors (see module docstring)"""
+
+    def __init__(self, *args, default_ordering: str = "-created", **kwargs):
+        self.default_ordering = default_ordering
+        super().__init__(*args, **kwargs)
+        self._base_args.pop("offset", None)
+
+    def get_queryset_resolver(self):
+        resolver = super().get_queryset_resolver()
+
+        def resolve_queryset(connection, iterable, info, args):
+            queryset = resolver(connection, iterable, info, args)
+            if not queryset.query.order_by:
+                queryset = queryset.order_by(self.default_ordering)
+            return queryset
+
+        return resolve_queryset
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        field, descending = _ordering(iterable)
+        first: Optional[int] = args.get("first")
+        last: Optional[int] = args.get("last")
+        if first is None and last is None and max_limit is not None:
+            first = max_limit
+        queryset = iterable
+        if args.get("after"):
+            queryset = _after(queryset, field, descending, args["after"])
+        if args.get("before"):
+            queryset = _after(queryset, field, not descending, args["before"])
+        direction = "-" if descending else ""
+        ordered = queryset.order_by(f"{direction}{field}", f"{direction}pk")
+        if first is None and last is None:
+            rows, has_next, has_previous = list(ordered), False, bool(args.get("after"))
+        elif first is not None:
+            rows = list(ordered[: first + 1])
+            has_next, has_previous = len(rows) > first, bool(args.get("after"))
+            rows = rows[:first]
+            if last is not None:
+                rows = rows[-last:] if last else []
+        else:
+            # last N: read backwards from before (or the end)
+            rows = list(ordered.reverse()[: last + 1])
+            has_previous, has_next = len(rows) > last, bool(args.get("before"))
+            rows = rows[:last][::-1]
+
+        edges = [
+            connection.Edge(node=row, cursor=encode_cursor(getattr(row, field), row.pk))
+            for row in rows
+        ]
+        result = connection(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous,
+                has_next_page=has_next,
+            ),
+        )
+        result.iterable = iterable
+        return result
@@ -0,0 +1,425 @@
+"""
+Partitioned history
+-------------------
+
+Deleting old executions row by row out of a huge table is slow and (on Postgres) leaves bloat for
+vacuum to deal with. Instead, history can be kept per month so that expiring a month is dropping a
+table (see the ``turtle_shell_partitions`` command):
+
+On Postgres, ``setup`` turns ``turtle_shell_executionresult`` into a table partitioned by month on
+``created`` (declarative ``PARTITION BY RANGE``). Existing rows stay where they are, as the
+``..._legacy`` partition for everything before next month. ``create`` adds partitions for the
+coming months (run it regularly, inserts fail if there's no partition for them) and ``expire``
+detaches and drops partitions that are entirely before the cutoff.
+
+Everywhere else (or on Postgres without ``setup``), ``archive`` moves complete months out of the
+live tables, in batches, into per-month archive tables (``turtle_shell_executionresult_archive_
+2024_05`` and the same for inputs, artifacts and log chunks), and ``expire`` archives whatever is
+left before the cutoff and drops the archive tables.
+
+Either way Django only ever sees ``turtle_shell_executionresult``, so views and GraphQL work
+unchanged - expired (or archived) executions are just gone.
+
+Partitioning on Postgres means:
+    * the primary key becomes ``(uuid, created)`` (uuids are only unique per partition, they're
+      random so that doesn't matter)
+    * tables pointing at executions lose their foreign key constraints (Django cascades deletes
+      itself) and ``expire`` deletes their rows for a partition before dropping it
+    * single-flight (``turtle_shell_single_flight``) is enforced per partition
+"""
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.backends.utils import truncate_name
+from django.utils import timezone
+
+from .models import ExecutionArtifact, ExecutionResult
+
+TABLE = ExecutionResult._meta.db_table
+LEGACY_PARTITION = f"{TABLE}_legacy"
+# Postgres identifiers are cut at 63 characters
+MAX_NAME_LENGTH = 63
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(start: date, months: int) -> date:
+    year, month = divmod(start.month - 1 + months, 12)
+    return date(start.year + year, month + 1, 1)
+
+
+def parse_month(text: str) -> date:
+    """``"2024-05"`` -> ``date(2024, 5, 1)``"""
+    try:
+        return datetime.strptime(text, "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"Expected a month like 2024-05, got {text!r}")
+
+
+def bound(start: date) -> datetime:
+    """Start of the month as a value of ``created`` (in the default time zone)"""
+    value = datetime(start.year, start.month, 1)
+    return timezone.make_aware(value) if settings.USE_TZ else value
+
+
+def label(start: date) -> str:
+    return f"{start:%Y_%m}"
+
+
+def partition_name(start: date) -> str:
+    return f"{TABLE}_p{label(start)}"
+
+
+def child_tables() -> List[Tuple[str, str]]:
+    """(table, column) of everything pointing at an execution"""
+    return [
+        (rel.related_model._meta.db_table, rel.field.column)
+        for rel in ExecutionResult._meta.related_objects
+        if not rel.many_to_many
+    ]
+
+
+def archive_name(table: str, start: date) -> str:
+    return truncate_name(f"{table}_archive_{label(start)}", MAX_NAME_LENGTH)
+
+
+def _in(values, connection) -> Tuple[str, list]:
+    """Placeholders and params for ``uuid IN (...)``"""
+    pk = ExecutionResult._meta.pk
+    params = [pk.get_db_prep_value(value, connection) for value in values]
+    return ", ".join(["%s"] * len(params)), params
+
+
+def _delete_files(names):
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+# Postgres partitioning
+
+
+def _postgres(using: str):
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        raise ValueError("Native partitioning needs Postgres, use archive/expire instead")
+    return connection
+
+
+def is_partitioned(using: str) -> bool:
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+_upper_bound_re = re.compile(r"TO \('([^']+)'\)")
+
+
+def list_partitions(using: str) -> List[Tuple[str, Optional[str]]]:
+    """(name, upper bound as text) of each partition, oldest first"""
+    with _postgres(using).cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, expression in rows:
+        match = _upper_bound_re.search(expression or "")
+        partitions.append((name, match.group(1) if match else None))
+    return sorted(partitions, key=lambda p: (p[1] is None, p[1] or ""))
+
+
+def _indexes(cursor, table: str) -> List[Tuple[str, str, bool, bool]]:
+    """(name, definition, unique, primary) of table's own indexes"""
+    cursor.execute(
+        """
+        SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique, i.indisprimary
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(%s)
+        -- leave out indexes that are just a partition's part of the parent's index
+        AND NOT EXISTS (SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.indexrelid)
+        ORDER BY c.relname
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _on_table(definition: str, old: str, new: str, qn) -> str:
+    """Index definition moved from table old to table new"""
+    return re.sub(rf" ON (ONLY )?(\S+\.)?\"?{re.escape(old)}\"? ", f" ON {qn(new)} ", definition)
+
+
+def _unique_indexes(cursor, source: str, partition: str, qn) -> List[str]:
+    """Definitions of source's per-partition unique indexes (e.g. single-flight) for partition"""
+    statements = []
+    for i, (name, definition, unique, primary) in enumerate(_indexes(cursor, source)):
+        if unique and not primary:
+            new_name = truncate_name(f"{partition}_uniq{i}", MAX_NAME_LENGTH)
+            definition = definition.replace(f"INDEX {name} ", f"INDEX {qn(new_name)} ", 1)
+            statements.append(_on_table(definition, source, partition, qn))
+    return statements
+
+
+def partition_table(using: str, *, months_ahead: int = 3, log=print):
+    """Turn the executions table into a partitioned one (Postgres only, see module docstring)"""
+    connection = _postgres(using)
+    if is_partitioned(using):
+        raise ValueError(f"{TABLE} is already partitioned")
+    qn = connection.ops.quote_name
+    first = add_months(month_start(timezone.now()), 1)
+    check_name = truncate_name(f"{LEGACY_PARTITION}_bound", MAX_NAME_LENGTH)
+    uuid_created = truncate_name(f"{TABLE}_uuid_created", MAX_NAME_LENGTH)
+    primary_key = truncate_name(f"{TABLE}_pkey", MAX_NAME_LENGTH)
+    # the slow parts go first, without blocking anyone: partitions need a unique index including
+    # the partition key, and a validated check constraint saves ATTACH from scanning everything
+    log(f"Building {uuid_created}")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {qn(uuid_created)} "
+            f"ON {qn(TABLE)} (uuid, created)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(check_name)} CHECK (created < %s) "
+            "NOT VALID",
+            [bound(first)],
+        )
+        log(f"Validating {check_name}")
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} VALIDATE CONSTRAINT {qn(check_name)}")
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        indexes = _indexes(cursor, TABLE)
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, conrelid::regclass::text FROM pg_constraint "
+            "WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE],
+        )
+        for name, child in cursor.fetchall():
+            log(f"Dropping foreign key {name} from {child}")
+            cursor.execute(f"ALTER TABLE {child} DROP CONSTRAINT {qn(name)}")
+
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} RENAME TO {qn(LEGACY_PARTITION)}")
+        # index names are global, the legacy ones get out of the way
+        for name, _, _, _ in indexes:
+            if name != uuid_created:
+                new_name = truncate_name(f"{LEGACY_PARTITION}_{name}", MAX_NAME_LENGTH)
+                cursor.execute(f"ALTER INDEX {qn(name)} RENAME TO {qn(new_name)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(TABLE)} (LIKE {qn(LEGACY_PARTITION)} INCLUDING DEFAULTS "
+            "INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE (created)"
+        )
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} DROP CONSTRAINT {qn(check_name)}")
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(primary_key)} PRIMARY KEY (uuid, created)"
+        )
+        for name, definition, unique, primary in indexes:
+            # unique indexes without created can only exist per partition
+            if not unique:
+                cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}")
+        # matching indexes and foreign keys of the legacy table are attached, not rebuilt
+        log(f"Attaching existing rows as {LEGACY_PARTITION}")
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(LEGACY_PARTITION)} "
+            "FOR VALUES FROM (MINVALUE) TO (%s)",
+            [bound(first)],
+        )
+        cursor.execute(f"ALTER TABLE {qn(LEGACY_PARTITION)} DROP CONSTRAINT {qn(check_name)}")
+    create_partitions(using, months_ahead=months_ahead, log=log)
+
+
+def create_partitions(using: str, *, months_ahead: int = 3, log=print) -> List[str]:
+    """Add missing partitions up to months_ahead after the current month"""
+    connection = _postgres(using)
+    qn = connection.ops.quote_name
+    existing = list_partitions(using)
+    if not existing:
+        raise ValueError(f"{TABLE} isn't partitioned, run setup first")
+    names = {name for name, _ in existing}
+    # per-partition unique indexes are copied from the newest partition
+    source = existing[-1][0]
+    start = month_start(timezone.now())
+    if LEGACY_PARTITION in names:
+        # everything before the legacy partition's end is covered by it
+        start = max(start, _bound_month(dict(existing)[LEGACY_PARTITION]))
+    created = []
+    for months in range(months_ahead + 1):
+        period = add_months(start, months)
+        name = partition_name(period)
+        if name in names or period > add_months(month_start(timezone.now()), months_ahead):
+            continue
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)",
+                [bound(period), bound(add_months(period, 1))],
+            )
+            for statement in _unique_indexes(cursor, source, name, qn):
+                cursor.execute(statement)
+        log(f"Created {name}")
+        created.append(name)
+    return created
+
+
+def drop_partitions(using: str, before: date, *, log=print) -> List[str]:
+    """Drop partitions that are entirely before month before (and rows pointing at them)"""
+    connection = _postgres(using)
+    qn = connection.ops.quote_name
+    dropped = []
+    for name, upper in list_partitions(using):
+        if upper is None or _bound_month(upper) > before:
+            continue
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            in_partition = f"(SELECT uuid FROM {qn(name)})"
+            cursor.execute(
+                f"SELECT file FROM {qn(ExecutionArtifact._meta.db_table)} "
+                f"WHERE execution_id IN {in_partition}"
+            )
+            files = [row[0] for row in cursor.fetchall()]
+            for table, column in child_tables():
+                cursor.execute(f"DELETE FROM {qn(table)} WHERE {qn(column)} IN {in_partition}")
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}")
+            cursor.execute(f"DROP TABLE {qn(name)}")
+            transaction.on_commit(lambda files=files: _delete_files(files), using=using)
+        log(f"Dropped {name}")
+        dropped.append(name)
+    return dropped
+
+
+def _parse_bound(text: str) -> datetime:
+    """Partition bound as printed by Postgres (e.g. ``2024-06-01 00:00:00+00``)"""
+    # offsets without minutes only parse from Python 3.11
+    return datetime.fromisoformat(re.sub(r"([+-]\d\d)$", r"\1:00", text))
+
+
+def _bound_month(text: str) -> date:
+    """Month a partition bound printed by Postgres (e.g. ``2024-06-01 00:00:00+00``) starts"""
+    value = _parse_bound(text)
+    return month_start(timezone.localtime(value) if timezone.is_aware(value) else value)
+
+
+# Archive tables (portable)
+
+
+def archive_month(using: str, start: date, *, batch_size: int = 1000, log=print) -> int:
+    """Move executions created in month start (and rows pointing at them) to archive tables"""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    tables = [(TABLE, "uuid")] + child_tables()
+    existing = set(connection.introspection.table_names())
+    columns = {}
+    with connection.cursor() as cursor:
+        for table, _ in tables:
+            archive = archive_name(table, start)
+            if archive not in existing:
+                # just the columns, no keys or constraints
+                cursor.execute(
+                    f"CREATE TABLE {qn(archive)} AS SELECT * FROM {qn(table)} WHERE 1 = 0"
+                )
+            description = connection.introspection.get_table_description(cursor, archive)
+            columns[table] = ", ".join(qn(column.name) for column in description)
+    queryset = ExecutionResult.objects.using(using).filter(
+        created__gte=bound(start), created__lt=bound(add_months(start, 1))
+    )
+    moved = 0
+    while True:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            uuids = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not uuids:
+                break
+            placeholders, params = _in(uuids, connection)
+            # children first, for foreign key checks
+            for table, column in tables[1:] + tables[:1]:
+                archive = archive_name(table, start)
+                where = f"WHERE {qn(column)} IN ({placeholders})"
+                cursor.execute(
+                    f"INSERT INTO {qn(archive)} ({columns[table]}) "
+                    f"SELECT {columns[table]} FROM {qn(table)} {where}",
+                    params,
+                )
+                cursor.execute(f"DELETE FROM {qn(table)} {where}", params)
+        moved += len(uuids)
+    log(f"Archived {moved} executions from {start:%Y-%m}")
+    return moved
+
+
+def archive(using: str, before: date, *, batch_size: int = 1000, log=print) -> Dict[str, int]:
+    """Archive every month before month before that still has executions in the live table"""
+    counts = {}
+    oldest = ExecutionResult.objects.using(using).order_by("created").first()
+    if not oldest:
+        return counts
+    start = month_start(oldest.created)
+    while start < before:
+        if (
+            ExecutionResult.objects.using(using)
+            .filter(created__gte=bound(start), created__lt=bound(add_months(start, 1)))
+            .exists()
+        ):
+            counts[label(start)] = archive_month(using, start, batch_size=batch_size, log=log)
+        start = add_months(start, 1)
+    return counts
+
+
+def archived_months(using: str) -> List[date]:
+    pattern = re.compile(rf"^{re.escape(TABLE)}_archive_(\d{{4}})_(\d{{2}})$")
+    months = []
+    for name in connections[using].introspection.table_names():
+        if match := pattern.match(name):
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def drop_archives(using: str, before: date, *, log=print) -> List[str]:
+    """Drop archive tables for months before month before (and the artifacts' files)"""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    existing = set(connection.introspection.table_names())
+    artifacts = ExecutionArtifact._meta.db_table
+    dropped = []
+    for start in archived_months(using):
+        if start >= before:
+            continue
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            files = []
+            if archive_name(artifacts, start) in existing:
+                cursor.execute(f"SELECT file FROM {qn(archive_name(artifacts, start))}")
+                files = [row[0] for row in cursor.fetchall()]
+            for table, _ in [(TABLE, "uuid")] + child_tables():
+                if archive_name(table, start) in existing:
+                    cursor.execute(f"DROP TABLE {qn(archive_name(table, start))}")
+            transaction.on_commit(lambda files=files: _delete_files(files), using=using)
+        log(f"Dropped archive for {start:%Y-%m}")
+        dropped.append(label(start))
+    return dropped
+
+
+def expire(using: str, before: date, *, batch_size: int = 1000, log=print) -> List[str]:
+    """Get rid of history before month before, by dropping partitions or archive tables"""
+    if is_partitioned(using):
+        return drop_partitions(using, before, log=log)
+    archive(using, before, batch_size=batch_size, log=log)
+    return drop_archives(using, before, log=log)
@@ -0,0 +1,58 @@
+"""
+Retries
+-------
+
+Per-function retry policy, set in the registry config::
+
+    registry.add(fetch_upstream, config={"retry": {
+        "max_attempts": 5,       # including the first one
+        "backoff": 10,           # seconds before the 1st retry, doubling after that...
+        "max_backoff": 600,      # ...up to this
+        "jitter": 0.2,           # +/- this fraction, so retries don't arrive in lockstep
+        "exceptions": [ConnectionError, "requests.exceptions.Timeout"],  # default: any Exception
+    }})
+
+A retry doesn't sleep: the execution goes back to CREATED with ``not_before`` set, and any worker
+picks it up again once that time has passed. Retries need queued execution (i.e., workers).
+"""
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from django.utils.module_loading import import_string
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    backoff: float = 10.0
+    max_backoff: float = 3600.0
+    jitter: float = 0.1
+    exceptions: Tuple[type, ...] = (Exception,)
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["RetryPolicy"]:
+        """Policy from ``config["retry"]`` (None if there isn't one)"""
+        retry = config.get("retry")
+        if not retry:
+            return None
+        if retry is True:
+            return cls()
+        retry = dict(retry)
+        if "exceptions" in retry:
+            retry["exceptions"] = tuple(
+                import_string(exc) if isinstance(exc, str) else exc for exc in retry["exceptions"]
+            )
+        return cls(**retry)
+
+    def should_retry(self, exc: BaseException, attempt: int) -> bool:
+        """Whether to try again after attempt (1-based) failed with exc"""
+        return attempt < self.max_attempts and isinstance(exc, self.exceptions)
+
+    def delay(self, attempt: int) -> timedelta:
+        """Time to wait after attempt (1-based) failed"""
+        seconds = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            seconds *= 1 + random.uniform(-self.jitter, self.jitter)
+        return timedelta(seconds=max(seconds, 0))
@@ -0,0 +1,81 @@
+"""
+Read replicas
+-------------
+
+Browsing history (list/detail pages, GraphQL queries) is read-only, so it can go to a replica::
+
+    DATABASES = {"default": {...}, "replica": {...}}
+    DATABASE_ROUTERS = ["turtle_shell.routers.TurtleShellRouter"]
+    TURTLE_SHELL_READ_DATABASE = "replica"
+
+Everything that writes (creating and running executions, workers, schedulers) stays on the primary.
+Right after a user creates an execution, their reads stick to the primary for
+``TURTLE_SHELL_STICKY_PRIMARY_SECONDS`` (default 5) so they don't land on a lagging replica and see
+a 404.
+
+Settings:
+    TURTLE_SHELL_READ_DATABASE: alias for read-only queries (unset = everything on the primary)
+    TURTLE_SHELL_WRITE_DATABASE: alias of the primary (defaults to ``"default"``)
+    TURTLE_SHELL_STICKY_PRIMARY_SECONDS: see above
+"""
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_SESSION_KEY = "turtle_shell_primary_until"
+
+
+def write_alias() -> str:
+    return getattr(settings, "TURTLE_SHELL_WRITE_DATABASE", DEFAULT_DB_ALIAS)
+
+
+def replica_alias() -> Optional[str]:
+    return getattr(settings, "TURTLE_SHELL_READ_DATABASE", None)
+
+
+def mark_write(request):
+    """Stick request's user to the primary for a bit (call after creating an execution)"""
+    session = getattr(request, "session", None)
+    if session is not None and replica_alias():
+        seconds = getattr(settings, "TURTLE_SHELL_STICKY_PRIMARY_SECONDS", 5)
+        session[STICKY_SESSION_KEY] = time.time() + seconds
+
+
+def read_alias(request=None) -> str:
+    """Database to use for read-only queries for request"""
+    replica = replica_alias()
+    if not replica:
+        return write_alias()
+    session = getattr(request, "session", None)
+    if session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time():
+        return write_alias()
+    return replica
+
+
+class TurtleShellRouter:
+    """Keeps turtle_shell writes on the primary.
+
+    Reads default to the primary too - only the read-only views/resolvers opt into the replica
+    (see ``read_alias``), so e.g. claiming executions never reads stale rows."""
+
+    app_label = "turtle_shell"
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if model._meta.app_label == self.app_label:
+            return write_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == self.app_label:
+            return write_alias()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self.app_label in (obj1._meta.app_label, obj2._meta.app_label):
+            return True
+        return None
@@ -0,0 +1,139 @@
+"""
+Schedules
+---------
+
+Run registered functions periodically. ``Schedule`` rows (editable in the admin) pair a function
+with a cron expression and fixed inputs; ``python manage.py turtle_shell_scheduler`` fires them.
+
+The scheduler can run on several nodes: only the one holding the ``SchedulerLock`` lease fires
+anything, and each firing moves ``next_run`` with a compare-and-swap so it can't happen twice.
+Firings missed while no scheduler was running are coalesced into one.
+
+Cron expressions have the usual five fields (minute, hour, day of month, month, day of week) and
+support ``*``, ``a-b``, ``*/n``, ``a-b/n`` and lists, evaluated in the current time zone.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import FrozenSet, List
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# (name, min, max)
+CRON_FIELDS = [("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("dow", 0, 7)]
+
+
+def _parse_field(spec: str, name: str, low: int, high: int) -> FrozenSet[int]:
+    values = set()
+    for part in spec.split(","):
+        step = 1
+        if "/" in part:
+            part, step_spec = part.split("/", 1)
+            step = int(step_spec)
+            if step < 1:
+                raise ValueError(f"Bad step in {name} field: {spec!r}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not (low <= start <= end <= high):
+            raise ValueError(f"{name} field out of range ({low}-{high}): {spec!r}")
+        values.update(range(start, end + 1, step))
+    if name == "dow":
+        # 0 and 7 are both sunday
+        values = {value % 7 for value in values}
+    return frozenset(values)
+
+
+class CronSchedule:
+    """Parsed cron expression, see module docstring"""
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {expression!r}")
+        self.expression = expression
+        try:
+            self.minutes, self.hours, self.days, self.months, self.dows = (
+                _parse_field(part, name, low, high)
+                for part, (name, low, high) in zip(parts, CRON_FIELDS)
+            )
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression {expression!r}: {e}") from e
+        # like cron, if both day fields are restricted, either one matching is enough
+        self.any_day = parts[2] != "*" and parts[4] != "*"
+        self.day_restricted = parts[2] != "*"
+
+    def __repr__(self):
+        return f"CronSchedule({self.expression!r})"
+
+    def day_matches(self, dt: datetime) -> bool:
+        in_days = dt.day in self.days
+        # python weekday() is monday=0, cron is sunday=0
+        in_dows = (dt.weekday() + 1) % 7 in self.dows
+        if self.any_day:
+            return in_days or in_dows
+        return in_days if self.day_restricted else in_dows
+
+    def next_after(self, after: datetime) -> datetime:
+        """First time strictly after ``after`` matching the expression"""
+        tz = timezone.get_current_timezone()
+        aware = timezone.is_aware(after)
+        dt = timezone.localtime(after, tz) if aware else after
+        dt = dt.replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        # 5 years covers e.g. feb 29th
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self.day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(dt, tz, is_dst=False) if aware else dt
+        raise ValueError(f"{self.expression!r} never matches")
+
+
+def run_due(now=None) -> List:
+    """Fire every enabled schedule that's due, returning the created executions"""
+    from .models import CaughtException, Schedule, use_queued_execution
+
+    now = now or timezone.now()
+    executions = []
+    for schedule in Schedule.objects.due(now):
+        # compare-and-swap so a firing can't happen twice (even if leadership just changed), and
+        # next run is computed from now, so missed firings are coalesced into this one
+        fired = Schedule.objects.filter(pk=schedule.pk, next_run=schedule.next_run).update(
+            next_run=schedule.cron_schedule.next_after(now), last_run=now
+        )
+        if not fired:
+            continue
+        execution = schedule.create_execution()
+        executions.append(execution)
+        logger.info(f"Schedule {schedule} fired execution {execution.pk}")
+        if not use_queued_execution() and not execution.attached:
+            try:
+                execution.execute()
+            except CaughtException:
+                pass
+    return executions
+
+
+def run_scheduler(*, owner: str, interval: float = 15.0, lock_seconds: float = 60.0, once=False):
+    """Fire due schedules every ``interval`` seconds whenever this process holds the lock"""
+    from .models import SchedulerLock
+
+    while True:
+        if SchedulerLock.acquire("scheduler", owner, lock_seconds):
+            run_due()
+        if once:
+            return
+        time.sleep(interval)
@@ -0,0 +1,16 @@
+import turtle_shell
+
+Registry = turtle_shell.get_registry()
+
+
+def discovered(name: str = "world"):
+    """Say hello.
+
+    Args:
+        name: who to greet
+    """
+    return f"hello {name}"
+
+
+Registry.add(discovered)
+Registry.add("turtle_shell.tests.lazy_tools:slow_tool", name="discovered_slow_tool")
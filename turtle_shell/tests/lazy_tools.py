@@ -0,0 +1,10 @@
+"""Functions for lazy registration tests - tests check whether this module has been imported."""
+
+
+def slow_tool(count: int = 3):
+    """Pretend this needs pandas.
+
+    Args:
+        count: how many
+    """
+    return count * 2
@@ -0,0 +1,130 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.test import RequestFactory
+
+import turtle_shell
+from turtle_shell import Artifact
+from turtle_shell.artifacts import parse_range, serve_artifact
+from turtle_shell.models import ExecutionResult
+from .utils import prepare_request, urlconf_for, view_for
+
+CONTENT = bytes(range(256)) * 64
+
+
+def make_files(directory: str):
+    """Write a file and return it alongside raw bytes."""
+    path = Path(directory) / "reads.bam"
+    path.write_bytes(CONTENT)
+    return {"bam": path, "summary": Artifact(name="summary.txt", data=b"ok"), "count": 2}
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(make_files)
+    yield registry
+    registry.clear()
+
+
+@pytest.fixture
+def execution(db, registry, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.ROOT_URLCONF = urlconf_for(registry)
+    execution = ExecutionResult.objects.create(
+        func_name="make_files", input_json={"directory": str(tmp_path)}
+    )
+    execution.execute()
+    return execution
+
+
+def test_artifacts_stored_with_metadata(execution):
+    bam, summary = execution.artifacts.all()
+    assert execution.output_json["count"] == 2
+    assert execution.output_json["bam"] == bam.metadata
+    assert bam.size == len(CONTENT)
+    assert bam.checksum == hashlib.sha256(CONTENT).hexdigest()
+    assert summary.content_type == "text/plain"
+    assert summary.file.read() == b"ok"
+
+
+def test_download_supports_ranges(execution, django_user_model):
+    user = django_user_model.objects.create(username="downloader")
+    bam = execution.artifacts.get(name="reads.bam")
+    view = view_for(turtle_shell.get_registry(), "artifact-make_files")
+
+    def get(**headers):
+        request = prepare_request(RequestFactory().get(bam.get_absolute_url(), **headers), user)
+        return view(request, pk=execution.pk, artifact_id=bam.pk)
+
+    response = get()
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == CONTENT
+    assert response["Accept-Ranges"] == "bytes"
+
+    response = get(HTTP_RANGE="bytes=10-19")
+    assert response.status_code == 206
+    assert response["Content-Range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert b"".join(response.streaming_content) == CONTENT[10:20]
+
+    response = get(HTTP_RANGE="bytes=-5")
+    assert b"".join(response.streaming_content) == CONTENT[-5:]
+
+    assert get(HTTP_RANGE=f"bytes={len(CONTENT)}-").status_code == 416
+
+
+def test_sendfile_handoff(execution, settings, django_user_model):
+    settings.TURTLE_SHELL_SENDFILE_HEADER = "X-Accel-Redirect"
+    settings.TURTLE_SHELL_SENDFILE_PREFIX = "/protected/"
+    user = django_user_model.objects.create(username="downloader")
+    bam = execution.artifacts.get(name="reads.bam")
+    view = view_for(turtle_shell.get_registry(), "artifact-make_files")
+    request = prepare_request(RequestFactory().get(bam.get_absolute_url()), user)
+    response = view(request, pk=execution.pk, artifact_id=bam.pk)
+    assert response["X-Accel-Redirect"] == f"/protected/{bam.file.name}"
+    assert not response.content
+
+
+class NoPathStorage(FileSystemStorage):
+    """Stand-in for storage without local files (e.g., S3)"""
+
+    def path(self, name):
+        raise NotImplementedError("no local paths")
+
+    def _open(self, name, mode="rb"):
+        return File(open(super().path(name), mode))
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ('say "hi".txt', r'attachment; filename="say \"hi\".txt"'),
+        ("a\r\nSet-Cookie: x.txt", "attachment; filename*=utf-8''a%0D%0ASet-Cookie%3A%20x.txt"),
+        ("résumé.txt", "attachment; filename*=utf-8''r%C3%A9sum%C3%A9.txt"),
+    ],
+)
+def test_sendfile_without_local_path(execution, settings, name, expected):
+    settings.TURTLE_SHELL_SENDFILE_HEADER = "X-Sendfile"
+    artifact = execution.artifacts.get(name="summary.txt")
+    request = RequestFactory().get(artifact.get_absolute_url())
+    response = serve_artifact(request, artifact)
+    assert response["X-Sendfile"] == artifact.file.path
+
+    artifact.name = name
+    artifact.file.storage = NoPathStorage(location=settings.MEDIA_ROOT)
+    response = serve_artifact(request, artifact)
+    assert "X-Sendfile" not in response
+    assert b"".join(response.streaming_content) == b"ok"
+    assert response["Content-Disposition"] == expected
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [(None, None), ("bytes=0-", (0, 99)), ("bytes=90-200", (90, 99)), ("bytes=0-1,5-6", None)],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
@@ -0,0 +1,115 @@
+import json
+import sys
+
+import pytest
+from django.test import RequestFactory
+
+import turtle_shell
+from turtle_shell.commands import LogWriter, format_argv, template_placeholders
+from turtle_shell.models import CaughtException, ExecutionLogChunk, ExecutionResult
+from .utils import prepare_request, urlconf_for, view_for
+
+SCRIPT = "import sys; [print('line', i, flush=True) for i in range(int(sys.argv[1]))]; "
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    yield registry
+    registry.clear()
+    registry._manifest = None
+
+
+def test_template_to_signature(registry):
+    func_obj = turtle_shell.register_command(
+        "copy", "cp {source} --threads={threads} {dest}", types={"threads": int}
+    )
+    assert template_placeholders("cp {source} {dest}") == ["source", "dest"]
+    assert list(func_obj.form_class.base_fields) == ["source", "threads", "dest"]
+    assert format_argv("cp {source} --region={region}", {"source": "a b", "region": None}) == [
+        "cp",
+        "a b",
+    ]
+
+
+def test_commands_left_out_of_manifest(registry, tmp_path):
+    from turtle_shell.manifest import write_manifest
+
+    registry.add(format_argv)
+    func_obj = turtle_shell.register_command("copy", "cp {source} {dest}")
+    # built at runtime, so there's nothing to import it by
+    assert func_obj.import_path is None
+    assert func_obj.module_name is None
+    assert registry.get("format_argv").import_path == "turtle_shell.commands:format_argv"
+    path = tmp_path / "manifest.json"
+    assert set(write_manifest(registry, path)["functions"]) == {"format_argv"}
+
+    registry.clear()
+    registry.load_manifest(path, register=True)
+    assert set(registry.func_name2func) == {"format_argv"}
+
+
+def test_command_output_captured_in_chunks(db, registry, settings):
+    settings.TURTLE_SHELL_LOG_CHUNK_BYTES = 64
+    turtle_shell.register_command(
+        "count",
+        f"{sys.executable} -c {{script}} {{n}}",
+        types={"n": int},
+        defaults={"script": SCRIPT + "print('oops', file=sys.stderr)"},
+    )
+    execution = ExecutionResult.objects.create(func_name="count", input_json={"n": 50})
+    execution.execute()
+    assert execution.output_json["returncode"] == 0
+    chunks = list(execution.log_chunks.all())
+    assert len(chunks) > 1
+    stdout = "".join(c.data for c in chunks if c.stream == "stdout")
+    assert stdout == "".join(f"line {i}\n" for i in range(50))
+    assert [c.data for c in chunks if c.stream == "stderr"] == ["oops\n"]
+
+
+def test_failing_command_errors(db, registry):
+    turtle_shell.register_command("fail", f"{sys.executable} -c {{script}}")
+    execution = ExecutionResult.objects.create(
+        func_name="fail", input_json={"script": "import sys; sys.exit(3)"}
+    )
+    with pytest.raises(CaughtException):
+        execution.execute()
+    assert "status 3" in execution.error_json["message"]
+
+
+def test_log_writer_drops_oldest_chunks(db):
+    execution = ExecutionResult.objects.create(func_name="x", input_json={})
+    log = LogWriter(execution, chunk_bytes=10, max_bytes=25)
+    for i in range(10):
+        log.write("stdout", f"{i}" * 10)
+    log.flush()
+    assert log.truncated
+    assert [c.data for c in ExecutionLogChunk.objects.all()] == ["8" * 10, "9" * 10]
+
+
+def test_log_writer_counts_bytes_for_flushing_and_trimming(db):
+    execution = ExecutionResult.objects.create(func_name="x", input_json={})
+    # 10 characters, 20 bytes each
+    log = LogWriter(execution, chunk_bytes=20, max_bytes=50)
+    for i in range(5):
+        log.write("stdout", "é" * 10)
+        assert not log.pending
+    assert log.total == 100
+    assert log.truncated
+    assert ExecutionLogChunk.objects.count() == 2
+
+
+def test_log_view_returns_new_chunks(db, registry, settings, django_user_model):
+    turtle_shell.register_command("noop", "true")
+    settings.ROOT_URLCONF = urlconf_for(registry)
+    execution = ExecutionResult.objects.create(func_name="noop", input_json={})
+    for seq in range(3):
+        ExecutionLogChunk.objects.create(execution=execution, seq=seq, data=str(seq))
+    user = django_user_model.objects.create(username="watcher")
+    view = view_for(registry, "log-noop")
+    request = prepare_request(RequestFactory().get("/", {"after": 0}), user)
+    body = json.loads(view(request, pk=execution.pk).content)
+    assert [c["data"] for c in body["chunks"]] == ["1", "2"]
+    assert body["last_seq"] == 2
+    assert not body["done"]
@@ -1,5 +1,8 @@
+import datetime
+import decimal
 import enum
 import json
+import uuid
 
 import pytest
 from django import forms
@@ -8,6 +11,8 @@ from .utils import compare_form_field, compare_forms
 from turtle_shell.function_to_form import param_to_field
 from turtle_shell.function_to_form import function_to_form
 from turtle_shell.function_to_form import Coercer
+from turtle_shell.function_to_form import FieldDispatcher
+from turtle_shell.function_to_form import restore_input_types
 from turtle_shell import utils
 import turtle_shell
 from defopt import Parameter
@@ -286,3 +291,60 @@ def test_coercer():
     assert Coercer(StringlyIntEnum)("1") == StringlyIntEnum("1")
     with pytest.raises(ValueError):
         Coercer(StringlyIntEnum)(1)
+
+
+@pytest.mark.parametrize(
+    "arg,expected",
+    [
+        (_make_parameter("when", datetime.datetime), forms.DateTimeField(required=True)),
+        (_make_parameter("day", datetime.date), forms.DateField(required=True)),
+        (
+            _make_parameter("amount", decimal.Decimal, default=None),
+            forms.DecimalField(required=False),
+        ),
+        (_make_parameter("ident", uuid.UUID), forms.UUIDField(required=True)),
+        (_make_parameter("items", typing.List[int]), forms.JSONField(required=True)),
+        (
+            _make_parameter("more_items", Optional[list], default=None),
+            forms.JSONField(required=False),
+        ),
+        # closest base class in the MRO wins
+        (_make_parameter("subtext", type("SubText", (Text,), {})), forms.CharField(required=True)),
+    ],
+    ids=lambda x: x.name if hasattr(x, "name") else x,
+)
+def test_convert_arg_extended_types(arg, expected):
+    compare_form_field(arg.name, param_to_field(arg), expected)
+
+
+def test_literal_field():
+    field = param_to_field(_make_parameter("level", typing.Literal["low", 3], default=3))
+    assert isinstance(field, forms.TypedChoiceField)
+    assert list(field.choices) == [("low", "low"), ("3", "3")]
+    assert field.clean("3") == 3
+    assert field.clean("low") == "low"
+
+
+def test_dispatcher_register_and_config():
+    class Special(str):
+        pass
+
+    dispatcher = FieldDispatcher({str: forms.CharField}, {})
+    param = _make_parameter("special", Special)
+    assert dispatcher.field_type(param, Special) is forms.CharField
+    dispatcher.register(Special, forms.SlugField)
+    assert dispatcher.field_type(param, Special) is forms.SlugField
+    configured = dispatcher.with_config({"fields": {"special": forms.EmailField}})
+    assert configured.field_type(param, Special) is forms.EmailField
+    assert dispatcher.with_config({}) is dispatcher
+
+
+def test_restore_input_types():
+    def func(when: datetime.datetime, amount: Optional[decimal.Decimal], name: str):
+        pass
+
+    ident = {"when": "2021-04-01T10:00:00Z", "amount": "1.50", "name": "2021-04-01"}
+    restored = restore_input_types(func, ident)
+    assert restored["when"] == datetime.datetime(2021, 4, 1, 10, tzinfo=datetime.timezone.utc)
+    assert restored["amount"] == decimal.Decimal("1.50")
+    assert restored["name"] == "2021-04-01"
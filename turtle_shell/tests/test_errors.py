@@ -0,0 +1,80 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory
+
+import turtle_shell
+from turtle_shell import errors
+from turtle_shell.models import CaughtException, ErrorTraceback, ExecutionResult
+from .utils import prepare_request, view_for
+
+
+def lookup(key: str, table: str = "widgets"):
+    if key == "missing":
+        raise KeyError(f"{key} not in {table} (at {object()!r})")
+    try:
+        int(key)
+    except ValueError as e:
+        raise RuntimeError(f"bad key {key}") from e
+    return key
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(lookup)
+    yield registry
+    registry.clear()
+
+
+def run(key, table="widgets"):
+    execution = ExecutionResult.objects.create_execution(
+        func_name="lookup", input_json={"key": key, "table": table}
+    )
+    with pytest.raises(CaughtException):
+        execution.execute()
+    return execution
+
+
+def test_tracebacks_stored_once(db, registry):
+    first = run("missing")
+    # different message, same failure
+    second = run("missing", table="gadgets")
+    chained = run("abc")
+    assert ErrorTraceback.objects.count() == 2
+    assert first.error_traceback_id == second.error_traceback_id != chained.error_traceback_id
+    # messages are still per execution
+    assert "gadgets" in second.error_json["message"]
+    second.refresh_from_db()
+    assert "KeyError" in second.traceback
+    assert second.error_traceback.error_type == "KeyError"
+    assert chained.error_traceback.error_type == "RuntimeError"
+    assert "direct cause" in chained.traceback
+    fine = ExecutionResult.objects.create_execution(func_name="lookup", input_json={"key": "1"})
+    assert fine.traceback == ""
+
+
+@pytest.mark.parametrize("key", ["missing", "abc"])
+def test_text_key_matches_exception_key(key):
+    try:
+        lookup(key)
+    except Exception as e:
+        exc = e
+    text = errors.format_exception(exc)
+    assert errors.text_key(text) == errors.exception_key(exc)
+    assert errors.text_key(text + "\nmore of a\nmultiline message") == errors.exception_key(exc)
+
+
+def test_error_groups_view(db, registry):
+    for key in ["missing", "abc", "missing", "missing"]:
+        run(key)
+    user = get_user_model().objects.create(username="oncall")
+    request = prepare_request(RequestFactory().get("/lookup/errors/"), user)
+    response = view_for(registry, "errors-lookup")(request)
+    groups = response.context_data["object_list"]
+    assert [(group["error"].error_type, group["count"]) for group in groups] == [
+        ("KeyError", 3),
+        ("RuntimeError", 1),
+    ]
+    latest = ExecutionResult.objects.filter(error_traceback=groups[0]["error"]).latest("created")
+    assert groups[0]["last_seen"] == latest.created
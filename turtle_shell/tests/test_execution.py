@@ -0,0 +1,286 @@
+import enum
+
+import pytest
+from django.db import IntegrityError
+
+import turtle_shell
+from turtle_shell.models import ExecutionResult
+
+
+class Mode(enum.Enum):
+    fast = "fast"
+    slow = "slow"
+
+
+def expensive(a: int, mode: Mode = Mode.fast):
+    return a
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    yield registry
+    registry.clear()
+
+
+def test_single_flight_attaches_to_active(db, registry):
+    registry.add(expensive, config={"single_flight": True})
+    first = ExecutionResult.objects.create_execution(
+        func_name="expensive", input_json={"a": 1, "mode": Mode.slow}
+    )
+    # key order doesn't matter for canonical input
+    second = ExecutionResult.objects.create_execution(
+        func_name="expensive", input_json={"mode": Mode.slow, "a": 1}
+    )
+    assert not first.attached
+    assert second.attached
+    assert second.pk == first.pk
+    other_input = ExecutionResult.objects.create_execution(
+        func_name="expensive", input_json={"a": 2, "mode": Mode.slow}
+    )
+    assert not other_input.attached
+
+    first.execute()
+    assert first.status == ExecutionResult.ExecutionStatus.DONE
+    # no longer in flight, so we get a fresh execution
+    third = ExecutionResult.objects.create_execution(
+        func_name="expensive", input_json={"a": 1, "mode": Mode.slow}
+    )
+    assert not third.attached
+    assert third.pk != first.pk
+
+
+def test_single_flight_is_opt_in(db, registry):
+    registry.add(expensive)
+    first = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    second = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    assert not second.attached
+    assert first.pk != second.pk
+
+
+def test_single_flight_unique_index(db, registry):
+    registry.add(expensive, config={"single_flight": True})
+    obj = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    # e.g., another process racing us past the lookup
+    with pytest.raises(IntegrityError):
+        ExecutionResult.objects.create(
+            func_name="expensive",
+            input_json={"a": 1},
+            func_version=obj.func_version,
+            input_hash=obj.input_hash,
+            single_flight=True,
+        )
+
+
+def test_worker_runs_queued(db, registry, settings):
+    from turtle_shell import worker
+
+    settings.TURTLE_SHELL_QUEUED_EXECUTION = True
+    registry.add(expensive)
+    registry.add(expensive, name="other")
+    for i in range(3):
+        ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": i})
+    assert worker.preload_modules(registry) == [__name__]
+
+    # recycled after max_executions
+    assert worker.run_worker(max_executions=2, stop_when_idle=True) == 2
+    assert worker.run_worker(stop_when_idle=True) == 1
+    assert worker.run_worker(stop_when_idle=True) == 0
+    assert set(ExecutionResult.objects.values_list("status", flat=True)) == {"DONE"}
+    assert sorted(ExecutionResult.objects.values_list("output_json", flat=True)) == [0, 1, 2]
+
+
+def test_claim_next_only_claims_once(db, registry):
+    registry.add(expensive)
+    obj = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    claimed = ExecutionResult.objects.claim_next()
+    assert claimed.pk == obj.pk
+    assert claimed.status == ExecutionResult.ExecutionStatus.RUNNING
+    assert ExecutionResult.objects.claim_next() is None
+
+
+def test_leases_heartbeat_and_reaping(db, registry):
+    from datetime import timedelta
+    from django.utils import timezone
+
+    registry.add(expensive)
+    obj = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    claimed = ExecutionResult.objects.claim_next(owner="host:1", lease_seconds=30)
+    assert (claimed.lease_owner, claimed.attempts) == ("host:1", 1)
+    assert ExecutionResult.objects.heartbeat(obj.pk, "host:1", 30)
+    assert not ExecutionResult.objects.heartbeat(obj.pk, "host:2", 30)
+
+    # nothing expired yet
+    assert ExecutionResult.objects.reap_expired() == {"requeued": 0, "failed": 0}
+    later = timezone.now() + timedelta(seconds=60)
+    assert ExecutionResult.objects.reap_expired(later) == {"requeued": 1, "failed": 0}
+    obj.refresh_from_db()
+    assert obj.status == ExecutionResult.ExecutionStatus.CREATED
+    # the dead worker's heartbeat can't take it back
+    assert not ExecutionResult.objects.heartbeat(obj.pk, "host:1", 30)
+
+    ExecutionResult.objects.claim_next(owner="host:2", lease_seconds=30)
+    later = timezone.now() + timedelta(seconds=60)
+    assert ExecutionResult.objects.reap_expired(later, max_attempts=2) == {
+        "requeued": 0,
+        "failed": 1,
+    }
+    obj.refresh_from_db()
+    assert obj.status == ExecutionResult.ExecutionStatus.ERRORED
+    assert obj.error_json["type"] == "LeaseExpired"
+
+
+def test_reaped_worker_does_not_overwrite_new_owner(db, registry):
+    from datetime import timedelta
+    from django.utils import timezone
+    from turtle_shell.models import LeaseLost
+
+    registry.add(expensive)
+    obj = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    slow = ExecutionResult.objects.claim_next(owner="host:1", lease_seconds=30)
+    later = timezone.now() + timedelta(seconds=60)
+    assert ExecutionResult.objects.reap_expired(later) == {"requeued": 1, "failed": 0}
+    fast = ExecutionResult.objects.claim_next(owner="host:2", lease_seconds=30)
+    # the first worker finally finishes, after its execution was handed over
+    with pytest.raises(LeaseLost):
+        slow.execute()
+    obj.refresh_from_db()
+    assert (obj.status, obj.lease_owner, obj.output_json) == ("RUNNING", "host:2", {})
+
+    assert fast.execute() == 1
+    obj.refresh_from_db()
+    assert (obj.status, obj.output_json) == (ExecutionResult.ExecutionStatus.DONE, 1)
+
+
+flaky_calls = []
+
+
+def flaky(a: int):
+    flaky_calls.append(a)
+    if len(flaky_calls) < 3:
+        raise ConnectionError("upstream hiccup")
+    return a
+
+
+def test_retries_with_backoff(db, registry, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from turtle_shell.models import RetryScheduled
+    from turtle_shell.retries import RetryPolicy
+
+    settings.TURTLE_SHELL_QUEUED_EXECUTION = True
+    flaky_calls.clear()
+    retry = {"max_attempts": 3, "backoff": 60, "exceptions": ["builtins.OSError"]}
+    registry.add(flaky, config={"retry": retry})
+    obj = ExecutionResult.objects.create_execution(func_name="flaky", input_json={"a": 1})
+    for attempt in (1, 2):
+        claimed = ExecutionResult.objects.claim_next()
+        with pytest.raises(RetryScheduled):
+            claimed.execute()
+        claimed.refresh_from_db()
+        assert claimed.status == ExecutionResult.ExecutionStatus.CREATED
+        assert claimed.not_before > timezone.now() + timedelta(seconds=50 * attempt)
+        # waiting doesn't hold up a worker
+        assert ExecutionResult.objects.claim_next() is None
+        ExecutionResult.objects.filter(pk=obj.pk).update(not_before=timezone.now())
+    ExecutionResult.objects.claim_next().execute()
+    obj.refresh_from_db()
+    assert obj.status == ExecutionResult.ExecutionStatus.DONE
+    assert [a["status"] for a in obj.attempt_history] == ["ERRORED", "ERRORED", "DONE"]
+    assert obj.attempt_history[0]["error"]["type"] == "ConnectionError"
+
+    policy = RetryPolicy.from_config({"retry": {"exceptions": [OSError]}})
+    assert not policy.should_retry(ValueError(), 1)
+    assert not policy.should_retry(OSError(), 3)
+
+
+def test_reaping_uses_retry_policy(db, registry, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from turtle_shell.models import CaughtException
+
+    settings.TURTLE_SHELL_QUEUED_EXECUTION = True
+    settings.TURTLE_SHELL_MAX_ATTEMPTS = 3
+    flaky_calls.clear()
+    registry.add(flaky, config={"retry": {"max_attempts": 5}})
+    registry.add(expensive, config={"retry": {"max_attempts": 1}})
+
+    def crash(func_name):
+        """claim func_name's execution, then let the worker die"""
+        claimed = ExecutionResult.objects.claim_next([func_name], lease_seconds=30)
+        later = timezone.now() + timedelta(seconds=60)
+        return claimed, ExecutionResult.objects.reap_expired(later)
+
+    once = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    assert crash("expensive")[1] == {"requeued": 0, "failed": 1}
+    once.refresh_from_db()
+    assert once.status == ExecutionResult.ExecutionStatus.ERRORED
+
+    obj = ExecutionResult.objects.create_execution(func_name="flaky", input_json={"a": 1})
+    for _ in range(4):
+        assert crash("flaky")[1] == {"requeued": 1, "failed": 0}
+    # crashed attempts use up retries too
+    claimed = ExecutionResult.objects.claim_next(["flaky"])
+    assert claimed.attempts == 5
+    with pytest.raises(CaughtException, match="upstream hiccup"):
+        claimed.execute()
+    obj.refresh_from_db()
+    assert obj.status == ExecutionResult.ExecutionStatus.ERRORED
+    assert [a["status"] for a in obj.attempt_history] == ["ERRORED"]
+
+    obj = ExecutionResult.objects.create_execution(func_name="flaky", input_json={"a": 2})
+    for _ in range(4):
+        crash("flaky")
+    assert crash("flaky")[1] == {"requeued": 0, "failed": 1}
+
+
+def test_function_version(db, registry):
+    from turtle_shell.function_to_form import function_version
+
+    func_obj = registry.add(expensive, config={"version": "2"})
+    assert func_obj.version == function_version(expensive, "2")
+    assert func_obj.version.startswith("2-")
+    assert function_version(expensive) != function_version(flaky)
+    obj = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    assert obj.func_version == func_obj.version
+
+
+def test_results_reused_within_version(db, registry):
+    func_obj = registry.add(expensive, config={"reuse_results": 3600})
+    first = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    # not done yet
+    assert not ExecutionResult.objects.create_execution(
+        func_name="expensive", input_json={"a": 1}
+    ).attached
+    first.execute()
+    reused = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    assert (reused.pk, reused.reused) == (first.pk, True)
+
+    # new code -> new version -> no reuse
+    func_obj._version = "changed"
+    fresh = ExecutionResult.objects.create_execution(func_name="expensive", input_json={"a": 1})
+    assert not fresh.reused
+    assert fresh.func_version == "changed"
+
+
+def test_one_write_per_transition(db, registry):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    registry.add(expensive)
+    gql = "mutation { executeExpensive(input: {a: 3}) { execution { outputJson status } } }"
+    with CaptureQueriesContext(connection) as ctx:
+        result = registry.schema.execute(gql)
+    assert not result.errors
+    assert result.data["executeExpensive"]["execution"]["status"] == "DONE"
+    writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+    assert len(writes) == 3, writes
+    insert, index_inputs, update = writes
+    assert insert.startswith('INSERT INTO "turtle_shell_executionresult"')
+    # one bulk insert for the searchable inputs
+    assert index_inputs.startswith('INSERT INTO "turtle_shell_executioninput"')
+    # only what changed, not e.g. the input again
+    assert update.startswith('UPDATE "turtle_shell_executionresult"')
+    assert '"input_json"' not in update
+    assert len(ctx.captured_queries) <= 5, [q["sql"] for q in ctx.captured_queries]
@@ -0,0 +1,159 @@
+import enum
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory
+
+import turtle_shell
+from turtle_shell.models import ExecutionInput, ExecutionResult
+from .utils import prepare_request, view_for
+
+
+class Assay(enum.Enum):
+    rna = "rna"
+    dna = "dna"
+
+
+def analyze(analysis_id: str, sample: int, assay: Assay = Assay.rna, tags: list = None):
+    return analysis_id
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(analyze)
+    yield registry
+    registry.clear()
+
+
+@pytest.fixture
+def executions(db, registry):
+    inputs = [
+        {"analysis_id": "A-1", "sample": 1, "assay": Assay.rna, "tags": ["x"]},
+        {"analysis_id": "A-1", "sample": 2, "assay": Assay.dna},
+        {"analysis_id": "B-7", "sample": 1, "assay": Assay.dna},
+    ]
+    return [
+        ExecutionResult.objects.create_execution(func_name="analyze", input_json=input_json)
+        for input_json in inputs
+    ]
+
+
+def test_inputs_indexed_at_creation(executions):
+    assert sorted(executions[0].inputs.values_list("key", "value")) == [
+        ("analysis_id", "A-1"),
+        ("assay", "rna"),
+        ("sample", "1"),
+    ]
+    assert ExecutionInput.encode_value(["x"]) is None
+    assert ExecutionInput.encode_value("x" * 1000) is None
+    assert ExecutionInput.encode_value(True) == "true"
+
+
+def test_with_inputs(executions):
+    def search(**inputs):
+        return set(ExecutionResult.objects.with_inputs(inputs))
+
+    assert search(analysis_id="A-1") == set(executions[:2])
+    assert search(analysis_id="A-1", sample=2) == {executions[1]}
+    assert search(analysis_id="A-1", sample="2") == {executions[1]}
+    assert search(sample=1, assay=Assay.dna) == {executions[2]}
+    assert search(analysis_id="nope") == set()
+
+
+def test_list_view_input_search(executions, registry):
+    user = get_user_model().objects.create(username="analyst")
+    view = view_for(registry, "list-analyze")
+
+    def search(query):
+        request = prepare_request(RequestFactory().get("/analyze/", query), user)
+        return set(view(request).context_data["object_list"])
+
+    assert search({"input": "analysis_id=A-1"}) == set(executions[:2])
+    assert search({"input": ["analysis_id=A-1", "assay=dna"]}) == {executions[1]}
+    assert search({}) == set(executions)
+
+
+def test_graphql_input_filter(executions, registry):
+    def search(text):
+        query = 'query { executionResults(input: "%s") { edges { node { uuid } } } }' % text
+        result = registry.schema.execute(query)
+        assert not result.errors
+        return {edge["node"]["uuid"] for edge in result.data["executionResults"]["edges"]}
+
+    assert search("analysis_id=A-1&sample=1") == {str(executions[0].uuid)}
+    assert search("assay=dna") == {str(e.uuid) for e in executions[1:]}
+
+
+def query(registry, args):
+    gql = (
+        "query { executionResults(%s) { edges { cursor node { uuid status } } "
+        "pageInfo { hasNextPage hasPreviousPage startCursor endCursor } } }" % args
+    )
+    result = registry.schema.execute(gql)
+    assert not result.errors, result.errors
+    return result.data["executionResults"]
+
+
+def uuids(data):
+    return [edge["node"]["uuid"] for edge in data["edges"]]
+
+
+def test_graphql_column_filters(executions, registry):
+    user = get_user_model().objects.create(username="analyst")
+    ExecutionResult.objects.filter(pk=executions[0].pk).update(status="DONE", user=user)
+    ExecutionResult.objects.filter(pk=executions[1].pk).update(status="ERRORED")
+    assert uuids(query(registry, 'status: "DONE"')) == [str(executions[0].uuid)]
+    assert len(uuids(query(registry, 'status_In: ["DONE", "ERRORED"]'))) == 2
+    assert uuids(query(registry, 'user_Username: "analyst"')) == [str(executions[0].uuid)]
+    created = executions[1].created.isoformat()
+    assert uuids(query(registry, f'created_Gte: "{created}"')) == [
+        str(e.uuid) for e in reversed(executions[1:])
+    ]
+    assert uuids(query(registry, f'created_Lt: "{created}"')) == [str(executions[0].uuid)]
+
+
+def test_keyset_pagination(db, registry):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    executions = [
+        ExecutionResult.objects.create_execution(
+            func_name="analyze", input_json={"analysis_id": str(i), "sample": i}
+        )
+        for i in range(7)
+    ]
+    # ties on the ordering column are broken by uuid
+    ExecutionResult.objects.filter(pk__in=[e.pk for e in executions[2:5]]).update(
+        created=executions[2].created
+    )
+    expected = [str(e.uuid) for e in ExecutionResult.objects.order_by("-created", "-pk")]
+    seen, after = [], None
+    with CaptureQueriesContext(connection) as ctx:
+        while True:
+            page = query(registry, "first: 3" + (f', after: "{after}"' if after else ""))
+            seen.extend(uuids(page))
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            after = page["pageInfo"]["endCursor"]
+    assert seen == expected
+    # no offsets, no counting
+    sql = " ".join(q["sql"] for q in ctx.captured_queries)
+    assert "OFFSET" not in sql and "COUNT(" not in sql
+
+    # backwards, oldest first ordering
+    ascending = query(registry, 'orderBy: "created", last: 2')
+    assert uuids(ascending) == expected[:2][::-1]
+    assert ascending["pageInfo"]["hasPreviousPage"]
+    before = query(
+        registry, f'orderBy: "created", last: 2, before: "{ascending["edges"][0]["cursor"]}"'
+    )
+    assert uuids(before) == expected[2:4][::-1]
+
+
+def test_keyset_pagination_rejects_bad_cursor(db, registry):
+    result = registry.schema.execute(
+        'query { executionResults(after: "nope") { edges { cursor } } }'
+    )
+    assert result.errors
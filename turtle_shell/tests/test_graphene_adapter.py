@@ -78,3 +78,151 @@ class TestDefaultHandling:
             func, "mutation { executeFunc(input: {s: DEFAULT_YEAH}) { result { inputJson }}}"
         )
         assert input_json == input_json2
+
+
+class Shape(enum.Enum):
+    circle = "circle"
+    square = "square"
+
+
+def draw(shape: Shape = Shape.circle):
+    return shape
+
+
+def fill(shape: Shape = Shape.square, color: str = "red"):
+    return color
+
+
+def test_enum_names_stable_across_rebuilds():
+    registry = turtle_shell._Registry()
+    registry.add(draw)
+    assert "drawshape" in registry.schema.get_type_map()
+    for _ in range(3):
+        registry.clear()
+        registry.add(draw)
+        type_map = registry.schema.get_type_map()
+        assert "drawshape" in type_map
+        assert "drawshape1" not in type_map
+
+
+def test_schema_rebuild_only_converts_new_functions():
+    registry = turtle_shell._Registry()
+    registry.add(draw)
+    first_schema = registry.schema
+    draw_mutation = registry.graphql_cache.mutations["draw"]
+
+    registry.add(fill)
+    assert registry.schema is not first_schema
+    assert registry.graphql_cache.mutations["draw"] is draw_mutation
+    assert set(registry.schema.get_mutation_type().fields) == {"executeDraw", "executeFill"}
+
+    registry.remove("fill")
+    assert set(registry.graphql_cache.mutations) == {"draw"}
+    assert all(key[0] == "draw" for key in registry.graphql_cache.enums)
+    assert set(registry.schema.get_mutation_type().fields) == {"executeDraw"}
+
+
+def test_json_fields_passed_through_as_text(db, monkeypatch):
+    import json
+    from turtle_shell.models import ExecutionResult
+
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(draw)
+    output = {"shape": Shape.square, "rows": [{"i": i, "name": f"row {i}"} for i in range(50)]}
+    execution = ExecutionResult.objects.create_execution(
+        func_name="draw", input_json={"shape": Shape.circle}
+    )
+    ExecutionResult.objects.filter(pk=execution.pk).update(output_json=output)
+    expected = json.loads(json.dumps(output, cls=utils.EnumAwareEncoder))
+
+    def decoded(*a, **k):
+        raise AssertionError("JSON shouldn't be decoded")
+
+    for field in ("input_json", "output_json"):
+        monkeypatch.setattr(ExecutionResult._meta.get_field(field), "from_db_value", decoded)
+    try:
+        result = registry.schema.execute(
+            "query { executionResults { edges { node { inputJson outputJson } } } }"
+        )
+        assert not result.errors
+        node = result.data["executionResults"]["edges"][0]["node"]
+        assert json.loads(node["outputJson"]) == expected
+        assert json.loads(node["inputJson"])["shape"]["__enum__"]["name"] == "circle"
+        single = registry.schema.execute(
+            'query { executionResult(uuid: "%s") { outputJson } }' % execution.pk
+        )
+        assert json.loads(single.data["executionResult"]["outputJson"]) == expected
+    finally:
+        registry.clear()
+
+
+@pytest.mark.parametrize("sqlite_version", [None, (3, 37, 2)])
+def test_json_path_selection(db, monkeypatch, sqlite_version):
+    import json
+    import re
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from turtle_shell.models import ExecutionResult
+
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(draw)
+    execution = ExecutionResult.objects.create_execution(
+        func_name="draw", input_json={"shape": Shape.circle}
+    )
+    if sqlite_version:
+        # before the -> operator
+        monkeypatch.setattr(connection.Database, "sqlite_version_info", sqlite_version)
+    output = {
+        "summary": {"p95": 12.5, "name": "run", "ok": True, "none": None},
+        "rows": [{"name": f"r{i}"} for i in range(5)],
+        # strings that would decode to something else
+        "looks_like": {"number": "123", "null": "null", "list": "[1]"},
+    }
+    ExecutionResult.objects.filter(pk=execution.pk).update(output_json=output)
+    query = """
+    query ($path: String) {
+        executionResults { edges { node { ...paths } } }
+    }
+    fragment paths on ExecutionResult {
+        p95: outputJson(path: "summary.p95")
+        row: outputJson(path: $path)
+        missing: outputJson(path: "summary.nope")
+        ok: outputJson(path: "summary.ok")
+        none: outputJson(path: "summary.none")
+        number: outputJson(path: "looks_like.number")
+        null: outputJson(path: "looks_like.null")
+        list: outputJson(path: "looks_like.list")
+        shape: inputJson(path: "shape")
+    }
+    """
+    try:
+        with CaptureQueriesContext(connection) as ctx:
+            result = registry.schema.execute(query, variable_values={"path": "rows.3"})
+        assert not result.errors, result.errors
+        node = result.data["executionResults"]["edges"][0]["node"]
+        assert json.loads(node["p95"]) == 12.5
+        assert json.loads(node["row"]) == {"name": "r3"}
+        assert json.loads(node["missing"]) is None
+        assert json.loads(node["ok"]) is True
+        assert json.loads(node["none"]) is None
+        assert json.loads(node["number"]) == "123"
+        assert json.loads(node["null"]) == "null"
+        assert json.loads(node["list"]) == "[1]"
+        assert json.loads(node["shape"])["__enum__"]["name"] == "circle"
+        # extracted by the database, whole documents never selected
+        (select,) = [q["sql"] for q in ctx.captured_queries if "executionresult" in q["sql"]]
+        column = '"turtle_shell_executionresult"."output_json"'
+        extracted = rf"\({re.escape(column)} -> |JSON_[A-Z]+\({re.escape(column)}, "
+        assert select.count(column) == len(re.findall(extracted, select)) > 0
+
+        # mutation payloads aren't from the queryset, so the path is followed in python
+        mutation = registry.schema.execute(
+            'mutation { executeDraw(input: {}) { execution { inputJson(path: "shape") } } }'
+        )
+        assert not mutation.errors, mutation.errors
+        shape = json.loads(mutation.data["executeDraw"]["execution"]["inputJson"])
+        assert shape["__enum__"]["name"] == "circle"
+    finally:
+        registry.clear()
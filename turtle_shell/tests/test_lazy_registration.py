@@ -0,0 +1,178 @@
+import sys
+
+import pytest
+
+import turtle_shell
+from turtle_shell.manifest import write_manifest
+from turtle_shell.models import ExecutionResult
+
+LAZY_MODULE = "turtle_shell.tests.lazy_tools"
+
+
+def unwrap_debug_cursors():
+    """With DEBUG, graphene's debug middleware leaves SQL recording on for later tests"""
+    from django.db import connections
+    from graphene_django.debug.sql.tracking import unwrap_cursor
+
+    for connection in connections.all():
+        unwrap_cursor(connection)
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    sys.modules.pop(LAZY_MODULE, None)
+    yield registry
+    registry.clear()
+    registry._manifest = None
+
+
+def test_add_by_path_defers_import(db, registry):
+    func_obj = registry.add(f"{LAZY_MODULE}:slow_tool")
+    assert func_obj.name == "slow_tool"
+    assert registry.add(f"{LAZY_MODULE}:slow_tool") is func_obj
+    registry.get_router()
+    assert LAZY_MODULE not in sys.modules
+
+    obj = ExecutionResult.objects.create_execution(func_name="slow_tool", input_json={"count": 2})
+    assert obj.execute() == 4
+    assert LAZY_MODULE in sys.modules
+    assert func_obj.is_loaded
+
+
+def test_conflicting_path(registry):
+    registry.add(f"{LAZY_MODULE}:slow_tool")
+    with pytest.raises(ValueError, match="already registered"):
+        registry.add("somewhere.else:slow_tool")
+
+
+def test_manifest_docs_without_import(registry, tmp_path):
+    path = tmp_path / "manifest.json"
+    registry.add(f"{LAZY_MODULE}:slow_tool", name="tool")
+    manifest = write_manifest(registry, path)
+    assert manifest["functions"]["tool"]["parameters"][0]["doc"] == "how many"
+
+    registry.clear()
+    sys.modules.pop(LAZY_MODULE, None)
+    registry.load_manifest(path, register=True)
+    assert registry.get("tool").doc.strip() == "Pretend this needs pandas."
+    assert LAZY_MODULE not in sys.modules
+
+
+def test_router_graphql_url(db, registry):
+    from django.contrib.auth import get_user_model
+    from django.test import RequestFactory
+    from django.urls import include, path, resolve
+
+    registry.add(f"{LAZY_MODULE}:slow_tool")
+    urlconf = type(
+        "urls", (), {"urlpatterns": [path("execute/", include(registry.get_router().urls))]}
+    )
+    request = RequestFactory().post(
+        "/execute/graphql",
+        '{"query": "{ executionResults { edges { node { uuid } } } }"}',
+        content_type="application/json",
+    )
+    request.user = get_user_model().objects.create(username="api")
+    request._dont_enforce_csrf_checks = True
+    try:
+        response = resolve("/execute/graphql", urlconf=urlconf).func(request)
+    finally:
+        unwrap_debug_cursors()
+    assert response.status_code == 200, response.content
+    assert response.content == b'{"data":{"executionResults":{"edges":[]}}}'
+
+
+def test_autodiscover_and_manifest_command(registry, tmp_path, settings):
+    from django.core.management import call_command
+
+    sys.modules.pop("turtle_shell.tests.discovery_app.turtle_tools", None)
+    path = tmp_path / "manifest.json"
+    settings.TURTLE_SHELL_MANIFEST = str(path)
+    settings.INSTALLED_APPS = [*settings.INSTALLED_APPS, "turtle_shell.tests.discovery_app"]
+    assert set(registry.func_name2func) == {"discovered", "discovered_slow_tool"}
+    call_command("turtle_shell_manifest")
+    call_command("turtle_shell_manifest", check=True)
+
+    # next boot: registration skips building forms (doc comes from the manifest)
+    registry.clear()
+    registry._manifest = None
+    sys.modules.pop("turtle_shell.tests.discovery_app.turtle_tools", None)
+    turtle_shell.autodiscover()
+    discovered = registry.get("discovered")
+    assert discovered._form_class is None
+    assert discovered.doc.strip() == "Say hello."
+    assert discovered.form_class.declared_fields["name"].help_text == "who to greet"
+
+
+def test_function_edited_after_manifest(registry, tmp_path, monkeypatch):
+    import importlib
+
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+
+    from turtle_shell import function_to_form
+
+    module_path = tmp_path / "edited_tools.py"
+    source = 'def edited(count: int = 3):\n    """Count."""\n    return count\n'
+    module_path.write_text(source)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "edited_tools", raising=False)
+    manifest_path = tmp_path / "manifest.json"
+
+    def boot():
+        registry.clear()
+        registry.load_manifest(manifest_path)
+        registry.add(importlib.reload(importlib.import_module("edited_tools")).edited)
+        return registry.get("edited")
+
+    registry.add(importlib.import_module("edited_tools").edited)
+    version = registry.get("edited").version
+    write_manifest(registry, manifest_path)
+
+    # unchanged: nothing built or hashed on boot
+    with monkeypatch.context() as patch:
+        patch.setattr(function_to_form, "function_version", pytest.fail)
+        edited = boot()
+        assert edited._form_class is None
+        assert edited.version == version
+
+    # body edited: manifest version is still used until the manifest is rebuilt
+    module_path.write_text(source.replace("return count", "return count * 2"))
+    edited = boot()
+    assert edited._form_class is None
+    assert edited.version == version
+    with pytest.raises(CommandError, match="out of date"):
+        call_command("turtle_shell_manifest", path=str(manifest_path), check=True)
+
+    # parameters edited: the entry is stale, so the form is built at registration
+    module_path.write_text(source.replace("count: int = 3", "count: int = 4, extra: str = 'x'"))
+    edited = boot()
+    assert edited.manifest_entry is None
+    assert edited._form_class is not None
+    assert set(edited.form_class.declared_fields) == {"count", "extra"}
+    assert edited.version != version
+
+
+def test_graphql_view_gets_schema_from_registry(db, registry):
+    import json
+    from django.contrib.auth import get_user_model
+    from django.test import RequestFactory
+
+    registry.add(f"{LAZY_MODULE}:slow_tool")
+    urls, _ = registry.get_router().urls
+    view = next(pattern.callback for pattern in urls if str(pattern.pattern) == "graphql")
+    request = RequestFactory().post(
+        "/graphql",
+        json.dumps({"query": "{ executionResults { edges { node { uuid } } } }"}),
+        content_type="application/json",
+    )
+    request.user = get_user_model().objects.create(username="api")
+    request._dont_enforce_csrf_checks = True
+    try:
+        response = view(request)
+    finally:
+        unwrap_debug_cursors()
+    assert response.status_code == 200, response.content
+    assert json.loads(response.content) == {"data": {"executionResults": {"edges": []}}}
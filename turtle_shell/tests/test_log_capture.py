@@ -0,0 +1,70 @@
+import logging
+import threading
+
+import pytest
+
+import turtle_shell
+from turtle_shell.log_capture import RingBufferHandler, capture_logs
+from turtle_shell.models import CaughtException, ExecutionResult
+
+logger = logging.getLogger("turtle_shell.tests.chatty")
+logger.setLevel(logging.DEBUG)
+
+
+def chatty(lines: int, fail: bool = False):
+    """Log a bunch and maybe fail."""
+    for i in range(lines):
+        logger.info("line %s", i)
+    logger.warning("x" * 5000)
+    if fail:
+        raise ValueError("nope")
+    return {"lines": lines}
+
+
+@pytest.fixture
+def registry(settings):
+    settings.TURTLE_SHELL_CAPTURE_LOG_RECORDS = 10
+    settings.TURTLE_SHELL_CAPTURE_LOG_MESSAGE_CHARS = 100
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(chatty)
+    yield registry
+    registry.clear()
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_logs_captured_and_bounded(db, registry, fail):
+    execution = ExecutionResult.objects.create(
+        func_name="chatty", input_json={"lines": 50, "fail": fail}
+    )
+    if fail:
+        with pytest.raises(CaughtException):
+            execution.execute()
+    else:
+        execution.execute()
+    execution.refresh_from_db()
+    assert execution.log_records["dropped"] == 41
+    records = execution.get_log_records()
+    assert len(records) == 10
+    assert records[0]["message"] == "line 41"
+    assert records[-1]["level"] == "WARNING"
+    assert len(records[-1]["message"]) < 200
+    assert [r["level"] for r in execution.get_log_records(logging.WARNING)] == ["WARNING"]
+
+
+def test_capture_disabled_per_function(db, registry):
+    registry.remove("chatty")
+    registry.add(chatty, config={"capture_logs": False})
+    execution = ExecutionResult.objects.create(func_name="chatty", input_json={"lines": 1})
+    execution.execute()
+    assert execution.log_records == {}
+
+
+def test_other_threads_not_captured():
+    with capture_logs() as handler:
+        thread = threading.Thread(target=logger.warning, args=("elsewhere",))
+        thread.start()
+        thread.join()
+        logger.warning("here")
+    assert [record[-1] for record in handler.records] == ["here"]
+    assert isinstance(handler, RingBufferHandler)
@@ -0,0 +1,138 @@
+import enum
+import json
+import tracemalloc
+from typing import List
+
+import pydantic
+import pytest
+
+import turtle_shell
+from turtle_shell import artifacts, outputs, utils
+from turtle_shell.models import ExecutionResult, ResultTooLargeException
+
+
+class Quality(enum.Enum):
+    good = "good"
+    bad = "bad"
+
+
+utils.EnumRegistry.register(Quality)
+
+
+class Read(pydantic.BaseModel):
+    name: str
+    quality: Quality
+    flags: List[int]
+
+
+class Reads(pydantic.BaseModel):
+    sample: str
+    reads: List[Read]
+
+
+ROW = {"read": "ACGT" * 16, "quality": 37.5, "flags": [1, 2, 3], "passed": True}
+# output of big_output() is about 3MB of JSON
+ROWS = [dict(ROW, i=i) for i in range(20000)]
+READS = Reads(
+    sample="S1", reads=[Read(name=f"r{i}", quality=Quality.good, flags=[i]) for i in range(20000)]
+)
+
+
+def big_output():
+    return {"summary": {"rows": len(ROWS)}, "rows": ROWS}
+
+
+def big_model() -> Reads:
+    return READS
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(big_output)
+    registry.add(big_output, name="spilled", config={"spill_output_bytes": 2 ** 18})
+    registry.add(big_model)
+    yield registry
+    registry.clear()
+
+
+def test_iterencode_matches_json_dumps(monkeypatch):
+    monkeypatch.setattr(outputs, "BATCH_VALUES", 5)
+    value = {
+        "a": [1, 2.5, None, True, "é", Quality.bad, list(range(12))],
+        1: {str(i): [i, {"x": i}] for i in range(8)},
+        None: [],
+        "nested": [[[list(range(7))]]],
+    }
+    expected = json.dumps(value, cls=utils.EnumAwareEncoder)
+    assert "".join(outputs.iterencode(value)) == expected
+    assert "".join(outputs.iterencode(value, batched=False)) == expected
+    model = Reads(sample="S", reads=[Read(name="r", quality=Quality.bad, flags=[1])] * 3)
+    assert "".join(outputs.iterencode(model)) == model.json()
+    assert json.loads("".join(outputs.iterencode([model]))) == [json.loads(model.json())]
+    circular = []
+    circular.append(circular)
+    with pytest.raises(ValueError, match="Circular"):
+        "".join(outputs.iterencode([circular] * 10))
+
+
+def traced_execute(execution):
+    tracemalloc.start()
+    try:
+        execution.execute()
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+
+def output_size(result) -> int:
+    if hasattr(result, "json"):
+        return len(result.json())
+    return len(json.dumps(result, cls=utils.EnumAwareEncoder))
+
+
+@pytest.mark.parametrize("func_name,result", [("big_output", big_output()), ("big_model", READS)])
+def test_peak_memory_near_output_size(db, registry, func_name, result):
+    execution = ExecutionResult.objects.create(func_name=func_name, input_json={})
+    peak = traced_execute(execution)
+    size = output_size(result)
+    # the encoded text and the pieces it's joined from, plus a bit
+    assert peak < 2.5 * size
+    stored = ExecutionResult.objects.get(pk=execution.pk).output_json
+    assert stored == json.loads(json.dumps(result, cls=outputs.OutputEncoder))
+
+
+def test_spilled_output_streams_to_artifact(db, registry, settings, tmp_path, monkeypatch):
+    monkeypatch.setattr(outputs, "PIECE_CHARS", 2 ** 16)
+    monkeypatch.setattr(artifacts, "CHUNK_SIZE", 2 ** 16)
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    execution = ExecutionResult.objects.create(func_name="spilled", input_json={})
+    peak = traced_execute(execution)
+    size = output_size(big_output())
+    assert peak < size / 4
+    artifact = execution.artifacts.get()
+    assert execution.output_json == {"output_artifact": artifact.metadata}
+    assert artifact.name == outputs.OUTPUT_ARTIFACT_NAME
+    assert artifact.size == size
+    with artifact.file.open("rb") as f:
+        assert json.load(f) == json.loads(json.dumps(big_output()))
+
+
+def test_output_over_limit_fails_fast(db, registry, settings):
+    settings.TURTLE_SHELL_MAX_OUTPUT_BYTES = 100000
+    execution = ExecutionResult.objects.create(func_name="big_output", input_json={})
+    tracemalloc.start()
+    with pytest.raises(ResultTooLargeException):
+        execution.execute()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # stopped encoding right after the limit
+    assert peak < output_size(big_output()) / 4
+    execution.refresh_from_db()
+    assert execution.status == ExecutionResult.ExecutionStatus.TOO_LARGE
+    assert execution.status in ExecutionResult.ERROR_STATUSES
+    assert execution.error_json["type"] == "OutputTooLarge"
+    assert "100000 bytes" in execution.error_json["message"]
+    assert execution.output_json is None
@@ -0,0 +1,277 @@
+import contextlib
+import io
+import types
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+import turtle_shell
+from turtle_shell import Artifact, partitions
+from turtle_shell.models import ExecutionArtifact, ExecutionLogChunk, ExecutionResult
+from .utils import prepare_request, urlconf_for, view_for
+
+
+def report(sample: str):
+    return {"sample": sample, "report": Artifact(name="report.txt", data=sample.encode())}
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(report)
+    yield registry
+    registry.clear()
+
+
+@pytest.fixture
+def executions(transactional_db, registry, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.ROOT_URLCONF = urlconf_for(registry)
+    executions = {}
+    for month in ["2024-01", "2024-02", "2024-03"]:
+        execution = ExecutionResult.objects.create(func_name="report", input_json={"sample": month})
+        execution.execute()
+        ExecutionLogChunk.objects.create(execution=execution, seq=0, data=f"{month}\n")
+        created = partitions.bound(partitions.parse_month(month)).replace(day=15)
+        ExecutionResult.objects.filter(pk=execution.pk).update(created=created)
+        executions[month] = execution
+    yield executions
+    # archive tables aren't flushed between tests
+    partitions.drop_archives(connection.alias, date(9999, 1, 1), log=lambda message: None)
+
+
+def test_months(settings):
+    assert partitions.month_start(datetime(2024, 5, 31, 23)) == date(2024, 5, 1)
+    assert partitions.add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert partitions.add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partitions.parse_month("2024-05") == date(2024, 5, 1)
+    with pytest.raises(ValueError, match="2024-05"):
+        partitions.parse_month("May")
+    assert partitions._bound_month("2024-06-01 00:00:00") == date(2024, 6, 1)
+    # aware bounds are printed in UTC
+    settings.USE_TZ, settings.TIME_ZONE = True, "Europe/Berlin"
+    assert partitions._bound_month("2024-05-31 22:00:00+00") == date(2024, 6, 1)
+    assert partitions.partition_name(date(2024, 6, 1)) == "turtle_shell_executionresult_p2024_06"
+
+
+def test_archive_then_expire(executions, registry):
+    old_files = [
+        Path(artifact.file.path)
+        for artifact in ExecutionArtifact.objects.exclude(execution=executions["2024-03"])
+    ]
+    out = io.StringIO()
+    call_command("turtle_shell_partitions", "archive", before="2024-03", stdout=out)
+    assert "Archived 1 executions from 2024-01" in out.getvalue()
+    assert list(ExecutionResult.objects.all()) == [executions["2024-03"]]
+    assert ExecutionArtifact.objects.count() == ExecutionLogChunk.objects.count() == 1
+    assert partitions.archived_months(connection.alias) == [date(2024, 1, 1), date(2024, 2, 1)]
+    with connection.cursor() as cursor:
+        for table in ["turtle_shell_executionresult", "turtle_shell_executionlogchunk"]:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}_archive_2024_02")
+            assert cursor.fetchone() == (1,)
+    # archived files are only deleted with their month
+    assert all(path.exists() for path in old_files)
+
+    # the views only ever see what's left
+    user = get_user_model().objects.create(username="analyst")
+    request = prepare_request(RequestFactory().get("/report/"), user)
+    response = view_for(registry, "list-report")(request)
+    assert list(response.context_data["object_list"]) == [executions["2024-03"]]
+
+    out = io.StringIO()
+    call_command("turtle_shell_partitions", "expire", before="2024-02", stdout=out)
+    assert "Expired 1 months before 2024-02" in out.getvalue()
+    assert partitions.archived_months(connection.alias) == [date(2024, 2, 1)]
+    assert [path.exists() for path in old_files] == [False, True]
+    # expiring archives whatever is still live
+    call_command("turtle_shell_partitions", "expire", before="2024-04", stdout=io.StringIO())
+    assert not ExecutionResult.objects.exists()
+    assert not partitions.archived_months(connection.alias)
+    assert not ExecutionArtifact.objects.exists()
+
+
+def test_command_arguments(db):
+    with pytest.raises(CommandError, match="--before or --keep-months"):
+        call_command("turtle_shell_partitions", "expire", stdout=io.StringIO())
+    for action in ["setup", "create"]:
+        with pytest.raises(CommandError, match="needs Postgres"):
+            call_command("turtle_shell_partitions", action, stdout=io.StringIO())
+    with pytest.raises(ValueError, match="needs Postgres"):
+        partitions.list_partitions(connection.alias)
+    out = io.StringIO()
+    call_command("turtle_shell_partitions", "list", stdout=out)
+    assert out.getvalue() == ""
+
+
+class FakePostgres:
+    """Stand-in Postgres connection: records statements, answering catalog queries from answers
+    (``{sql substring: rows or function of params returning rows}``)"""
+
+    vendor = "postgresql"
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.statements = []
+        self.ops = types.SimpleNamespace(quote_name=lambda name: f'"{name.strip(chr(34))}"')
+        self.rows = []
+
+    @contextlib.contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+        for key, rows in self.answers.items():
+            if key in sql:
+                self.rows = rows(params) if callable(rows) else rows
+                break
+        else:
+            self.rows = []
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def sql(self) -> list:
+        return [statement for statement, _ in self.statements]
+
+
+LEGACY = "turtle_shell_executionresult_legacy"
+
+
+def bound_expression(start, end):
+    return f"FOR VALUES FROM ({start}) TO ('{end} 00:00:00')"
+
+
+@pytest.fixture
+def postgres(monkeypatch, settings):
+    settings.USE_TZ = False
+    monkeypatch.setattr(partitions.timezone, "now", lambda: datetime(2024, 5, 10))
+    deleted = []
+    monkeypatch.setattr(partitions, "default_storage", types.SimpleNamespace(delete=deleted.append))
+    fake_transaction = types.SimpleNamespace(
+        atomic=lambda using: contextlib.nullcontext(), on_commit=lambda func, using: func()
+    )
+    monkeypatch.setattr(partitions, "transaction", fake_transaction)
+
+    def use(answers):
+        fake = FakePostgres(answers)
+        monkeypatch.setattr(partitions, "connections", {"pg": fake})
+        fake.deleted = deleted
+        return fake
+
+    return use
+
+
+def test_partition_table_statements(postgres):
+    table = "turtle_shell_executionresult"
+    indexes = {
+        table: [
+            (
+                f"{table}_pkey",
+                f"CREATE UNIQUE INDEX {table}_pkey ON public.{table} USING btree (uuid)",
+                True,
+                True,
+            ),
+            (
+                "turtle_shell_created_idx",
+                f"CREATE INDEX turtle_shell_created_idx ON public.{table} USING btree (created)",
+                False,
+                False,
+            ),
+            (
+                f"{table}_uuid_created",
+                f"CREATE UNIQUE INDEX {table}_uuid_created ON public.{table} USING btree (uuid, created)",
+                True,
+                False,
+            ),
+        ],
+        # after the renames (the uuid/created index is part of the primary key by now)
+        LEGACY: [
+            (
+                "legacy_single_flight",
+                f"CREATE UNIQUE INDEX legacy_single_flight ON public.{LEGACY} USING btree (func_name, input_hash) WHERE single_flight",
+                True,
+                False,
+            ),
+        ],
+    }
+    fake = postgres(
+        {
+            "pg_partitioned_table": [],
+            "pg_get_indexdef": lambda params: indexes[params[0]],
+            "relpartbound": [(LEGACY, bound_expression("MINVALUE", "2024-06-01"))],
+            "WHERE conrelid": [
+                (f"{table}_user_id_fk", "FOREIGN KEY (user_id) REFERENCES auth_user(id)")
+            ],
+            "WHERE confrelid": [("input_execution_fk", "turtle_shell_executioninput")],
+        }
+    )
+    partitions.partition_table("pg", months_ahead=1, log=lambda message: None)
+    sql = fake.sql()
+    expected = [
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{table}_uuid_created" ON "{table}" (uuid, created)',
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{LEGACY}_bound" CHECK (created < %s) NOT VALID',
+        f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{LEGACY}_bound"',
+        f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE',
+        'ALTER TABLE turtle_shell_executioninput DROP CONSTRAINT "input_execution_fk"',
+        f'ALTER TABLE "{table}" RENAME TO "{LEGACY}"',
+        f'CREATE TABLE "{table}" (LIKE "{LEGACY}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE (created)',
+        f'ALTER TABLE "{table}" DROP CONSTRAINT "{LEGACY}_bound"',
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (uuid, created)',
+        f"CREATE INDEX turtle_shell_created_idx ON public.{table} USING btree (created)",
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_user_id_fk" FOREIGN KEY (user_id) REFERENCES auth_user(id)',
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{LEGACY}" FOR VALUES FROM (MINVALUE) TO (%s)',
+        f'ALTER TABLE "{LEGACY}" DROP CONSTRAINT "{LEGACY}_bound"',
+        f'CREATE TABLE "{table}_p2024_06" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)',
+        f'CREATE UNIQUE INDEX "{table}_p2024_06_uniq0" ON "{table}_p2024_06" USING btree (func_name, input_hash) WHERE single_flight',
+    ]
+    assert [statement for statement in sql if statement in expected] == expected
+    # the old indexes make way for the parent's (apart from the one the primary key needs)
+    renames = [statement for statement in sql if statement.startswith("ALTER INDEX")]
+    assert len(renames) == 2
+    assert all(f'"{table}_uuid_created"' not in statement for statement in renames)
+    params = dict(fake.statements)
+    assert params[expected[1]] == [datetime(2024, 6, 1)]
+    assert params[expected[-2]] == [datetime(2024, 6, 1), datetime(2024, 7, 1)]
+    # no partitions for later months yet
+    assert not [statement for statement in sql if "p2024_07" in statement]
+
+
+def test_drop_partitions_statements(postgres):
+    table = "turtle_shell_executionresult"
+    fake = postgres(
+        {
+            "relpartbound": [
+                (f"{table}_p2024_07", bound_expression("'2024-07-01 00:00:00'", "2024-08-01")),
+                (LEGACY, bound_expression("MINVALUE", "2024-06-01")),
+                (f"{table}_p2024_06", bound_expression("'2024-06-01 00:00:00'", "2024-07-01")),
+            ],
+            "SELECT file FROM": [("artifacts/a.txt",)],
+        }
+    )
+    dropped = partitions.drop_partitions("pg", date(2024, 7, 1), log=lambda message: None)
+    assert dropped == [LEGACY, f"{table}_p2024_06"]
+    sql = fake.sql()
+    for name in dropped:
+        expected = [
+            f'SELECT file FROM "turtle_shell_executionartifact" WHERE execution_id IN (SELECT uuid FROM "{name}")',
+            *(
+                f'DELETE FROM "{child}" WHERE "execution_id" IN (SELECT uuid FROM "{name}")'
+                for child, _ in partitions.child_tables()
+            ),
+            f'ALTER TABLE "{table}" DETACH PARTITION "{name}"',
+            f'DROP TABLE "{name}"',
+        ]
+        assert [statement for statement in sql if f'"{name}"' in statement] == expected
+    assert not [statement for statement in sql if "p2024_07" in statement]
+    assert fake.deleted == ["artifacts/a.txt"] * 2
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.test import RequestFactory, TestCase, override_settings
+
+import turtle_shell
+from turtle_shell.models import ExecutionResult
+from turtle_shell.routers import mark_write, read_alias
+from .utils import prepare_request, urlconf_for, view_for
+
+GQL = "query { executionResults { edges { node { uuid } } } }"
+
+
+def echo(a: int):
+    return a
+
+
+@override_settings(TURTLE_SHELL_READ_DATABASE="replica", TURTLE_SHELL_STICKY_PRIMARY_SECONDS=60)
+class TestReplicaRouting(TestCase):
+    """The replica is a separate (empty) sqlite database, rows are "replicated" by hand."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.registry = turtle_shell.get_registry()
+        self.registry.clear()
+        self.registry.add(echo)
+        self.user = get_user_model().objects.create(username="reader")
+
+    def tearDown(self):
+        self.registry.clear()
+
+    def request(self, path="/", data=None, method="get"):
+        request = getattr(RequestFactory(), method)(path, data or {})
+        request.session = SessionStore()
+        return prepare_request(request, self.user)
+
+    def list_pks(self, request):
+        response = view_for(self.registry, "list-echo")(request)
+        return [obj.pk for obj in response.context_data["object_list"]]
+
+    def test_writes_go_to_primary(self):
+        obj = ExecutionResult.objects.create_execution(func_name="echo", input_json={"a": 1})
+        assert obj._state.db == "default"
+        assert not ExecutionResult.objects.using("replica").exists()
+
+    def test_reads_go_to_replica(self):
+        obj = ExecutionResult.objects.create_execution(func_name="echo", input_json={"a": 1})
+        with self.settings(ROOT_URLCONF=urlconf_for(self.registry)):
+            # not replicated yet
+            assert self.list_pks(self.request()) == []
+            assert not self.registry.schema.execute(GQL, context_value=self.request()).data[
+                "executionResults"
+            ]["edges"]
+            obj.save(using="replica")
+            assert self.list_pks(self.request()) == [obj.pk]
+            response = view_for(self.registry, "detail-echo")(self.request(), pk=obj.pk)
+            assert response.context_data["object"]._state.db == "replica"
+            result = self.registry.schema.execute(GQL, context_value=self.request())
+            assert len(result.data["executionResults"]["edges"]) == 1
+
+    def test_sticky_primary_after_create(self):
+        request = self.request("/echo/create/", {"a": 2}, method="post")
+        with self.settings(ROOT_URLCONF=urlconf_for(self.registry)):
+            response = view_for(self.registry, "create-echo")(request)
+            assert response.status_code == 302
+            # creator sees their execution right away, even though the replica is behind
+            follow_up = self.request()
+            follow_up.session = request.session
+            assert read_alias(follow_up) == "default"
+            assert len(self.list_pks(follow_up)) == 1
+            # everyone else still reads from the replica
+            assert self.list_pks(self.request()) == []
+
+    def test_not_sticky_without_replica(self):
+        request = self.request()
+        with self.settings(TURTLE_SHELL_READ_DATABASE=None):
+            mark_write(request)
+            assert read_alias(request) == "default"
+        assert read_alias(request) == "replica"
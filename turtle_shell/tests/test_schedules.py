@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+from django.utils import timezone
+
+import turtle_shell
+from turtle_shell.models import ExecutionResult, Schedule, SchedulerLock
+from turtle_shell.schedules import CronSchedule, run_due
+
+
+def nightly(region: str):
+    return {"region": region}
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(nightly)
+    yield registry
+    registry.clear()
+
+
+@pytest.mark.parametrize(
+    "expression,after,expected",
+    [
+        ("*/15 * * * *", datetime(2021, 4, 1, 10, 7), datetime(2021, 4, 1, 10, 15)),
+        ("0 3 * * *", datetime(2021, 4, 1, 3, 0), datetime(2021, 4, 2, 3, 0)),
+        # 2021-04-03 is a saturday
+        ("30 9 * * 1-5", datetime(2021, 4, 3, 0, 0), datetime(2021, 4, 5, 9, 30)),
+        ("0 0 29 2 *", datetime(2021, 3, 1), datetime(2024, 2, 29)),
+        ("0 12 1 * 0", datetime(2021, 4, 1, 13, 0), datetime(2021, 4, 4, 12, 0)),
+        ("0 0 * * 7", datetime(2021, 4, 1), datetime(2021, 4, 4)),
+    ],
+)
+def test_cron_next_after(expression, after, expected):
+    assert CronSchedule(expression).next_after(after) == expected
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *"])
+def test_cron_invalid(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_missed_firings_coalesced(db, registry):
+    schedule = Schedule.objects.create(
+        name="nightly-us", func_name="nightly", cron="0 3 * * *", input_json={"region": "us"}
+    )
+    assert schedule.next_run > timezone.now()
+    # scheduler was down for three nights
+    schedule.next_run = timezone.now() - timedelta(days=3)
+    schedule.save()
+    now = timezone.now()
+    (execution,) = run_due(now)
+    assert execution.status == ExecutionResult.ExecutionStatus.DONE
+    assert execution.output_json == {"region": "us"}
+    schedule.refresh_from_db()
+    assert schedule.next_run == CronSchedule("0 3 * * *").next_after(now)
+    assert run_due(now) == []
+
+
+def test_scheduler_lock(db):
+    assert SchedulerLock.acquire("scheduler", "a", 60)
+    assert SchedulerLock.acquire("scheduler", "a", 60)
+    assert not SchedulerLock.acquire("scheduler", "b", 60)
+    SchedulerLock.objects.update(expires=timezone.now() - timedelta(seconds=1))
+    assert SchedulerLock.acquire("scheduler", "b", 60)
+    assert not SchedulerLock.acquire("scheduler", "a", 60)
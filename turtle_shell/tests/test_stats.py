@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+import pytest
+from django.test import RequestFactory
+from django.utils import timezone
+
+import turtle_shell
+from turtle_shell.models import ExecutionResult, FunctionSummary, CaughtException
+
+
+def ok(a: int):
+    return a
+
+
+def bad(a: int):
+    raise ValueError("nope")
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(ok)
+    registry.add(bad)
+    yield registry
+    registry.clear()
+
+
+def run(func_name, a=1):
+    obj = ExecutionResult.objects.create(func_name=func_name, input_json={"a": a})
+    try:
+        obj.execute()
+    except CaughtException:
+        pass
+    return obj
+
+
+def test_grouped_stats(db, registry, django_assert_num_queries):
+    for i in range(3):
+        run("ok", i)
+    run("bad")
+    old = run("ok")
+    ExecutionResult.objects.filter(pk=old.pk).update(created=timezone.now() - timedelta(days=2))
+
+    with django_assert_num_queries(1):
+        stats = ExecutionResult.objects.function_stats()
+    assert stats["ok"].total == 4
+    assert stats["ok"].last_24h == 3
+    assert stats["ok"].error_rate == 0
+    assert stats["bad"].total == 1
+    assert stats["bad"].error_rate == 1
+
+
+def test_summary_table(db, registry, settings):
+    settings.TURTLE_SHELL_STATS_SUMMARY_TABLE = True
+    for i in range(3):
+        run("ok", i)
+    run("bad")
+
+    summary = FunctionSummary.objects.get(func_name="ok").to_stats()
+    assert summary.total == 3
+    assert summary.last_24h == 3
+    assert summary.errored == 0
+    assert summary.median_duration == FunctionSummary.DURATION_BUCKETS[0]
+    assert FunctionSummary.objects.get(func_name="bad").to_stats().error_rate == 1
+
+
+def test_backends_agree_on_late_finishers(db, registry, settings):
+    settings.TURTLE_SHELL_STATS_SUMMARY_TABLE = True
+    now = timezone.now()
+    for hours_ago in [0, 0, 3, 23, 30, 50]:
+        # e.g. queued for a long time, finishing now
+        obj = ExecutionResult.objects.create(func_name="ok", input_json={"a": hours_ago})
+        ExecutionResult.objects.filter(pk=obj.pk).update(created=now - timedelta(hours=hours_ago))
+        obj.refresh_from_db()
+        obj.execute()
+
+    grouped = ExecutionResult.objects.function_stats()["ok"]
+    summary = FunctionSummary.objects.get(func_name="ok").to_stats()
+    assert grouped.last_24h == summary.last_24h == 4
+    assert grouped.total == summary.total == 6
+    assert grouped.last_run == summary.last_run
+
+
+def test_overview_context(db, registry, django_assert_num_queries):
+    run("ok")
+    view = registry.summary_view()
+    with django_assert_num_queries(1):
+        response = view(RequestFactory().get("/"))
+    rows = {func.name: stats for func, stats in response.context_data["function_rows"]}
+    assert rows["ok"].total == 1
+    assert rows["bad"].total == 0
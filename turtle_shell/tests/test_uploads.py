@@ -0,0 +1,170 @@
+import types
+from pathlib import Path
+from typing import Optional
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory
+
+import turtle_shell
+from turtle_shell import Upload, uploads
+from turtle_shell.models import ExecutionResult
+from turtle_shell.uploads import StreamingFileUploadHandler, UploadField, is_in_upload_dir
+from .utils import prepare_request, urlconf_for, view_for
+
+CONTENT = b"ACGT" * 10000
+
+seen = {}
+
+
+def count_bases(reads: Upload, label: str = "x"):
+    """Count bases in an uploaded file."""
+    seen["reads"] = reads
+    with reads.mmap() as data:
+        return {"label": label, "bases": len(data)}
+
+
+def repeat_bases(reads: Upload, times: int):
+    """Count bases in an uploaded file a few times."""
+    return count_bases(reads)["bases"] * times
+
+
+def label_reads(label: str, reads: Optional[Upload] = None):
+    """Label some reads, if there are any."""
+    return {"label": label, "reads": reads and reads.name}
+
+
+@pytest.fixture
+def upload_settings(settings, tmp_path):
+    settings.TURTLE_SHELL_UPLOAD_DIR = str(tmp_path / "uploads")
+    settings.TURTLE_SHELL_UPLOAD_CHUNK_SIZE = 1024
+    return settings
+
+
+@pytest.fixture
+def registry():
+    registry = turtle_shell.get_registry()
+    registry.clear()
+    registry.add(count_bases)
+    registry.add(repeat_bases)
+    registry.add(count_bases, name="cached_count_bases", config={"reuse_results": True})
+    yield registry
+    registry.clear()
+
+
+def test_streaming_handler_writes_to_upload_dir(upload_settings):
+    request = RequestFactory().post("/", {"reads": SimpleUploadedFile("r.fastq", CONTENT)})
+    request.upload_handlers = [StreamingFileUploadHandler(request)]
+    uploaded = request.FILES["reads"]
+    path = Path(uploaded.temporary_file_path())
+    assert is_in_upload_dir(path)
+    assert path.read_bytes() == CONTENT
+    assert UploadField().clean(uploaded) == str(path)
+
+
+def test_upload_field_rejects_paths_outside_upload_dir(upload_settings, tmp_path):
+    from django.core.exceptions import ValidationError
+
+    outside = tmp_path / "secret.txt"
+    outside.write_text("nope")
+    with pytest.raises(ValidationError):
+        UploadField().clean(str(outside))
+
+
+def test_upload_field_only_accepts_paths_from_same_request(upload_settings):
+    from django.core.exceptions import ValidationError
+
+    request = RequestFactory().post("/", {"reads": SimpleUploadedFile("r.fastq", CONTENT)})
+    request.upload_handlers = [StreamingFileUploadHandler(request)]
+    path = request.FILES["reads"].temporary_file_path()
+    own = UploadField()
+    own.upload_token = request.turtle_shell_upload_token
+    assert own.clean(path) == path
+    # e.g., copied from another user's input_json
+    other = UploadField()
+    other.upload_token = "someone-else"
+    for field in [other, UploadField()]:
+        with pytest.raises(ValidationError, match="uploaded with this request"):
+            field.clean(path)
+
+
+def post(registry, func_name, user, data):
+    request = RequestFactory().post(f"/{func_name}/create/", data)
+    return view_for(registry, f"create-{func_name}")(prepare_request(request, user))
+
+
+def test_create_view_streams_and_cleans_up(db, registry, upload_settings, django_user_model):
+    upload_settings.ROOT_URLCONF = urlconf_for(registry)
+    user = django_user_model.objects.create(username="uploader")
+    request = RequestFactory().post(
+        "/count_bases/create/", {"reads": SimpleUploadedFile("r.fastq", CONTENT), "label": "a"}
+    )
+    view = view_for(registry, "create-count_bases")
+    response = view(prepare_request(request, user))
+    assert response.status_code == 302, getattr(response, "context_data", None)
+
+    execution = ExecutionResult.objects.get()
+    assert execution.status == ExecutionResult.ExecutionStatus.DONE
+    assert execution.output_json == {"label": "a", "bases": len(CONTENT)}
+    assert isinstance(seen["reads"], Upload)
+    assert not seen["reads"].exists()
+
+
+def test_invalid_form_removes_uploads(db, registry, upload_settings, django_user_model):
+    upload_settings.ROOT_URLCONF = urlconf_for(registry)
+    user = django_user_model.objects.create(username="uploader")
+    data = {"reads": SimpleUploadedFile("r.fastq", CONTENT), "times": "lots"}
+    response = post(registry, "repeat_bases", user, data)
+    assert response.status_code == 200
+    assert response.context_data["form"].errors["times"]
+    assert not ExecutionResult.objects.exists()
+    assert not list(uploads.upload_dir().iterdir())
+
+
+def test_reused_result_removes_uploads(
+    db, registry, upload_settings, django_user_model, monkeypatch
+):
+    upload_settings.ROOT_URLCONF = urlconf_for(registry)
+    user = django_user_model.objects.create(username="uploader")
+    # same upload paths each time, so both executions have identical inputs
+    fixed = types.SimpleNamespace(hex="0" * 32)
+    monkeypatch.setattr(uploads, "uuid", types.SimpleNamespace(uuid4=lambda: fixed))
+    for _ in range(2):
+        data = {"reads": SimpleUploadedFile("r.fastq", CONTENT), "label": "a"}
+        response = post(registry, "cached_count_bases", user, data)
+        assert response.status_code == 302
+    execution = ExecutionResult.objects.get()
+    assert execution.output_json == {"label": "a", "bases": len(CONTENT)}
+    assert not list(uploads.upload_dir().iterdir())
+
+
+def test_graphql_leaves_out_uploads(db, registry, upload_settings):
+    # (not the other count_bases, its payload type would clash)
+    registry.remove("cached_count_bases")
+    registry.add(label_reads)
+    schema = registry.schema
+    input_fields = schema.get_type("LabelReadsMutationInput").fields
+    assert "label" in input_fields and "reads" not in input_fields
+
+    result = schema.execute(
+        'mutation { executeLabelReads(input: {label: "a"}) { errors { field } execution { '
+        "outputJson } } }"
+    )
+    assert not result.errors, result.errors
+    payload = result.data["executeLabelReads"]
+    assert not payload["errors"]
+    assert payload["execution"]["outputJson"] == '{"label": "a", "reads": null}'
+
+    # so can't be sent at all...
+    result = schema.execute(
+        'mutation { executeLabelReads(input: {label: "a", reads: "/etc/passwd"}) { errors { field '
+        "} } }"
+    )
+    assert "reads" in str(result.errors[0])
+    # ...and required ones are reported missing
+    result = schema.execute(
+        "mutation { executeRepeatBases(input: {times: 2}) { errors { field } execution { uuid } } }"
+    )
+    assert not result.errors, result.errors
+    assert result.data["executeRepeatBases"]["errors"] == [{"field": "reads"}]
+    assert not ExecutionResult.objects.filter(func_name="repeat_bases").exists()
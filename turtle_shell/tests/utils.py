@@ -77,3 +77,29 @@ def execute_gql_and_get_input_json(func, gql):
     return json.loads(result_from_response["inputJson"])
     # data = json.loads(result["data"]["result"]["inputJson"])
     # return data
+
+
+def urlconf_for(registry):
+    """URLconf (for settings.ROOT_URLCONF) routing to registry's views"""
+    from django.urls import include, path
+
+    class urls:
+        urlpatterns = [path("", include(registry.get_router().urls))]
+
+    return urls
+
+
+def view_for(registry, url_name):
+    """View function for url_name (e.g., ``"create-myfunc"``) from registry's router"""
+    urls, _ = registry.get_router().urls
+    return next(pattern.callback for pattern in urls if pattern.name == url_name)
+
+
+def prepare_request(request, user):
+    """Set up what middleware would've added to a RequestFactory request"""
+    from django.contrib.messages.storage.cookie import CookieStorage
+
+    request.user = user
+    request._messages = CookieStorage(request)
+    request._dont_enforce_csrf_checks = True
+    return request
@@ -0,0 +1,199 @@
+"""
+File uploads
+------------
+
+Parameters annotated with ``turtle_shell.Upload`` become file fields. Uploads are streamed to
+disk chunk by chunk (never buffered in memory, no matter the size), the function receives the
+local path, and the file is removed once the execution finishes.
+
+Each request streams into its own directory (named by a random token kept on the request), and a
+form only accepts paths from its own request's directory. So paths shown in ``input_json`` can't be
+resubmitted by someone else. Uploads that don't end up with a new execution (invalid form, attached
+to an identical one, ...) are removed at the end of the request (see ``discard_uploads``). Upload
+parameters aren't part of GraphQL mutations, which have no way to stream a file.
+
+Settings:
+    TURTLE_SHELL_UPLOAD_DIR: where uploads are written (defaults to a temp directory)
+    TURTLE_SHELL_UPLOAD_CHUNK_SIZE: bytes read per chunk (defaults to 1MB)
+"""
+import inspect
+import logging
+import os
+import shutil
+import tempfile
+import typing
+import uuid
+from pathlib import Path
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from django.utils.text import get_valid_filename
+
+logger = logging.getLogger(__name__)
+
+
+def _upload_root() -> Path:
+    return Path(
+        getattr(settings, "TURTLE_SHELL_UPLOAD_DIR", None)
+        or os.path.join(tempfile.gettempdir(), "turtle_shell_uploads")
+    )
+
+
+def upload_dir(token: str = None) -> Path:
+    """Upload directory (for token, the directory of one request's uploads)"""
+    path = _upload_root() / token if token else _upload_root()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def is_in_upload_dir(path, token: str = None) -> bool:
+    root = _upload_root() / token if token else _upload_root()
+    try:
+        Path(path).resolve().relative_to(root.resolve())
+    except ValueError:
+        return False
+    return True
+
+
+def request_upload_token(request) -> str:
+    """Random token naming the directory request's uploads are streamed to"""
+    if not getattr(request, "turtle_shell_upload_token", None):
+        request.turtle_shell_upload_token = uuid.uuid4().hex
+    return request.turtle_shell_upload_token
+
+
+def discard_uploads(request):
+    """Remove everything streamed during request (for uploads no execution will use)"""
+    token = getattr(request, "turtle_shell_upload_token", None)
+    if token:
+        shutil.rmtree(_upload_root() / token, ignore_errors=True)
+
+
+class StreamedUploadedFile(UploadedFile):
+    """An upload that has already been written to its final location on disk"""
+
+    def __init__(self, path, name, content_type, size, charset, content_type_extra=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.path = path
+
+    def temporary_file_path(self):
+        return str(self.path)
+
+    def open(self, mode="rb"):
+        self.file = open(self.path, mode)
+        return self
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+class StreamingFileUploadHandler(FileUploadHandler):
+    """Write each uploaded file straight into the upload directory as chunks arrive"""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.chunk_size = getattr(settings, "TURTLE_SHELL_UPLOAD_CHUNK_SIZE", 2 ** 20)
+        self.path = None
+        self.destination = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        directory = upload_dir(request_upload_token(self.request))
+        self.path = directory / f"{uuid.uuid4().hex}-{get_valid_filename(self.file_name)}"
+        self.destination = open(self.path, "wb")
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.destination.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.destination.close()
+        return StreamedUploadedFile(
+            self.path,
+            self.file_name,
+            self.content_type,
+            file_size,
+            self.charset,
+            self.content_type_extra,
+        )
+
+    def upload_interrupted(self):
+        if self.destination:
+            self.destination.close()
+            self.path.unlink(missing_ok=True)
+
+
+class UploadField(forms.FileField):
+    """File field that cleans to the local path of the (already streamed) upload.
+
+    Strings are accepted too, but only for files streamed during the same request (the form sets
+    ``upload_token`` to that request's token)."""
+
+    upload_token = None
+
+    def to_python(self, data):
+        if isinstance(data, (str, Path)):
+            if not data:
+                return None
+            if (
+                not self.upload_token
+                or not is_in_upload_dir(data, self.upload_token)
+                or not Path(data).is_file()
+            ):
+                raise ValidationError("Path must be a file uploaded with this request")
+            return str(data)
+        uploaded = super().to_python(data)
+        if uploaded is None:
+            return None
+        if not hasattr(uploaded, "temporary_file_path"):
+            # e.g., some other upload handler kept it in memory - spill it to disk
+            directory = upload_dir(self.upload_token)
+            path = directory / f"{uuid.uuid4().hex}-{get_valid_filename(uploaded.name)}"
+            with open(path, "wb") as f:
+                for chunk in uploaded.chunks():
+                    f.write(chunk)
+            return str(path)
+        return uploaded.temporary_file_path()
+
+    def bound_data(self, data, initial):
+        return initial if data in (None, "") else data
+
+    def has_changed(self, initial, data):
+        return data not in (None, "")
+
+
+def upload_parameters(func) -> list:
+    from .function_to_form import Upload, is_optional
+
+    names = []
+    for name, param in inspect.signature(func).parameters.items():
+        annotation = param.annotation
+        if is_optional(annotation):
+            annotation = typing.get_args(annotation)[0]
+        if inspect.isclass(annotation) and issubclass(annotation, Upload):
+            names.append(name)
+    return names
+
+
+def cleanup_uploads(func, input_json: dict):
+    """Remove uploaded files for an execution once it's done"""
+    for name in upload_parameters(func):
+        path = input_json.get(name)
+        if path and is_in_upload_dir(path):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.warning(f"Could not remove upload {path}", exc_info=True)
+            parent = Path(path).parent
+            if parent.resolve() != _upload_root().resolve():
+                try:
+                    # the request's directory, once its last upload is gone
+                    parent.rmdir()
+                except OSError:
+                    pass
@@ -1,5 +1,6 @@
 import json
 import enum
+import hashlib
 from collections import defaultdict
 from django.core.serializers.json import DjangoJSONEncoder
 
@@ -70,3 +71,56 @@ class EnumAwareDecoder(json.JSONDecoder):
 
     def object_hook(self, dct):
         return EnumRegistry.object_hook(dct)
+
+
+def canonical_json_hash(data) -> str:
+    """Stable hash of a JSON-able object (key order doesn't matter)"""
+    canonical = json.dumps(data, cls=EnumAwareEncoder, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def search_value(value, max_length: int = 255):
+    """String to index value by for searching (None if it isn't searchable).
+
+    Only scalars are: strings as is, numbers/booleans/null as JSON, enums by their value and
+    dates/decimals/UUIDs the way they're stored in JSON."""
+    if isinstance(value, enum.Enum):
+        value = value.value
+    elif isinstance(value, dict) and "__enum__" in value:
+        # already encoded by EnumAwareEncoder
+        value = value["__enum__"].get("value")
+    if isinstance(value, str):
+        encoded = value
+    elif value is None or isinstance(value, (bool, int, float)):
+        encoded = json.dumps(value)
+    elif isinstance(value, (list, dict)):
+        return None
+    else:
+        try:
+            encoded = DjangoJSONEncoder().default(value)
+        except (TypeError, ValueError):
+            return None
+    return encoded if len(encoded) <= max_length else None
+
+
+def search_pairs(input_json, max_length: int = 255):
+    """(key, search_value) for each searchable top level input"""
+    for key, value in (input_json or {}).items():
+        encoded = search_value(value, max_length)
+        if encoded is not None and len(key) <= max_length:
+            yield key, encoded
+
+
+def json_path_get(obj, path: str):
+    """Value at dotted path (e.g. ``"rows.0.name"``) in decoded JSON obj (None if missing)"""
+    for key in path.split("."):
+        if isinstance(obj, list):
+            try:
+                obj = obj[int(key)]
+            except (ValueError, IndexError):
+                return None
+        elif isinstance(obj, dict):
+            obj = obj.get(key)
+        else:
+            return None
+    return obj
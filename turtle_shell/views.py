@@ -1,11 +1,23 @@
+import json
+import logging
+
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.generic import DetailView
 from django.views.generic import ListView
 from django.views.generic import TemplateView
 from django.views.generic.edit import CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from graphene_django.views import GraphQLView
-from .models import ExecutionResult
+from .artifacts import serve_artifact
+from .models import ErrorTraceback, ExecutionResult
+from .routers import mark_write, read_alias
+from .uploads import StreamingFileUploadHandler, discard_uploads, request_upload_token
 from dataclasses import dataclass
+from django.db.models import Count, Max
 from django.urls import path
 from django.contrib import messages
 from typing import Optional
@@ -25,7 +37,7 @@ class ExecutionViewMixin:
             )
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().using(read_alias(self.request))
         return qs.filter(func_name=self.func_name)
 
     def get_context_data(self, **kwargs):
@@ -35,25 +47,140 @@ class ExecutionViewMixin:
 
 
 class ExecutionDetailView(ExecutionViewMixin, DetailView):
-    pass
+    LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        log_level = self.request.GET.get("log_level", "DEBUG").upper()
+        if log_level not in self.LOG_LEVELS:
+            log_level = "DEBUG"
+        context["log_levels"] = self.LOG_LEVELS
+        context["log_level"] = log_level
+        context["log_records"] = self.object.get_log_records(logging.getLevelName(log_level))
+        context["log_records_dropped"] = (self.object.log_records or {}).get("dropped", 0)
+        return context
+
+
+class ExecutionArtifactView(ExecutionViewMixin, DetailView):
+    """Download a file output of an execution"""
+
+    def get(self, request, *args, **kwargs):
+        execution = self.get_object()
+        artifact = get_object_or_404(execution.artifacts, pk=kwargs["artifact_id"])
+        return serve_artifact(request, artifact)
+
+
+class ExecutionLogView(ExecutionViewMixin, DetailView):
+    """Captured output as JSON, for polling while an execution runs (``?after=<seq>``)"""
+
+    def get(self, request, *args, **kwargs):
+        execution = self.get_object()
+        try:
+            after = int(request.GET.get("after", -1))
+        except ValueError:
+            after = -1
+        chunks = [chunk.to_dict() for chunk in execution.log_chunks.filter(seq__gt=after)]
+        return JsonResponse(
+            {
+                "status": execution.status,
+                "done": execution.status not in ExecutionResult.ACTIVE_STATUSES,
+                "chunks": chunks,
+                "last_seq": chunks[-1]["seq"] if chunks else after,
+            }
+        )
 
 
 class ExecutionListView(ExecutionViewMixin, ListView):
     def get_queryset(self):
         qs = super().get_queryset()
+        if version := self.request.GET.get("version"):
+            qs = qs.filter(func_version=version)
+        # ?input=key=value (repeat for more)
+        if inputs := self.request.GET.getlist("input"):
+            qs = qs.with_inputs(dict(item.partition("=")[::2] for item in inputs))
         return qs.order_by("-created")
 
 
+class ErrorGroupsView(ExecutionViewMixin, ListView):
+    """Failures grouped by distinct traceback, most common first"""
+
+    def get_queryset(self):
+        groups = list(
+            super()
+            .get_queryset()
+            .filter(error_traceback__isnull=False)
+            .values("error_traceback")
+            .annotate(count=Count("error_traceback"), last_seen=Max("created"))
+            .order_by("-count")
+        )
+        errors = ErrorTraceback.objects.using(read_alias(self.request)).in_bulk(
+            [group["error_traceback"] for group in groups]
+        )
+        for group in groups:
+            group["error"] = errors.get(group["error_traceback"])
+        return groups
+
+
 class ExecutionCreateView(ExecutionViewMixin, CreateView):
+    func_obj = None
+    # set once this request's uploads belong to a new execution (which removes them when done)
+    uploads_claimed = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # upload handlers have to be swapped before anything reads request.POST (including the
+        # CSRF middleware), so CSRF gets checked in dispatch instead
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def setup(self, request, *args, **kwargs):
+        request.upload_handlers = [StreamingFileUploadHandler(request)]
+        super().setup(request, *args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return self._protected_dispatch(request, *args, **kwargs)
+        finally:
+            # invalid form, failed CSRF check, attached to an identical execution, errors...
+            if not self.uploads_claimed:
+                discard_uploads(request)
+
+    @method_decorator(csrf_protect)
+    def _protected_dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_form_class(self):
+        # only import the function (and build its form) when it's actually used
+        return self.form_class or self.func_obj.form_class
+
     def get_form_kwargs(self, *a, **k):
         kwargs = super().get_form_kwargs(*a, **k)
         kwargs["user"] = self.request.user
+        kwargs["upload_token"] = request_upload_token(self.request)
         return kwargs
 
     def form_valid(self, form):
-        from .models import CaughtException
+        from .models import CaughtException, use_queued_execution
 
         sup = super().form_valid(form)
+        mark_write(self.request)
+        if self.object.reused:
+            messages.info(
+                self.request,
+                f"Identical execution already finished, showing {self.object.pk} instead",
+            )
+            return sup
+        if self.object.attached:
+            messages.info(
+                self.request,
+                f"Identical execution already in progress, showing {self.object.pk} instead",
+            )
+            return sup
+        self.uploads_claimed = True
+        if use_queued_execution():
+            messages.info(
+                self.request, f"Queued execution {self.object.pk} ({self.object.func_name})"
+            )
+            return sup
         try:
             self.object.execute()
         except CaughtException as e:
@@ -68,11 +195,20 @@ class ExecutionCreateView(ExecutionViewMixin, CreateView):
 
     def get_context_data(self, *a, **k):
         ctx = super().get_context_data(*a, **k)
-        ctx["doc"] = self.form_class.__doc__
+        ctx["doc"] = self.get_form_class().__doc__
         return ctx
 
 
 class LoginRequiredGraphQLView(LoginRequiredMixin, GraphQLView):
+    # if set, schema comes from registry on first request (so routing doesn't import functions)
+    registry = None
+
+    def __init__(self, *a, schema=None, registry=None, **k):
+        registry = registry or self.registry
+        if schema is None and registry is not None:
+            schema = registry.schema
+        super().__init__(*a, schema=schema, **k)
+
     def handle_no_permission(self):
         if self.request.user.is_authenticated:
             raise PermissionDenied("No permission to access this resource.")
@@ -88,10 +224,18 @@ class Views:
     create_view: object
     graphql_view: Optional[object]
     func_name: str
+    artifact_view: Optional[object] = None
+    log_view: Optional[object] = None
+    errors_view: Optional[object] = None
 
     @classmethod
     def from_function(
-        cls, func: "turtle_shell._Function", *, require_login: bool = True, schema=None
+        cls,
+        func: "turtle_shell._Function",
+        *,
+        require_login: bool = True,
+        schema=None,
+        registry=None,
     ):
         bases = (LoginRequiredMixin,) if require_login else tuple()
         detail_view = type(
@@ -100,22 +244,43 @@ class Views:
         list_view = type(
             f"{func.name}ListView", bases + (ExecutionListView,), ({"func_name": func.name})
         )
+        artifact_view = type(
+            f"{func.name}ArtifactView", bases + (ExecutionArtifactView,), ({"func_name": func.name})
+        )
+        log_view = type(
+            f"{func.name}LogView", bases + (ExecutionLogView,), ({"func_name": func.name})
+        )
+        errors_view = type(
+            f"{func.name}ErrorGroupsView", bases + (ErrorGroupsView,), ({"func_name": func.name})
+        )
         create_view = type(
             f"{func.name}CreateView",
             bases + (ExecutionCreateView,),
-            ({"func_name": func.name, "form_class": func.form_class}),
+            ({"func_name": func.name, "func_obj": func}),
         )
         return cls(
             detail_view=detail_view,
             list_view=list_view,
             create_view=create_view,
+            artifact_view=artifact_view,
+            log_view=log_view,
+            errors_view=errors_view,
             func_name=func.name,
             graphql_view=(
-                LoginRequiredGraphQLView.as_view(graphiql=True, schema=schema) if schema else None
+                LoginRequiredGraphQLView.as_view(graphiql=True, schema=schema, registry=registry)
+                if schema or registry
+                else None
             ),
         )
 
-    def urls(self, *, list_template, detail_template, create_template):
+    def urls(
+        self,
+        *,
+        list_template,
+        detail_template,
+        create_template,
+        errors_template="turtle_shell/error_groups.html",
+    ):
         # TODO: namespace this again!
         ret = [
             path(
@@ -134,5 +299,29 @@ class Views:
                 name=f"detail-{self.func_name}",
             ),
         ]
+        if self.artifact_view:
+            ret.append(
+                path(
+                    f"{self.func_name}/<uuid:pk>/artifacts/<int:artifact_id>/",
+                    self.artifact_view.as_view(),
+                    name=f"artifact-{self.func_name}",
+                )
+            )
+        if self.log_view:
+            ret.append(
+                path(
+                    f"{self.func_name}/<uuid:pk>/log/",
+                    self.log_view.as_view(),
+                    name=f"log-{self.func_name}",
+                )
+            )
+        if self.errors_view:
+            ret.append(
+                path(
+                    f"{self.func_name}/errors/",
+                    self.errors_view.as_view(template_name=errors_template),
+                    name=f"errors-{self.func_name}",
+                )
+            )
         ret.append(path("graphql", self.graphql_view))
         return ret
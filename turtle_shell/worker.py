@@ -0,0 +1,235 @@
+"""
+Warm worker pool
+----------------
+
+Runs queued executions (``TURTLE_SHELL_QUEUED_EXECUTION = True``) outside of the web process.
+
+The parent process imports the modules of every registered function up front (so heavy imports
+like pandas only happen once), then forks children that are ready to run immediately. Children
+are recycled after a number of executions or once they grow past a memory threshold so leaks
+don't build up.
+
+Workers on any number of hosts can share one database: each claimed execution is leased to its
+worker, which extends the lease with heartbeats while the function runs. If a worker dies, its
+lease runs out and ``reap_expired`` (run periodically by every pool, or by the
+``turtle_shell_reap`` command) requeues the execution, or fails it after
+``TURTLE_SHELL_MAX_ATTEMPTS`` (or the function's retry ``max_attempts``).
+"""
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def preload_modules(registry) -> List[str]:
+    """Import the module of every function in the registry, returning the module names"""
+    module_names = []
+    for func_obj in registry.func_name2func.values():
+        module_name = func_obj.module_name
+        if not module_name or module_name in module_names:
+            continue
+        importlib.import_module(module_name)
+        module_names.append(module_name)
+    return module_names
+
+
+def current_rss_bytes() -> int:
+    """Resident memory of this process (falls back to peak RSS where /proc isn't available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # linux reports in KB, macOS in bytes
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def worker_id() -> str:
+    """Lease owner name for this process"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Heartbeat(threading.Thread):
+    """Keeps extending the lease on an execution until stopped"""
+
+    def __init__(self, execution, owner: str, lease_seconds: float):
+        super().__init__(name=f"turtle-shell-heartbeat-{execution.pk}", daemon=True)
+        self.execution = execution
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        from .models import ExecutionResult
+
+        try:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                if not ExecutionResult.objects.heartbeat(
+                    self.execution.pk, self.owner, self.lease_seconds
+                ):
+                    self.lost = True
+                    logger.warning(f"Lost lease on {self.execution.pk}, it may run twice")
+                    break
+        except Exception:
+            logger.exception(f"Heartbeat for {self.execution.pk} failed")
+        finally:
+            # this thread has its own database connection
+            connections.close_all()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_worker(
+    *,
+    max_executions: Optional[int] = None,
+    max_memory_mb: Optional[int] = None,
+    poll_interval: float = 1.0,
+    stop_when_idle: bool = False,
+    lease_seconds: Optional[float] = None,
+) -> int:
+    """Claim and execute queued executions until a recycling limit is hit.
+
+    Returns number of executions run."""
+    from .models import CaughtException, ExecutionResult, lease_duration
+
+    owner = worker_id()
+    lease_seconds = lease_seconds or lease_duration()
+    executed = 0
+    while max_executions is None or executed < max_executions:
+        if max_memory_mb and current_rss_bytes() > max_memory_mb * 1024 * 1024:
+            logger.info(f"Worker {os.getpid()} past {max_memory_mb}MB, recycling")
+            break
+        execution = ExecutionResult.objects.claim_next(owner=owner, lease_seconds=lease_seconds)
+        if not execution:
+            if stop_when_idle:
+                break
+            time.sleep(poll_interval)
+            continue
+        heartbeat = Heartbeat(execution, owner, lease_seconds)
+        heartbeat.start()
+        try:
+            execution.execute()
+        except CaughtException:
+            # already saved on the execution
+            pass
+        except Exception:
+            logger.exception(f"Unexpected failure executing {execution.pk}")
+        finally:
+            heartbeat.stop()
+        executed += 1
+    return executed
+
+
+class WarmWorkerPool:
+    """Forkserver-style pool of workers, see module docstring."""
+
+    def __init__(
+        self,
+        registry,
+        *,
+        processes: int = 2,
+        max_executions_per_child: Optional[int] = 100,
+        max_memory_mb: Optional[int] = None,
+        poll_interval: float = 1.0,
+        lease_seconds: Optional[float] = None,
+        reap_interval: Optional[float] = 30.0,
+    ):
+        self.registry = registry
+        self.processes = processes
+        self.max_executions_per_child = max_executions_per_child
+        self.max_memory_mb = max_memory_mb
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.reap_interval = reap_interval
+        self._last_reap = 0.0
+        self.children = set()
+        self._stopping = False
+
+    def spawn(self) -> int:
+        # children must never share the parent's database connections
+        connections.close_all()
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return pid
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(
+                max_executions=self.max_executions_per_child,
+                max_memory_mb=self.max_memory_mb,
+                poll_interval=self.poll_interval,
+                lease_seconds=self.lease_seconds,
+            )
+        except Exception:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            connections.close_all()
+            os._exit(code)
+
+    def stop(self, *args):
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.discard(pid)
+
+    def reap(self):
+        """Requeue executions of dead workers (on any host), at most every reap_interval"""
+        from .models import ExecutionResult
+
+        if not self.reap_interval or time.monotonic() - self._last_reap < self.reap_interval:
+            return
+        self._last_reap = time.monotonic()
+        try:
+            counts = ExecutionResult.objects.reap_expired()
+        except Exception:
+            logger.exception("Reaping expired executions failed")
+            return
+        if any(counts.values()):
+            logger.info(f"Reaped expired executions: {counts}")
+
+    def run(self):
+        """Preload, then keep ``processes`` children running until SIGTERM/SIGINT"""
+        modules = preload_modules(self.registry)
+        logger.info(f"Preloaded {len(modules)} modules: {', '.join(modules)}")
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.processes):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            if not pid:
+                if not self._stopping:
+                    self.reap()
+                time.sleep(self.poll_interval)
+                continue
+            self.children.discard(pid)
+            if not self._stopping:
+                logger.info(f"Worker {pid} exited ({status}), starting a fresh one")
+                if status:
+                    # don't spin if children are crashing on startup
+                    time.sleep(self.poll_interval)
+                self.spawn()